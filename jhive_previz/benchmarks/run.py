@@ -0,0 +1,592 @@
+## Script to time each stage of the pipeline on synthetic catalogues of several sizes
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import typer
+from typing_extensions import Annotated
+
+from .. import dataproc
+from .. import distributions
+from .. import filterobjects
+from .. import main
+from .. import metadata
+from .. import utils
+from . import synthetic
+
+# the numbers of objects of the synthetic catalogues to benchmark, by default
+DEFAULT_NUM_OBJECTS = [10_000, 100_000]
+# the fractional drop in rows per second of a stage, compared to a baseline, that counts as a regression
+DEFAULT_TOLERANCE = 0.2
+# the commands whose start up time is measured, with their entry points
+STARTUP_COMMANDS = {
+    "jhive_previz": "jhive_previz.main:process_data_and_write_metadata_entrypoint",
+    "make_flag_file": "jhive_previz.main:generate_flag_file_entrypoint",
+    "jhive_previz_batch": "jhive_previz.main:process_batch_entrypoint",
+    "make_dists": "jhive_previz.distributions:generate_distributions_and_write_output_entrypoint",
+    "merge_sketches": "jhive_previz.main:merge_sketches_and_write_output_entrypoint",
+}
+# the packages that are slow to import, which the commands should not need to print their help
+SLOW_IMPORTS = ["pandas", "astropy", "matplotlib", "pydantic"]
+# runs an entry point with --help in a new interpreter, and writes the slow packages it imported to stderr
+STARTUP_SCRIPT = """
+import importlib, sys
+module_name, func_name = sys.argv[1].split(":")
+slow_imports = sys.argv[3:]
+sys.argv = [sys.argv[2], "--help"]
+try:
+    getattr(importlib.import_module(module_name), func_name)()
+except SystemExit:
+    pass
+sys.stderr.write("\\n" + " ".join(m for m in slow_imports if m in sys.modules) + "\\n")
+"""
+
+
+def measure_stage(
+    stage: Callable[[], Any], repeats: int = 1, trace_memory: bool = True
+) -> Tuple[Any, float, Optional[int]]:
+    """Runs a stage of the pipeline and measures how long it takes and its peak memory use. The stage is run
+    repeats times and the fastest time is kept, and then run once more with tracemalloc to find the peak
+    memory allocated while it runs, so that the times are not slowed down by tracing.
+
+    Parameters
+    ----------
+    stage : Callable[[], Any]
+        The stage to run, which must give the same result when it is run again.
+    repeats : int, optional
+        The number of times to run the stage for the time, by default 1
+    trace_memory : bool, optional
+        If True, run the stage once more to find its peak memory use, by default True
+
+    Returns
+    -------
+    Tuple[Any, float, Optional[int]]
+        The result of the last run of the stage, the fastest time in seconds, and the peak memory in bytes
+        (or None if it was not traced).
+    """
+
+    seconds = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = stage()
+        seconds.append(time.perf_counter() - start_time)
+
+    peak_bytes = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            result = stage()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return result, min(seconds), peak_bytes
+
+
+def get_stage_result(
+    stage_name: str, num_rows: int, seconds: float, peak_bytes: Optional[int]
+) -> Dict:
+    """Returns the results of a stage as a dictionary, with its rows per second and peak memory in MB."""
+
+    return {
+        "stage": stage_name,
+        "num_rows": num_rows,
+        "seconds": round(seconds, 6),
+        "rows_per_second": round(num_rows / seconds, 1) if seconds > 0 else None,
+        "peak_memory_mb": (
+            None if peak_bytes is None else round(peak_bytes / 1024**2, 3)
+        ),
+    }
+
+
+def run_benchmark(
+    work_path: Path,
+    num_objects: int,
+    num_filters: Optional[int] = None,
+    field_paths: Optional[List[str]] = None,
+    output_format: str = "csv",
+    repeats: int = 1,
+    trace_memory: bool = True,
+    seed: int = 0,
+) -> Dict:
+    """Generates a synthetic field with num_objects objects and times each stage of the pipeline on it:
+    making the flag file, reading and processing each catalogue, joining the catalogues and splitting them into
+    core and raw, writing the data files and metadata files, and making the distributions (as make_dists does).
+
+    Parameters
+    ----------
+    work_path : Path
+        The path to a directory to write the synthetic catalogues and the outputs to.
+    num_objects : int
+        The number of objects in the main catalogue.
+    num_filters : Optional[int], optional
+        The number of filters to use, by default None, which uses every filter in the fields files.
+    field_paths : Optional[List[str]], optional
+        The paths to the fields files, by default None, which uses synthetic.DEFAULT_FIELD_PATHS.
+    output_format : str, optional
+        The format to write the data files in, by default "csv"
+    repeats : int, optional
+        The number of times to run each stage, keeping the fastest time, by default 1
+    trace_memory : bool, optional
+        If True, also find the peak memory use of each stage, by default True
+    seed : int, optional
+        The seed of the random number generator for the synthetic catalogues, by default 0
+
+    Returns
+    -------
+    Dict
+        The number of objects and filters, and the results of each stage (see get_stage_result).
+    """
+
+    field_paths = [
+        Path(p).resolve() for p in field_paths or synthetic.DEFAULT_FIELD_PATHS
+    ]
+    field_dir = Path(work_path).resolve() / f"field_{num_objects}"
+    config_path = synthetic.make_synthetic_field(
+        field_dir, num_objects, num_filters, field_paths, seed
+    )
+    config_params, field_params = main.load_config(config_path, field_paths)
+
+    # make_dists needs the outputs to be in a relative 'output' directory, so the stages are run from the field directory
+    config_params["output_path"] = "output"
+    stages = []
+
+    def add_stage(stage_name: str, stage: Callable[[], Any], num_rows: int) -> Any:
+        result, seconds, peak_bytes = measure_stage(stage, repeats, trace_memory)
+        stages.append(get_stage_result(stage_name, num_rows, seconds, peak_bytes))
+        return result
+
+    with contextlib.chdir(field_dir):
+        output_path = main.create_and_validate_output_path(config_params)
+        flag_file_path = output_path / config_params["flag_file_name"]
+
+        def make_flag_file():
+            # the flag file is not overwritten, so remove it from the last run
+            flag_file_path.unlink(missing_ok=True)
+            filterobjects.create_and_write_flag_file(
+                config_params, field_params, output_path
+            )
+
+        add_stage("create_and_write_flag_file", make_flag_file, num_objects)
+
+        # read and process each of the catalogues, processing a copy each time so it can be run again
+        data_frames = dataproc.create_catalogues(config_params, field_params)
+        for name, cat in data_frames.items():
+            cat = add_stage(
+                f"read_table[{name}]",
+                lambda: dataproc.load_dataframe(name, cat.model_copy()),
+                num_objects,
+            )
+            if not cat.loaded:
+                continue
+            data_frames[name] = add_stage(
+                f"process_column_data[{name}]",
+                lambda: dataproc.process_column_data(
+                    cat.model_copy(), field_params[name]
+                ),
+                len(cat.df),
+            )
+
+        decimals = dataproc.get_output_decimals(data_frames)
+
+        def join_and_split():
+            other_dfs = dataproc.get_loaded_dataframes(
+                data_frames, [name for name in data_frames if name != "cat_filename"]
+            )
+            df_merged = dataproc.join_catalogues(
+                data_frames["cat_filename"].df, other_dfs
+            )
+            df_merged = utils.set_column_dtypes(
+                df_merged,
+                dataproc.get_column_data_types(config_params, field_params),
+                decimals,
+            )
+            ingest_viz = filterobjects.read_ingest_viz(flag_file_path)
+            ingest_mask = dataproc.get_ingest_mask(ingest_viz, df_merged["id"])
+            return {"raw": df_merged[~ingest_mask], "core": df_merged[ingest_mask]}
+
+        outputs = add_stage("join_catalogues", join_and_split, num_objects)
+
+        def write_data_files():
+            for suffix, df_cat in outputs.items():
+                utils.write_data(
+                    df_cat,
+                    dataproc.get_data_output_filepath(
+                        output_path, suffix, output_format
+                    ),
+                    decimals,
+                )
+
+        add_stage("write_data", write_data_files, num_objects)
+
+        def write_metadata_files():
+            for suffix, df_cat in outputs.items():
+                metadata.create_metadata_file(
+                    config_params, field_params, df_cat, output_path, suffix
+                )
+
+        add_stage("create_metadata_file", write_metadata_files, num_objects)
+
+        # there are no core objects if there are fewer filters than filterobjects.NUM_FLAGS
+        if len(outputs["core"]) > 0:
+            input_path = str(output_path.parent)
+            add_stage(
+                "make_dists",
+                lambda: distributions.generate_distributions_and_write_output(
+                    input_path
+                ),
+                len(outputs["core"]),
+            )
+        else:
+            print("There are no core objects, so make_dists will not be run.")
+
+    return {
+        "num_objects": num_objects,
+        "num_filters": num_filters,
+        "output_format": output_format,
+        "stages": stages,
+    }
+
+
+def measure_startup(command: str, entrypoint: str, repeats: int = 1) -> Dict:
+    """Measures how long a command takes to print its help, in a new python interpreter each time (as when it is
+    run from the command line), and finds which of SLOW_IMPORTS it imports to do so.
+
+    Parameters
+    ----------
+    command : str
+        The name of the command.
+    entrypoint : str
+        The entry point of the command, as 'module:function'.
+    repeats : int, optional
+        The number of times to run the command, keeping the fastest time, by default 1
+
+    Returns
+    -------
+    Dict
+        The command, its fastest time in seconds, and the slow packages it imported.
+    """
+
+    seconds = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT, entrypoint, command] + SLOW_IMPORTS,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        seconds.append(time.perf_counter() - start_time)
+
+    return {
+        "command": command,
+        "seconds": round(min(seconds), 6),
+        "slow_imports": process.stderr.splitlines()[-1].split(),
+    }
+
+
+def compare_startup(
+    baseline: Dict, results: Dict, tolerance: float = DEFAULT_TOLERANCE
+) -> List[Dict]:
+    """Compares the start up time of each command to a baseline. A command is a regression if it is slower
+    by more than the tolerance, or if it imports a slow package that it did not import in the baseline.
+
+    Parameters
+    ----------
+    baseline : Dict
+        The benchmark results to compare to, as written by run_benchmarks.
+    results : Dict
+        The new benchmark results.
+    tolerance : float, optional
+        The fractional drop in speed that counts as a regression, by default DEFAULT_TOLERANCE
+
+    Returns
+    -------
+    List[Dict]
+        The comparison of each command that is in both results, with its speed up over the baseline
+        (the ratio of the times), any new slow imports, and whether it is a regression.
+    """
+
+    baseline_startup = {
+        startup["command"]: startup for startup in baseline.get("startup", [])
+    }
+
+    comparisons = []
+    for startup in results.get("startup", []):
+        baseline_command = baseline_startup.get(startup["command"])
+        if baseline_command is None or startup["seconds"] <= 0:
+            continue
+
+        speed_up = baseline_command["seconds"] / startup["seconds"]
+        new_imports = sorted(
+            set(startup["slow_imports"]) - set(baseline_command["slow_imports"])
+        )
+        comparisons.append(
+            {
+                "command": startup["command"],
+                "speed_up": round(speed_up, 3),
+                "new_slow_imports": new_imports,
+                "regression": speed_up < 1 - tolerance or len(new_imports) > 0,
+            }
+        )
+
+    return comparisons
+
+
+def get_environment() -> Dict:
+    """Returns the versions of python and the main packages, and the machine the benchmarks were run on."""
+
+    import astropy
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "astropy": astropy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_results(
+    baseline: Dict, results: Dict, tolerance: float = DEFAULT_TOLERANCE
+) -> List[Dict]:
+    """Compares the rows per second of each stage at each number of objects to a baseline.
+
+    Parameters
+    ----------
+    baseline : Dict
+        The benchmark results to compare to, as written by run_benchmarks.
+    results : Dict
+        The new benchmark results.
+    tolerance : float, optional
+        The fractional drop in rows per second that counts as a regression, by default DEFAULT_TOLERANCE
+
+    Returns
+    -------
+    List[Dict]
+        The comparison of each stage that is in both results, with its speed up over the baseline
+        (the ratio of the rows per second) and whether it is a regression.
+    """
+
+    baseline_speeds = {
+        (run["num_objects"], stage["stage"]): stage["rows_per_second"]
+        for run in baseline["runs"]
+        for stage in run["stages"]
+    }
+
+    comparisons = []
+    for run in results["runs"]:
+        for stage in run["stages"]:
+            baseline_speed = baseline_speeds.get((run["num_objects"], stage["stage"]))
+            if not baseline_speed or not stage["rows_per_second"]:
+                continue
+
+            speed_up = stage["rows_per_second"] / baseline_speed
+            comparisons.append(
+                {
+                    "num_objects": run["num_objects"],
+                    "stage": stage["stage"],
+                    "speed_up": round(speed_up, 3),
+                    "regression": speed_up < 1 - tolerance,
+                }
+            )
+
+    return comparisons
+
+
+def print_results(run: Dict):
+    """Prints the results of each stage of a benchmark run as a table."""
+
+    print(f"\n{run['num_objects']} objects:")
+    print(f"{'stage':<40} {'seconds':>10} {'rows/s':>14} {'peak MB':>10}")
+    for stage in run["stages"]:
+        rows_per_second = stage["rows_per_second"] or float("nan")
+        peak_memory = stage["peak_memory_mb"]
+        print(
+            f"{stage['stage']:<40} {stage['seconds']:>10.3f} {rows_per_second:>14,.0f} "
+            + (f"{peak_memory:>10.1f}" if peak_memory is not None else f"{'-':>10}")
+        )
+
+
+def run_benchmarks(
+    num_objects: Annotated[
+        List[int],
+        typer.Option(
+            help="The number of objects of each synthetic catalogue to benchmark, can be given more than once."
+        ),
+    ] = DEFAULT_NUM_OBJECTS,
+    num_filters: Annotated[
+        Optional[int],
+        typer.Option(
+            help="The number of filters in the synthetic catalogues, by default every filter in the fields files."
+        ),
+    ] = None,
+    field_paths: Annotated[
+        List[str],
+        typer.Option(
+            help="The full paths to the fields files of the catalogues to generate, starting with the DJA fields file."
+        ),
+    ] = synthetic.DEFAULT_FIELD_PATHS,
+    output_file: Annotated[
+        str, typer.Option(help="The path of the json file to write the results to.")
+    ] = "./benchmark_results.json",
+    baseline_file: Annotated[
+        Optional[str],
+        typer.Option(
+            help="The path to the json file of earlier results to compare to. The command fails if any stage is slower than the tolerance."
+        ),
+    ] = None,
+    tolerance: Annotated[
+        float,
+        typer.Option(
+            help="The fractional drop in rows per second of a stage that counts as a regression."
+        ),
+    ] = DEFAULT_TOLERANCE,
+    output_format: Annotated[
+        str,
+        typer.Option(
+            help="The format to write the data files in, one of 'csv', 'parquet' or 'feather'."
+        ),
+    ] = "csv",
+    repeats: Annotated[
+        int,
+        typer.Option(
+            help="The number of times to run each stage, the fastest time is kept."
+        ),
+    ] = 1,
+    trace_memory: Annotated[
+        bool,
+        typer.Option(
+            help="If True, run each stage once more with tracemalloc to find its peak memory use."
+        ),
+    ] = True,
+    work_path: Annotated[
+        Optional[str],
+        typer.Option(
+            help="The path to a directory to keep the synthetic catalogues and outputs in, by default a temporary directory that is deleted."
+        ),
+    ] = None,
+    seed: Annotated[
+        int, typer.Option(help="The seed of the synthetic catalogues.")
+    ] = 0,
+    startup: Annotated[
+        bool,
+        typer.Option(
+            help="If True, also measure how long each command takes to start and print its help."
+        ),
+    ] = True,
+):
+    """Benchmarks the pipeline on synthetic catalogues generated from the fields files, at each of the given numbers of objects. Each stage (making the flag file, reading and processing each catalogue, joining them, writing the data and metadata files, and making the distributions) is timed, and its rows per second and peak memory are printed and written to a json file, which can be given as the baseline of a later run to check for regressions.
+
+    Parameters
+    ----------
+    num_objects : List[int], default = [10000, 100000]
+        The number of objects of each synthetic catalogue to benchmark.
+    num_filters : Optional[int], default = None
+        The number of filters in the synthetic catalogues, by default every filter in the fields files.
+    field_paths : List[str], default = synthetic.DEFAULT_FIELD_PATHS
+        The full paths to the fields files of the catalogues to generate, starting with the DJA fields file.
+    output_file : str, default = './benchmark_results.json'
+        The path of the json file to write the results to.
+    baseline_file : Optional[str], default = None
+        The path to the json file of earlier results to compare to.
+    tolerance : float, default = 0.2
+        The fractional drop in rows per second of a stage that counts as a regression.
+    output_format : str, default = 'csv'
+        The format to write the data files in.
+    repeats : int, default = 1
+        The number of times to run each stage, the fastest time is kept.
+    trace_memory : bool, default = True
+        If True, run each stage once more with tracemalloc to find its peak memory use.
+    work_path : Optional[str], default = None
+        The path to a directory to keep the synthetic catalogues and outputs in, by default a temporary directory.
+    seed : int, default = 0
+        The seed of the synthetic catalogues.
+    startup : bool, default = True
+        If True, also measure how long each command in STARTUP_COMMANDS takes to start and print its help.
+
+    Raises
+    ------
+    typer.Exit
+        Exits with code 1 if any stage or command is slower than the baseline by more than the tolerance,
+        or if a command imports a slow package to start that it did not import in the baseline.
+    """
+
+    output_format = utils.validate_output_format(output_format)
+
+    results = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": get_environment(),
+        "runs": [],
+    }
+
+    with contextlib.ExitStack() as stack:
+        if work_path is None:
+            work_path = stack.enter_context(tempfile.TemporaryDirectory())
+
+        for n in num_objects:
+            run = run_benchmark(
+                Path(work_path),
+                n,
+                num_filters,
+                field_paths,
+                output_format,
+                repeats,
+                trace_memory,
+                seed,
+            )
+            print_results(run)
+            results["runs"].append(run)
+
+    if startup:
+        results["startup"] = [
+            measure_startup(command, entrypoint, repeats)
+            for command, entrypoint in STARTUP_COMMANDS.items()
+        ]
+        print(f"\n{'command':<40} {'start up seconds':>16}  slow imports")
+        for result in results["startup"]:
+            print(
+                f"{result['command']:<40} {result['seconds']:>16.3f}  {' '.join(result['slow_imports'])}"
+            )
+
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"\nResults written to {output_file}")
+
+    if baseline_file is not None:
+        with open(baseline_file, "r") as f:
+            baseline = json.load(f)
+
+        comparisons = compare_results(baseline, results, tolerance)
+        print(f"\nCompared to {baseline_file}:")
+        for comparison in comparisons:
+            flag = "  REGRESSION" if comparison["regression"] else ""
+            print(
+                f"{comparison['num_objects']:>10} {comparison['stage']:<40} {comparison['speed_up']:>6.2f}x{flag}"
+            )
+
+        startup_comparisons = compare_startup(baseline, results, tolerance)
+        for comparison in startup_comparisons:
+            flag = "  REGRESSION" if comparison["regression"] else ""
+            new_imports = " ".join(comparison["new_slow_imports"])
+            print(
+                f"{'start up':>10} {comparison['command']:<40} {comparison['speed_up']:>6.2f}x {new_imports}{flag}"
+            )
+
+        if any(c["regression"] for c in comparisons + startup_comparisons):
+            raise typer.Exit(code=1)
+
+
+def run_benchmarks_entrypoint():
+    typer.run(run_benchmarks)
@@ -0,0 +1,277 @@
+## Script to generate synthetic catalogues that match the fields files, i.e. to benchmark the pipeline
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Union
+import numpy as np
+import pandas as pd
+import yaml
+from astropy.table import Table
+
+from .. import filterobjects
+from .. import main
+
+# the fields files of the catalogues to generate, by default
+DEFAULT_FIELD_PATHS = [
+    "./metadata_files/v1.0/dja_fields.yaml",
+    "./metadata_files/v1.0/db_fields.yaml",
+    "./metadata_files/v1.0/mf_fields.yaml",
+]
+# the file suffix of each of the catalogue file formats in the fields files
+FILE_SUFFIXES = {
+    "fits": ".fits",
+    "ascii.csv": ".csv",
+    "ascii": ".csv",
+    "ascii.commented_header": ".cat",
+}
+# the fraction of objects of the main catalogue that are not in each of the other catalogues
+MISSING_OBJECT_FRACTION = 0.05
+# the fraction of values of each float column that are missing
+MISSING_VALUE_FRACTION = 0.02
+# the centre of the synthetic field on the sky, and its width in degrees
+FIELD_CENTRE = (53.16, -27.78)
+FIELD_WIDTH = 0.2
+
+
+def get_filter_names(field_params: Mapping) -> List[str]:
+    """Returns the names of the filters of the columns in the fields files, with the filters that are in the
+    most catalogues first (and then in the order they are in the fields files).
+    """
+
+    num_catalogues: Dict[str, int] = {}
+    for params in field_params.values():
+        cat_filter_names = {
+            col_params.get("filt_name") for col_params in params["columns"].values()
+        }
+        for filt_name in cat_filter_names - {None}:
+            num_catalogues[filt_name] = num_catalogues.get(filt_name, 0) + 1
+
+    filter_names = []
+    for params in field_params.values():
+        for col_params in params["columns"].values():
+            filt_name = col_params.get("filt_name")
+            if filt_name is not None and filt_name not in filter_names:
+                filter_names.append(filt_name)
+
+    return sorted(filter_names, key=lambda f: -num_catalogues[f])
+
+
+def get_synthetic_columns_to_use(
+    field_params: Mapping, filter_names: Optional[List[str]] = None
+) -> Dict[str, List[str]]:
+    """Gets the columns to use of each catalogue, which are all of the columns in its fields file, apart from
+    the columns of filters that are not in filter_names, and the columns (other than id) that are already used
+    from an earlier catalogue, as the output columns of the catalogues are joined together.
+
+    Parameters
+    ----------
+    field_params : Mapping
+        The dictionary of field parameters for all of the catalogues.
+    filter_names : Optional[List[str]], optional
+        The names of the filters to use, by default None, which uses every filter.
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        The columns to use, with the file name key of each catalogue as keys.
+    """
+
+    columns_to_use = {}
+    used_columns = set()
+
+    for file_name, params in field_params.items():
+        columns_to_use[file_name] = []
+
+        for c, col_params in params["columns"].items():
+            filt_name = col_params.get("filt_name")
+            if filter_names is not None and filt_name not in filter_names + [None]:
+                continue
+            if c in used_columns:
+                continue
+
+            columns_to_use[file_name].append(c)
+            if c != "id":
+                used_columns.add(c)
+
+    return columns_to_use
+
+
+def make_synthetic_column(
+    col_params: Mapping, num_objects: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Makes the values of a synthetic input column from its parameters in the fields file. Magnitude columns
+    are fluxes of objects of magnitudes 20 to 30 (with some negative fluxes), positions are spread across the
+    field, bools are 0 or 1, and other floats are positive (so log conversions are valid), with some missing values.
+    """
+
+    if col_params["data_type"] == "int":
+        return rng.integers(0, 100, num_objects)
+
+    elif col_params["data_type"] == "bool":
+        return rng.integers(0, 2, num_objects)
+
+    if col_params["is_magnitude"]:
+        magnitudes = rng.uniform(20.0, 30.0, num_objects)
+        values = 10 ** ((col_params["zero_point"] - magnitudes) / 2.5)
+        values[rng.random(num_objects) < MISSING_VALUE_FRACTION] *= -1
+
+    elif col_params["input_units"] == "Degrees":
+        is_ra = col_params["display"] == "Right Ascension"
+        centre = FIELD_CENTRE[0] if is_ra else FIELD_CENTRE[1]
+        values = centre + rng.uniform(-FIELD_WIDTH / 2, FIELD_WIDTH / 2, num_objects)
+
+    else:
+        values = rng.lognormal(0.0, 1.0, num_objects)
+
+    values[rng.random(num_objects) < MISSING_VALUE_FRACTION] = np.nan
+
+    return values
+
+
+def make_synthetic_catalogue(
+    col_field_params: Mapping,
+    columns: List[str],
+    ids: np.ndarray,
+    rng: np.random.Generator,
+    with_errors: bool = False,
+) -> pd.DataFrame:
+    """Makes a synthetic catalogue with the input columns of the given columns, for the objects with the given ids.
+
+    Parameters
+    ----------
+    col_field_params : Mapping
+        The dictionaries of parameters for the columns of the catalogue.
+    columns : List[str]
+        The columns to use of the catalogue.
+    ids : np.ndarray
+        The ids of the objects in the catalogue.
+    rng : np.random.Generator
+        The random number generator to make the values with.
+    with_errors : bool, optional
+        If True, the flux error column of each magnitude column is also made, as for the DJA catalogue, with a
+        range of signal to noise ratios around filterobjects.SNR_MAG. By default False.
+
+    Returns
+    -------
+    pd.DataFrame
+        The catalogue, with the input column names as columns.
+    """
+
+    new_cols = {}
+    for c in columns:
+        col_name = col_field_params[c]["input_column_name"]
+
+        if c == "id":
+            new_cols[col_name] = ids
+            continue
+
+        new_cols[col_name] = make_synthetic_column(col_field_params[c], len(ids), rng)
+
+        if with_errors and col_field_params[c]["is_magnitude"]:
+            snr = rng.lognormal(np.log(filterobjects.SNR_MAG), 1.0, len(ids))
+            new_cols[filterobjects.get_err_column_name(col_name)] = (
+                np.abs(new_cols[col_name]) / snr
+            )
+
+    return pd.DataFrame(new_cols)
+
+
+def write_synthetic_catalogue(df: pd.DataFrame, file_path: Path, file_format: str):
+    """Writes a synthetic catalogue in the given astropy file format. Fits files are written with astropy,
+    and ascii files are written with pandas (as csv, or space separated with a commented header).
+    """
+
+    if file_format == "fits":
+        Table.from_pandas(df).write(file_path, overwrite=True)
+
+    elif file_format == "ascii.commented_header":
+        with open(file_path, "w") as f:
+            f.write("# " + " ".join(df.columns) + "\n")
+            df.to_csv(f, sep=" ", header=False, index=False, na_rep="nan")
+
+    else:
+        df.to_csv(file_path, index=False)
+
+
+def make_synthetic_field(
+    output_path: Union[str, Path],
+    num_objects: int,
+    num_filters: Optional[int] = None,
+    field_paths: Optional[List[Union[str, Path]]] = None,
+    seed: int = 0,
+) -> Path:
+    """Generates a synthetic field, with a catalogue for each fields file and a config file that uses
+    every column of them. The main catalogue has num_objects objects, and every other catalogue has a
+    shuffled subset of them (with MISSING_OBJECT_FRACTION of the objects missing), so they need to be joined.
+
+    Parameters
+    ----------
+    output_path : Union[str, Path]
+        The path to the directory to write the catalogues and the config file to.
+    num_objects : int
+        The number of objects in the main catalogue.
+    num_filters : Optional[int], optional
+        The number of filters to use, by default None, which uses every filter in the fields files.
+    field_paths : Optional[List[Union[str, Path]]], optional
+        The paths to the fields files of the catalogues, by default None, which uses DEFAULT_FIELD_PATHS.
+        The first fields file must be the main catalogue.
+    seed : int, optional
+        The seed of the random number generator, by default 0
+
+    Returns
+    -------
+    Path
+        The path to the config file of the field.
+    """
+
+    output_path = Path(output_path).resolve()
+    output_path.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    field_params = main.load_field_params(field_paths or DEFAULT_FIELD_PATHS)
+
+    # keep the num_filters filters that are in the most catalogues
+    filter_names = None
+    if num_filters is not None:
+        filter_names = get_filter_names(field_params)[:num_filters]
+    columns_to_use = get_synthetic_columns_to_use(field_params, filter_names)
+
+    config_params = {
+        "paths": {},
+        "field_name": f"synthetic-{num_objects}",
+        "file_names": {},
+        "flag_file_name": filterobjects.get_flagfile_filepath(Path()).name,
+        "version": "benchmark",
+        "output_path": str(output_path / "output"),
+        "columns_to_use": columns_to_use,
+    }
+
+    ids = np.arange(1, num_objects + 1)
+    for file_name, params in field_params.items():
+        if file_name == "cat_filename":
+            cat_ids = ids
+        else:
+            cat_ids = rng.permutation(ids)
+            cat_ids = cat_ids[: int(round(num_objects * (1 - MISSING_OBJECT_FRACTION)))]
+
+        df = make_synthetic_catalogue(
+            params["columns"],
+            columns_to_use[file_name],
+            cat_ids,
+            rng,
+            with_errors=file_name == "cat_filename",
+        )
+
+        cat_file_name = (
+            f"synthetic_{file_name.split('_')[0]}_{num_objects}"
+            + FILE_SUFFIXES[params["file_format"]]
+        )
+        write_synthetic_catalogue(
+            df, output_path / cat_file_name, params["file_format"]
+        )
+
+        config_params["paths"][file_name.split("_")[0] + "_path"] = str(output_path)
+        config_params["file_names"][file_name] = cat_file_name
+
+    config_path = output_path / f"synthetic_{num_objects}_config.yaml"
+    with open(config_path, "w") as f:
+        yaml.safe_dump(config_params, f, sort_keys=False)
+
+    return config_path
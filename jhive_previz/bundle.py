@@ -0,0 +1,398 @@
+## Script to write catalogues as bundles of binary typed-array columns for the visualization tool
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Mapping, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from . import utils
+
+BUNDLE_DATA_SUFFIX = ".bin"
+BUNDLE_MANIFEST_SUFFIX = ".json"
+# the byte offset of every column in the data file is a multiple of this, so clients can make typed-array views of it
+BUNDLE_ALIGNMENT = 8
+# the numpy dtype of each bundle dtype, all little-endian
+BUNDLE_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+    "int32": np.dtype("<i4"),
+    "int64": np.dtype("<i8"),
+    "bitmap": np.dtype("u1"),
+}
+# the wider bundle dtype of a column whose values in a later chunk do not fit its dtype
+BUNDLE_WIDER_DTYPES = {"int32": "int64", "float32": "float64"}
+
+
+def get_bundle_filepaths(output_path: Path, suffix: str) -> Tuple[Path, Path]:
+    """Returns the paths to the data file and the manifest of the column bundle of a catalogue.
+
+    Parameters
+    ----------
+    output_path : Path
+        The path to the directory where the files will be saved.
+    suffix : str
+        The suffix string to add to the file names, i.e. 'core'.
+
+    Returns
+    -------
+    Tuple[Path, Path]
+        The full paths to the data file and the manifest.
+    """
+
+    base_filename = "catalog_" + suffix + "_columns"
+
+    return (
+        output_path / (base_filename + BUNDLE_DATA_SUFFIX),
+        output_path / (base_filename + BUNDLE_MANIFEST_SUFFIX),
+    )
+
+
+def get_bundle_dtype(
+    column: pd.Series, num_decimals: Optional[int] = None
+) -> Optional[str]:
+    """Gets the bundle dtype of a column. Floats are float32 if that keeps every value at the given number of decimals
+    (see utils.is_float32_safe) and float64 otherwise, ints are int32 if every value fits and int64 otherwise, and bools
+    are bitmaps. Columns of any other type can not be written to a bundle.
+
+    Parameters
+    ----------
+    column : pd.Series
+        The column to get the dtype of.
+    num_decimals : Optional[int], optional
+        The number of decimals of the column, if it is a float column, by default None
+
+    Returns
+    -------
+    Optional[str]
+        The bundle dtype, one of the keys of BUNDLE_DTYPES, or None if the column can not be written to a bundle.
+    """
+
+    if pd.api.types.is_bool_dtype(column):
+        return "bitmap"
+
+    elif pd.api.types.is_integer_dtype(column):
+        int32_info = np.iinfo(np.int32)
+        min_val, max_val = column.min(), column.max()
+        if pd.isna(min_val) or (
+            int32_info.min <= min_val and max_val <= int32_info.max
+        ):
+            return "int32"
+        return "int64"
+
+    elif pd.api.types.is_float_dtype(column):
+        if column.dtype == np.float32 or utils.is_float32_safe(column, num_decimals):
+            return "float32"
+        return "float64"
+
+    return None
+
+
+def encode_column(
+    column: pd.Series, bundle_dtype: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Encodes a column as an array of its bundle dtype. Missing values in float columns are NaNs, and missing values
+    in int and bool columns are zero (and marked as not valid). Bitmap columns are returned with one byte per value,
+    as they are packed into bits when the bundle is closed.
+
+    Parameters
+    ----------
+    column : pd.Series
+        The column to encode.
+    bundle_dtype : str
+        The bundle dtype of the column, one of the keys of BUNDLE_DTYPES.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The encoded values, and a boolean array that is False for missing values.
+
+    Raises
+    ------
+    ValueError
+        Raises an error if the values of an int column do not fit in its bundle dtype.
+    """
+
+    valid = column.notna().to_numpy()
+    dtype = BUNDLE_DTYPES[bundle_dtype]
+
+    if bundle_dtype.startswith("float"):
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan).astype(dtype)
+
+    elif bundle_dtype.startswith("int"):
+        values = column.to_numpy(dtype=np.int64, na_value=0)
+        int_info = np.iinfo(dtype)
+        if len(values) > 0 and (
+            values.min() < int_info.min or values.max() > int_info.max
+        ):
+            raise ValueError(
+                f"The values of column {column.name} do not fit in {bundle_dtype}."
+            )
+        values = values.astype(dtype)
+
+    else:
+        values = column.to_numpy(dtype=bool, na_value=False).astype(dtype)
+
+    return values, valid
+
+
+def pack_bits(values: np.ndarray) -> np.ndarray:
+    """Packs an array of booleans (or zeros and ones) into bits, with the first value in the lowest bit of the first byte."""
+    return np.packbits(values.astype(bool), bitorder="little")
+
+
+class ColumnBundleWriter:
+    """Writes a dataframe as a column bundle: a single binary data file with the values of each column as a
+    little-endian typed array (see get_bundle_dtype), and a json manifest with the dtype, length and byte offset
+    of each column in the data file. Every column starts at a multiple of BUNDLE_ALIGNMENT bytes, so a client
+    can fetch the data file and wrap each column in a typed array (i.e. a Float32Array) without parsing it.
+    Bool columns are bitmaps, and int and bool columns with missing values also have a validity bitmap
+    (with 1 for valid values), both with the first value in the lowest bit of the first byte.
+
+    The dataframe can be written in chunks of rows, which are kept in temporary files next to the data file until
+    the bundle is closed. The dtype of each column is set from the first chunk, and is widened (see BUNDLE_WIDER_DTYPES)
+    if the values of a later chunk do not fit it. Use as a context manager, or call close once all of the chunks
+    are written.
+
+    Parameters
+    ----------
+    data_file_path : Path
+        The full path of the data file to write to.
+    manifest_file_path : Path
+        The full path of the manifest to write to.
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals of each float column, by default None
+    """
+
+    def __init__(
+        self,
+        data_file_path: Path,
+        manifest_file_path: Path,
+        decimals: Optional[Mapping[str, int]] = None,
+    ):
+        self.data_file_path = data_file_path
+        self.manifest_file_path = manifest_file_path
+        self.decimals = decimals or {}
+        self.num_rows = 0
+        self._dtypes: Optional[Dict[str, str]] = None
+        self._has_missing: Dict[str, bool] = {}
+
+        data_file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_dir = tempfile.TemporaryDirectory(dir=data_file_path.parent)
+
+    def _get_tmp_path(self, index: int, kind: str) -> Path:
+        return Path(self._tmp_dir.name) / f"{index}.{kind}"
+
+    def write(self, df_chunk: pd.DataFrame):
+        """Writes the next chunk of rows to the bundle."""
+
+        if self._dtypes is None:
+            self._dtypes = {}
+            for colname in df_chunk.columns:
+                bundle_dtype = get_bundle_dtype(
+                    df_chunk[colname], self.decimals.get(colname)
+                )
+                if bundle_dtype is None:
+                    print(
+                        f"Column {colname} has dtype {df_chunk[colname].dtype}, which can not be written to a column bundle, it will not be in the bundle."
+                    )
+                    continue
+                self._dtypes[colname] = bundle_dtype
+                self._has_missing[colname] = False
+
+        for i, (colname, bundle_dtype) in enumerate(self._dtypes.items()):
+            chunk_dtype = get_bundle_dtype(
+                df_chunk[colname], self.decimals.get(colname)
+            )
+            if chunk_dtype == BUNDLE_WIDER_DTYPES.get(bundle_dtype):
+                self._widen_column(i, colname, chunk_dtype)
+                bundle_dtype = chunk_dtype
+
+            values, valid = encode_column(df_chunk[colname], bundle_dtype)
+
+            with open(self._get_tmp_path(i, "values"), "ab") as f:
+                f.write(values.tobytes())
+            with open(self._get_tmp_path(i, "valid"), "ab") as f:
+                f.write(valid.astype(np.uint8).tobytes())
+
+            self._has_missing[colname] |= not valid.all()
+
+        self.num_rows += len(df_chunk)
+
+    def _widen_column(self, index: int, colname: str, bundle_dtype: str):
+        """Rewrites the values of a column from the chunks so far in a wider bundle dtype. Float values are rounded
+        to the column's number of decimals, so they are the same as if the column had been float64 from the start.
+        """
+
+        values_path = self._get_tmp_path(index, "values")
+        values = np.fromfile(values_path, dtype=BUNDLE_DTYPES[self._dtypes[colname]])
+        values = values.astype(BUNDLE_DTYPES[bundle_dtype])
+        if bundle_dtype == "float64" and self.decimals.get(colname) is not None:
+            values = values.round(self.decimals[colname])
+        values.tofile(values_path)
+
+        self._dtypes[colname] = bundle_dtype
+
+    def _write_segment(self, data_file, write_bytes) -> Dict:
+        """Pads the data file to the next aligned offset, writes a segment with write_bytes, and returns its offset and length."""
+
+        padding = -data_file.tell() % BUNDLE_ALIGNMENT
+        data_file.write(b"\0" * padding)
+
+        byte_offset = data_file.tell()
+        write_bytes(data_file)
+
+        return {
+            "byte_offset": byte_offset,
+            "byte_length": data_file.tell() - byte_offset,
+        }
+
+    def close(self):
+        """Writes the data file and the manifest from the chunks, and deletes the temporary files."""
+
+        if self._tmp_dir is None:
+            return
+
+        columns = []
+
+        with open(self.data_file_path, "wb") as data_file:
+            for i, (colname, bundle_dtype) in enumerate((self._dtypes or {}).items()):
+                values_path = self._get_tmp_path(i, "values")
+                valid_path = self._get_tmp_path(i, "valid")
+
+                if bundle_dtype == "bitmap":
+                    segment = self._write_segment(
+                        data_file,
+                        lambda f: f.write(
+                            pack_bits(
+                                np.fromfile(values_path, dtype=np.uint8)
+                            ).tobytes()
+                        ),
+                    )
+                else:
+
+                    def copy_values(f):
+                        with open(values_path, "rb") as values_file:
+                            shutil.copyfileobj(values_file, f)
+
+                    segment = self._write_segment(data_file, copy_values)
+
+                column = {
+                    "name": colname,
+                    "dtype": bundle_dtype,
+                    "length": self.num_rows,
+                    **segment,
+                }
+
+                if self._has_missing[colname] and not bundle_dtype.startswith("float"):
+                    column["validity"] = self._write_segment(
+                        data_file,
+                        lambda f: f.write(
+                            pack_bits(np.fromfile(valid_path, dtype=np.uint8)).tobytes()
+                        ),
+                    )
+                else:
+                    # float columns use NaNs for missing values
+                    column["validity"] = None
+
+                columns.append(column)
+
+        manifest = {
+            "data_file": self.data_file_path.name,
+            "num_rows": self.num_rows,
+            "byte_order": "little",
+            "bit_order": "little",
+            "alignment": BUNDLE_ALIGNMENT,
+            "columns": columns,
+        }
+        with open(self.manifest_file_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+
+        self._tmp_dir.cleanup()
+        self._tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_column_bundle(
+    df_cat: pd.DataFrame,
+    output_path: Path,
+    suffix: str,
+    decimals: Optional[Mapping[str, int]] = None,
+):
+    """Writes the dataframe as a column bundle (see ColumnBundleWriter) to the output path.
+
+    Parameters
+    ----------
+    df_cat : pd.DataFrame
+        The dataframe to write out.
+    output_path : Path
+        The path to the directory where the files will be saved.
+    suffix : str
+        The suffix string to add to the file names, i.e. 'core'.
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals of each float column, by default None
+    """
+
+    with ColumnBundleWriter(
+        *get_bundle_filepaths(output_path, suffix), decimals
+    ) as writer:
+        writer.write(df_cat)
+
+
+def read_column_bundle(manifest_file_path: Path) -> pd.DataFrame:
+    """Reads a column bundle back into a dataframe, i.e. to check a bundle. Int and bool columns with a
+    validity bitmap are returned as nullable ints and bools.
+
+    Parameters
+    ----------
+    manifest_file_path : Path
+        The full path to the manifest of the bundle.
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataframe with the data from the bundle.
+    """
+
+    with open(manifest_file_path, "r") as f:
+        manifest = json.load(f)
+
+    buffer = np.fromfile(
+        Path(manifest_file_path).parent / manifest["data_file"], dtype=np.uint8
+    )
+    num_rows = manifest["num_rows"]
+
+    def get_bits(segment: Dict) -> np.ndarray:
+        data = buffer[
+            segment["byte_offset"] : segment["byte_offset"] + segment["byte_length"]
+        ]
+        return np.unpackbits(data, count=num_rows, bitorder="little").astype(bool)
+
+    new_cols = {}
+    for column in manifest["columns"]:
+        if column["dtype"] == "bitmap":
+            values = get_bits(column)
+        else:
+            values = np.frombuffer(
+                buffer,
+                dtype=BUNDLE_DTYPES[column["dtype"]],
+                count=num_rows,
+                offset=column["byte_offset"],
+            )
+
+        if column["validity"] is not None:
+            valid = get_bits(column["validity"])
+            if column["dtype"] == "bitmap":
+                values = pd.arrays.BooleanArray(values, ~valid)
+            else:
+                values = pd.arrays.IntegerArray(values.copy(), ~valid)
+
+        new_cols[column["name"]] = values
+
+    return pd.DataFrame(new_cols)
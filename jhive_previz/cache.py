@@ -0,0 +1,172 @@
+## Script to cache the processed dataframes of catalogues between runs
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import TYPE_CHECKING, Mapping, List, Optional
+
+# the cache is read and written with pickle, so pandas is only needed for the type hints
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_MAX_CACHE_GB = 5
+DEFAULT_MAX_CACHE_BYTES = DEFAULT_MAX_CACHE_GB * 1024**3
+CACHE_FILE_SUFFIX = ".pkl"
+# the version of the processing of the catalogues, which is part of the cache key, so the processed dataframes
+# cached by older code are not used. This should be increased whenever the way the catalogues are converted,
+# filtered, rounded or stored changes.
+CACHE_VERSION = 1
+
+
+def get_cache_key(
+    file_path: Path,
+    file_format: str,
+    input_columns: List[str],
+    output_columns: List[str],
+    col_field_params: Mapping,
+    compact: bool = False,
+) -> str:
+    """Creates the key for the processed dataframe of a catalogue. The key is a hash of the size and
+    modification time of the catalogue file, the columns to use, the field parameters of those
+    columns, whether compact dtypes are used and CACHE_VERSION, so the key changes if any of these change.
+
+    Parameters
+    ----------
+    file_path : Path
+        The full path to the catalogue file.
+    file_format : str
+        The astropy format of the catalogue file.
+    input_columns : List[str]
+        The names of the columns to use in the catalogue file.
+    output_columns : List[str]
+        The names of the columns to use in the output.
+    col_field_params : Mapping
+        The dictionaries of parameters for the columns of the catalogue.
+    compact : bool, optional
+        If True, the dataframe is stored in compact dtypes, by default False
+
+    Returns
+    -------
+    str
+        The hex digest of the hash.
+    """
+
+    file_stat = Path(file_path).stat()
+
+    key_params = {
+        "cache_version": CACHE_VERSION,
+        "file_path": str(Path(file_path).resolve()),
+        "file_size": file_stat.st_size,
+        "file_mtime": file_stat.st_mtime_ns,
+        "file_format": file_format,
+        "input_columns": input_columns,
+        "output_columns": output_columns,
+        "columns": {c: col_field_params[c] for c in output_columns},
+        "compact": compact,
+    }
+    key_string = json.dumps(key_params, sort_keys=True, default=str)
+
+    return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+
+def get_cache_filepath(cache_dir: Path, key: str) -> Path:
+    """Returns the path to the cache file for the given key."""
+    return Path(cache_dir) / (key + CACHE_FILE_SUFFIX)
+
+
+def read_cached_dataframe(cache_dir: Path, key: str) -> Optional["pd.DataFrame"]:
+    """Reads the cached dataframe for the given key, if it exists.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        The path to the cache directory.
+    key : str
+        The key of the dataframe, from get_cache_key.
+
+    Returns
+    -------
+    Optional[pd.DataFrame]
+        The cached dataframe, or None if there is no cached dataframe for this key.
+    """
+
+    cache_path = get_cache_filepath(cache_dir, key)
+
+    try:
+        with open(cache_path, "rb") as f:
+            df = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+    # mark the file as recently used so it is evicted last
+    try:
+        os.utime(cache_path)
+    except FileNotFoundError:
+        pass
+
+    return df
+
+
+def write_cached_dataframe(
+    cache_dir: Path,
+    key: str,
+    df: "pd.DataFrame",
+    max_cache_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+):
+    """Writes the dataframe to the cache directory under the given key, and then evicts the least
+    recently used files in the cache until it is no larger than max_cache_bytes.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        The path to the cache directory.
+    key : str
+        The key of the dataframe, from get_cache_key.
+    df : pd.DataFrame
+        The dataframe to cache.
+    max_cache_bytes : int, optional
+        The maximum total size of the files in the cache directory, by default DEFAULT_MAX_CACHE_BYTES
+    """
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = get_cache_filepath(cache_dir, key)
+
+    # write to a temporary file first so other processes never read a partial file
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+    evict_cache_files(cache_dir, max_cache_bytes)
+
+
+def evict_cache_files(cache_dir: Path, max_cache_bytes: int):
+    """Deletes the least recently used files in the cache directory until the total size of the
+    cache files is no larger than max_cache_bytes.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        The path to the cache directory.
+    max_cache_bytes : int
+        The maximum total size of the files in the cache directory.
+    """
+
+    cache_files = []
+    for cache_path in Path(cache_dir).glob("*" + CACHE_FILE_SUFFIX):
+        try:
+            file_stat = cache_path.stat()
+        except FileNotFoundError:
+            continue
+        cache_files.append((file_stat.st_mtime_ns, file_stat.st_size, cache_path))
+
+    total_bytes = sum(size for _, size, _ in cache_files)
+
+    # delete the oldest files first
+    for _, size, cache_path in sorted(cache_files):
+        if total_bytes <= max_cache_bytes:
+            break
+        cache_path.unlink(missing_ok=True)
+        total_bytes -= size
@@ -1,10 +1,76 @@
 import numpy as np
-from typing import Tuple, Optional, Dict
+import pandas as pd
+from typing import Tuple, Optional, Dict, Callable
+
+
+# Conversion decorators
+
+
+def scalar_only(func: Callable) -> Callable:
+    """Marks a conversion function as only accepting single values. Functions marked this
+    way are applied to a column one element at a time by apply_conversion, instead of being
+    given the whole column as an array.
+
+    Parameters
+    ----------
+    func : Callable
+        The conversion function, with the signature func(value, field_params).
+
+    Returns
+    -------
+    Callable
+        The same function, marked as scalar only.
+    """
+
+    func.scalar_only = True
+    return func
+
+
+def is_scalar_only(func: Callable) -> bool:
+    """Returns True if the conversion function has been marked with scalar_only."""
+    return getattr(func, "scalar_only", False)
+
+
+def uses_params(*param_keys: str) -> Callable[[Callable], Callable]:
+    """Marks a conversion function as only using the given keys of the column parameters, and as
+    accepting a 2D array of values with a column for each column of the catalogue. Columns with the
+    same function and the same values of these keys can then be converted together as one block
+    (see dataproc.process_float_column_blocks).
+
+    Parameters
+    ----------
+    param_keys : str
+        The keys of the column parameters that the function uses, i.e. 'zero_point'.
+
+    Returns
+    -------
+    Callable[[Callable], Callable]
+        The decorator, which returns the same function, marked with its parameter keys.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func.param_keys = param_keys
+        return func
+
+    return decorator
+
+
+def get_block_params(func: Callable, field_params: Dict) -> Optional[Tuple]:
+    """Returns the values of the column parameters used by a conversion function marked with uses_params,
+    which columns must share to be converted together, or None if the function cannot convert a block of columns.
+    """
+
+    param_keys = getattr(func, "param_keys", None)
+    if param_keys is None or is_scalar_only(func):
+        return None
+
+    return tuple(field_params.get(k) for k in param_keys)
 
 
 # Conversion functions
 
 
+@uses_params("zero_point")
 def flux_to_mag(fluxes, field_params: Dict):
     """Function that converts fluxes to magnitudes.
 
@@ -26,6 +92,7 @@ def flux_to_mag(fluxes, field_params: Dict):
     return -2.5 * np.log10(fluxes) + zp
 
 
+@uses_params()
 def log_values(values, field_params: dict):
     """Returns the log of the given values or value."""
     return np.log10(values)
@@ -84,3 +151,40 @@ def get_conversion_function(input_unit: str, output_unit: str):
 
             # raise error, there is no conversion function that matches
             raise ValueError(f"{input_unit} cannot be converted to {output_unit}")
+
+
+def apply_conversion(func: Callable, column, field_params: Dict) -> np.ndarray:
+    """Applies a conversion function to a whole column at once. The column is turned into a
+    float array (with missing values as NaNs) and passed to the function in one call, so the
+    conversion runs as a single NumPy operation. Functions marked with scalar_only are instead
+    applied one element at a time.
+
+    Parameters
+    ----------
+    func : Callable
+        The conversion function, as returned by get_conversion_function.
+    column : array-like
+        The column of values to convert.
+    field_params : Dict
+        The dictionary of metadata for that column.
+
+    Returns
+    -------
+    np.ndarray
+        The array of converted values.
+    """
+
+    values = pd.Series(column).to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # invalid values (i.e. negative fluxes) become NaNs and are filtered out afterwards
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if is_scalar_only(func):
+            converted = np.fromiter(
+                (func(v, field_params) for v in values),
+                dtype=np.float64,
+                count=len(values),
+            )
+        else:
+            converted = np.asarray(func(values, field_params), dtype=np.float64)
+
+    return converted
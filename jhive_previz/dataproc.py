@@ -1,17 +1,39 @@
 import numpy as np
-from astropy.table import Table
 import pandas as pd
 import re
+import functools
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, Future
 from pydantic import BaseModel, ConfigDict
-from typing import Union, Mapping, List, Tuple, Optional, Dict, TypeVar
-
+from typing import (
+    Callable,
+    Union,
+    Mapping,
+    Iterable,
+    List,
+    Tuple,
+    Optional,
+    Dict,
+    TypeVar,
+)
+
+from . import bundle
+from . import cache
+from . import filterobjects
+from . import profiling
+from . import schema
+from . import sketches
+from . import stats
 from . import conversions as conversions
+from . import tiles
 from . import utils
 
 # Custom pandas datatype
 PandasDataFrame = TypeVar("pandas.core.frame.DataFrame")
 
+# the default number of rows of the main catalogue to process at a time when streaming
+DEFAULT_CHUNK_SIZE = 100_000
+
 
 # Classes
 
@@ -35,6 +57,11 @@ class Catalogue(BaseModel):
     output_columns: List = []
     conversion_functions: List = []
     decimals_to_round: Dict = {}
+    data_types: Dict = {}
+    # the table of ingest flags made from the catalogue as it is loaded, and its header keywords
+    # (see filterobjects.make_flag_table)
+    flags: PandasDataFrame | None = None
+    flag_header: Dict = {}
 
 
 # Functions
@@ -42,8 +69,10 @@ class Catalogue(BaseModel):
 ## Utility functions
 
 
-def get_data_output_filepath(output_path: Path, suffix: str) -> Path:
-    """Returns the path to output the .csv to.
+def get_data_output_filepath(
+    output_path: Path, suffix: str, output_format: str = "csv"
+) -> Path:
+    """Returns the path to output the data file to.
 
     Parameters
     ----------
@@ -51,19 +80,26 @@ def get_data_output_filepath(output_path: Path, suffix: str) -> Path:
         The path to the directory where the file will be saved.
     suffix : str
         The suffix string to add to the file name.
+    output_format : str, optional
+        The format of the file, one of the keys of utils.OUTPUT_FORMATS, by default "csv"
 
     Returns
     -------
     Path
-        The full path (including file name) to write the .csv output to.
+        The full path (including file name) to write the output to.
     """
 
-    data_output_filename = "catalog_" + suffix + ".csv"
+    data_output_filename = "catalog_" + suffix + utils.OUTPUT_FORMATS[output_format]
 
     return output_path / data_output_filename
 
 
-def load_dataframe(file_name: str, cat: Catalogue) -> Catalogue:
+def load_dataframe(
+    file_name: str,
+    cat: Catalogue,
+    memmap: bool = False,
+    extra_columns: Optional[List[str]] = None,
+) -> Catalogue:
     """Loads in a dataframe as a variable of a Catalogue object, and updates the 'loaded' variable.
 
     Parameters
@@ -72,6 +108,12 @@ def load_dataframe(file_name: str, cat: Catalogue) -> Catalogue:
         The key associated with the file name in the config file, i.e. 'cat_filename'
     cat : Catalogue
         The Catalogue object to load the dataframe to.
+    memmap : bool, optional
+        If True, fits files are memory-mapped and loaded as a utils.FitsColumnView instead of a dataframe,
+        so each column is only read when it is processed. By default False.
+    extra_columns : Optional[List[str]], optional
+        The names of any other input columns to read along with the columns to use, i.e. the flux error
+        columns for the ingest flags, by default None
 
     Returns
     -------
@@ -88,7 +130,12 @@ def load_dataframe(file_name: str, cat: Catalogue) -> Catalogue:
     if cat.file_path is not None:
         # try to load in file
         try:
-            df = utils.read_table(cat.file_path, cat.file_format)
+            # only read in the columns that are needed, or all of them if none have been set
+            columns = (cat.input_columns + (extra_columns or [])) or None
+            if memmap and cat.file_format == "fits":
+                df = utils.FitsColumnView(cat.file_path, columns)
+            else:
+                df = utils.read_table(cat.file_path, cat.file_format, columns=columns)
 
             # if successful, update the data_frames dictionary with the dataframe
             cat.loaded = True
@@ -110,6 +157,64 @@ def load_dataframe(file_name: str, cat: Catalogue) -> Catalogue:
     return cat
 
 
+def get_column_data_types(config_params: Mapping, field_params: Mapping) -> Dict:
+    """Gets the data_type of every column to use from the fields files.
+
+    Parameters
+    ----------
+    config_params : Mapping
+        The dictionary of parameters from the config file.
+    field_params : Mapping
+        The dictionary of parameters from the fields files.
+
+    Returns
+    -------
+    Dict
+        The data_type of each column, with the column names as keys.
+    """
+
+    data_types = {}
+
+    for base_file, columns in config_params["columns_to_use"].items():
+        column_specs = schema.get_catalogue_schema(field_params[base_file]).column_specs
+        for c in columns:
+            data_types[c] = column_specs[c].data_type
+
+    return data_types
+
+
+def get_loaded_dataframes(
+    data_frames: Dict[str, Catalogue], names: List[str]
+) -> List[pd.DataFrame]:
+    """Returns the dataframes of the catalogues with the given names that were loaded, printing a message
+    for any catalogue that was not loaded (its columns will not be in the output).
+    """
+
+    loaded_dfs = []
+    for name in names:
+
+        if data_frames[name].loaded:
+            loaded_dfs.append(data_frames[name].df)
+
+        else:
+            # dataframe failed to load
+            print(
+                f"{data_frames[name]} was not properly loaded, its columns will not be present in the final dataframe."
+            )
+
+    return loaded_dfs
+
+
+def get_output_decimals(data_frames: Dict[str, Catalogue]) -> Dict[str, int]:
+    """Returns the number of decimals to write for each output column of all of the catalogues."""
+
+    decimals = {}
+    for cat in data_frames.values():
+        decimals.update(cat.decimals_to_round)
+
+    return decimals
+
+
 ## Functional functions
 
 
@@ -138,46 +243,72 @@ def populate_column_information(
 
     # iterate through output columns for each catalog file
     for base_file, columns in config_params["columns_to_use"].items():
+        cat_schema = schema.get_catalogue_schema(field_params[base_file])
+
         if base_file not in data_frames.keys():
 
             # add the catalog to the dictionary of data frames
             data_frames[base_file] = Catalogue(
                 file_name=config_params["file_names"][base_file],
                 file_path=utils.get_cat_filepath(base_file, config_params),
-                file_format=field_params[base_file]["file_format"],
+                file_format=cat_schema.file_format,
             )
+        cat = data_frames[base_file]
 
         for c in columns:
+            spec = cat_schema.column_specs[c]
 
             # get column name that is in the input file and add to list of columns to use
-            col_name = field_params[base_file]["columns"][c]["input_column_name"]
-            data_frames[base_file].input_columns.append(col_name)
-            data_frames[base_file].output_columns.append(c)
+            cat.input_columns.append(spec.input_column_name)
+            cat.output_columns.append(c)
+            cat.data_types[c] = spec.data_type
 
             # add to columns to round if there is a number of decimals supplied
-            if field_params[base_file]["columns"][c]["output_num_decimals"] is not None:
-                data_frames[base_file].decimals_to_round[c] = field_params[base_file][
-                    "columns"
-                ][c]["output_num_decimals"]
-
-            # get any conversion functions needed for columns
-            try:
-                # add the function to the class
-                data_frames[base_file].conversion_functions.append(
-                    conversions.get_conversion_function(
-                        field_params[base_file]["columns"][c]["input_units"],
-                        field_params[base_file]["columns"][c]["output_units"],
-                    )
-                )
-            except ValueError:
+            if spec.output_num_decimals is not None:
+                cat.decimals_to_round[c] = spec.output_num_decimals
+
+            # add the conversion function of the column, which was found when the fields file was compiled
+            if spec.conversion_error is not None:
                 # no conversion function exists for these units
                 raise UnitConversionError(
-                    f"Unit conversion failed for column {c}, no conversion function exists for {field_params[base_file][c]['input_units']} to {field_params[base_file][c]['output_units']}."
+                    f"Unit conversion failed for column {c}, no conversion function exists for {spec.input_units} to {spec.output_units}."
                 )
+            cat.conversion_functions.append(spec.conversion_function)
 
     return data_frames
 
 
+def create_catalogues(
+    config_params: Mapping, field_params: Mapping
+) -> Dict[str, Catalogue]:
+    """Creates a Catalogue object for the main catalogue and every other catalogue with columns to use,
+    and populates their column information with populate_column_information.
+
+    Parameters
+    ----------
+    config_params : Mapping
+        The dictionary of parameters from the config file.
+    field_params : Mapping
+        The dictionary of parameters from the fields file.
+
+    Returns
+    -------
+    Dict[str, Catalogue]
+        The dictionary of Catalogue objects, with the file name keys as keys.
+    """
+
+    data_frames: Dict[str, Catalogue] = {}
+
+    # add the main catalogue file first and populate columns to use per file for it and any additional data files
+    data_frames["cat_filename"] = Catalogue(
+        file_name=config_params["file_names"]["cat_filename"],
+        file_path=utils.get_cat_filepath("cat_filename", config_params),
+        file_format=field_params["cat_filename"]["file_format"],
+    )
+
+    return populate_column_information(data_frames, config_params, field_params)
+
+
 def filter_column_values(column: pd.Series, col_field_params: Dict):
     """Filters values in a Pandas column (a Series) such that all values are finite. It also filters
     values so that they are NaNs if they are outside the range given for that column in the fields.yaml
@@ -208,16 +339,191 @@ def filter_column_values(column: pd.Series, col_field_params: Dict):
         # we have only a min
         column = np.where(column >= min_val, column, np.nan)
 
-    elif max_val:
+    elif max_val is not None:
         # we only have a max
         column = np.where(max_val >= column, column, np.nan)
 
     return column
 
 
-def process_column_data(cat: Catalogue, field_params: Dict) -> Catalogue:
+def get_float_column_blocks(
+    cat: Catalogue, column_specs: Mapping[str, "schema.ColumnSpec"]
+) -> Dict[Tuple, List[int]]:
+    """Groups the float columns of the catalogue that can be converted, filtered and rounded together as a block.
+    The columns of a block have the same conversion function (or none), the same values of the column parameters
+    used by that function (see conversions.uses_params), and the same number of decimals. Columns with a conversion
+    function that is not marked with uses_params, and columns that are not in the dataframe, are not in any block.
+
+    Parameters
+    ----------
+    cat : Catalogue
+        The catalogue, with its dataframe loaded.
+    column_specs : Mapping[str, schema.ColumnSpec]
+        The compiled parameters of the columns of the catalogue.
+
+    Returns
+    -------
+    Dict[Tuple, List[int]]
+        The indices of the columns (in cat.output_columns) of each block, with the conversion function, the values
+        of the parameters it uses and the number of decimals of the block as keys.
+    """
+
+    blocks: Dict[Tuple, List[int]] = {}
+
+    for i, c in enumerate(cat.output_columns):
+        spec = column_specs[c]
+        if spec.data_type != "float" or cat.input_columns[i] not in cat.df.columns:
+            continue
+
+        func = cat.conversion_functions[i]
+        block_params = (
+            () if func is None else conversions.get_block_params(func, spec.params)
+        )
+        if block_params is None:
+            continue
+
+        key = (func, block_params, cat.decimals_to_round.get(c))
+        blocks.setdefault(key, []).append(i)
+
+    return blocks
+
+
+def convert_filter_round_block(
+    columns: List[pd.Series],
+    func: Optional[Callable],
+    col_field_params: Mapping,
+    min_vals: np.ndarray,
+    max_vals: np.ndarray,
+    num_decimals: Optional[int],
+    out: np.ndarray,
+):
+    """Converts, filters and rounds a block of float columns, writing them into the columns of out. The values are
+    converted by the conversion function in one call for the whole block, then any values that are not finite or
+    are outside of the range of their column are replaced with NaNs, and the block is rounded, all in place in out.
+    This gives the same values as apply_conversion, filter_column_values and rounding each column.
+
+    Parameters
+    ----------
+    columns : List[pd.Series]
+        The input columns of the block.
+    func : Optional[Callable]
+        The conversion function of the block, or None if the columns are not converted.
+    col_field_params : Mapping
+        The parameters of one of the columns, to pass to the conversion function (the columns of a block share
+        the values of the parameters that it uses).
+    min_vals : np.ndarray
+        The filt_min_val of each column, with -inf for columns with no minimum.
+    max_vals : np.ndarray
+        The filt_max_val of each column, with inf for columns with no maximum.
+    num_decimals : Optional[int]
+        The number of decimals to round the block to, or None to not round it.
+    out : np.ndarray
+        The float64 array to write the block to, with a column for each input column.
+    """
+
+    for j, column in enumerate(columns):
+        out[:, j] = column.to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # invalid values (i.e. negative fluxes) become NaNs and are filtered out with the values out of range
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if func is not None:
+            out[...] = func(out, col_field_params)
+
+        invalid = ~np.isfinite(out)
+        if np.isfinite(min_vals).any():
+            invalid |= out < min_vals
+        if np.isfinite(max_vals).any():
+            invalid |= out > max_vals
+    np.copyto(out, np.nan, where=invalid)
+
+    if num_decimals is not None:
+        np.round(out, num_decimals, out=out)
+
+
+def process_float_column_blocks(
+    cat: Catalogue,
+    column_specs: Mapping[str, "schema.ColumnSpec"],
+    num_threads: int = 1,
+) -> Dict[str, np.ndarray]:
+    """Converts, filters and rounds the float columns of the catalogue that can be processed as blocks
+    (see get_float_column_blocks), with convert_filter_round_block. Every block is written into one
+    preallocated array, with the columns of each block next to each other.
+
+    Parameters
+    ----------
+    cat : Catalogue
+        The catalogue, with its dataframe loaded.
+    column_specs : Mapping[str, schema.ColumnSpec]
+        The compiled parameters of the columns of the catalogue.
+    num_threads : int, optional
+        The number of threads to process the blocks with, by default 1
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        The processed values of each column in a block, with the output column names as keys.
+    """
+
+    blocks = get_float_column_blocks(cat, column_specs)
+    num_columns = sum(len(indices) for indices in blocks.values())
+
+    # the columns of the array are contiguous, so each column is a contiguous view
+    output = np.empty((len(cat.df), num_columns), dtype=np.float64, order="F")
+
+    block_columns = {}
+    block_tasks = []
+    start = 0
+    for (func, _, num_decimals), indices in blocks.items():
+        out = output[:, start : start + len(indices)]
+        start += len(indices)
+
+        specs = [column_specs[cat.output_columns[i]] for i in indices]
+        min_vals = np.array(
+            [
+                -np.inf if spec.filt_min_val is None else spec.filt_min_val
+                for spec in specs
+            ]
+        )
+        max_vals = np.array(
+            [
+                np.inf if spec.filt_max_val is None else spec.filt_max_val
+                for spec in specs
+            ]
+        )
+
+        block_tasks.append(
+            functools.partial(
+                convert_filter_round_block,
+                [cat.df[cat.input_columns[i]] for i in indices],
+                func,
+                specs[0].params,
+                min_vals,
+                max_vals,
+                num_decimals,
+                out,
+            )
+        )
+        for j, spec in enumerate(specs):
+            block_columns[spec.name] = out[:, j]
+
+    # numpy releases the GIL, so the blocks can be processed in parallel threads
+    if num_threads > 1 and len(block_tasks) > 1:
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            for future in [executor.submit(task) for task in block_tasks]:
+                future.result()
+    else:
+        for task in block_tasks:
+            task()
+
+    return block_columns
+
+
+def process_column_data(
+    cat: Catalogue, field_params: Dict, compact: bool = False, num_threads: int = 1
+) -> Catalogue:
     """Iterates through the columns to use and applies the associated conversion function
-    to the column.
+    to the column. Float columns that can be processed together are converted, filtered and
+    rounded as blocks (see process_float_column_blocks), and any other columns one at a time.
 
     Parameters
     ----------
@@ -225,6 +531,11 @@ def process_column_data(cat: Catalogue, field_params: Dict) -> Catalogue:
         The class object that stores the dataframe and the columns to use and conversion function lists.
     field_params : Dict
         The field parameters dictionary for that catalog.
+    compact : bool, optional
+        If True, each column is stored in the narrowest safe dtype for its data_type (see utils.get_column_dtypes),
+        by default False
+    num_threads : int, optional
+        The number of threads to process the blocks of float columns with, by default 1
 
     Returns
     -------
@@ -232,10 +543,14 @@ def process_column_data(cat: Catalogue, field_params: Dict) -> Catalogue:
         The same class object as above, modified by the function.
     """
 
+    column_specs = schema.get_catalogue_schema(field_params).column_specs
+    block_columns = process_float_column_blocks(cat, column_specs, num_threads)
+
     # dict of new columns
     new_cols = {}
 
     for i in range(0, len(cat.input_columns)):
+        spec = column_specs[cat.output_columns[i]]
 
         # if the column doesn't exist in the dataframe, add empty one to dictionary and move along
         if cat.input_columns[i] not in cat.df.columns:
@@ -245,41 +560,291 @@ def process_column_data(cat: Catalogue, field_params: Dict) -> Catalogue:
             )
             continue
 
+        # the column was already processed with its block
+        if cat.output_columns[i] in block_columns:
+            new_cols[cat.output_columns[i]] = block_columns[cat.output_columns[i]]
+            continue
+
         # only apply a function if conversion function is not None
         if cat.conversion_functions[i] is not None:
-            # apply the conversion function to the associated column
-            new_cols[cat.output_columns[i]] = cat.df[cat.input_columns[i]].apply(
+            # apply the conversion function to the whole associated column at once
+            new_cols[cat.output_columns[i]] = conversions.apply_conversion(
                 cat.conversion_functions[i],
-                field_params=field_params["columns"][cat.output_columns[i]],
+                cat.df[cat.input_columns[i]],
+                spec.params,
             )
         else:
             new_cols[cat.output_columns[i]] = cat.df[cat.input_columns[i]]
 
         # filter values in columns with floats to ensure they are finite and fall within the given range
-        if field_params["columns"][cat.output_columns[i]]["data_type"] == "float":
+        if spec.data_type == "float":
             new_cols[cat.output_columns[i]] = filter_column_values(
-                new_cols[cat.output_columns[i]],
-                field_params["columns"][cat.output_columns[i]],
+                new_cols[cat.output_columns[i]], spec.params
             )
 
-    # replace catalogue dataframe with new dataframe
-    cat.df = pd.DataFrame(new_cols)
+    # replace catalogue dataframe with new dataframe, without copying the columns that were processed in blocks
+    cat.df = pd.DataFrame(new_cols, copy=False)
 
-    # round the relevant columns
-    cat.df.round(cat.decimals_to_round)
+    # round the relevant columns that were not rounded with their block
+    cat.df = cat.df.round(
+        {c: d for c, d in cat.decimals_to_round.items() if c not in block_columns}
+    )
+
+    if compact:
+        cat.df = utils.set_column_dtypes(
+            cat.df, cat.data_types, cat.decimals_to_round, compact
+        )
 
     return cat
 
 
+def index_catalogues_by_id(other_dfs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    """Indexes each of the dataframes by its 'id' column, so they can be joined to the main dataframe."""
+    return [df.set_index("id") for df in other_dfs]
+
+
+def join_catalogues(
+    df_main: pd.DataFrame, other_dfs: List[pd.DataFrame], indexed: bool = False
+) -> pd.DataFrame:
+    """Joins all of the other dataframes to the main dataframe on the 'id' column in a single pass.
+    Each other dataframe is indexed by 'id' once, and every object in the main dataframe is kept
+    (objects without an entry in another dataframe have empty values for its columns).
+
+    Parameters
+    ----------
+    df_main : pd.DataFrame
+        The main dataframe, with an 'id' column.
+    other_dfs : List[pd.DataFrame]
+        The other dataframes to join to the main one, each with an 'id' column.
+    indexed : bool, optional
+        If True, the other dataframes have already been indexed by id with index_catalogues_by_id,
+        i.e. to join them to many chunks of the main dataframe. By default False.
+
+    Returns
+    -------
+    pd.DataFrame
+        The merged dataframe, with the same index and row order as the main dataframe.
+    """
+
+    if len(other_dfs) == 0:
+        return df_main
+
+    if not indexed:
+        other_dfs = index_catalogues_by_id(other_dfs)
+
+    # join every table to the main table together
+    df_merged = df_main.set_index(pd.Index(df_main["id"])).join(other_dfs, how="left")
+    df_merged.index = df_main.index
+
+    return df_merged
+
+
+def index_ingest_flags(df_ingest: pd.DataFrame) -> pd.Series:
+    """Returns the 'ingest_viz' column of the table of flags, indexed by 'id'."""
+    return df_ingest.set_index("id")["ingest_viz"]
+
+
+def get_ingest_mask(
+    df_ingest: Union[pd.DataFrame, pd.Series], ids: pd.Series
+) -> np.ndarray:
+    """Aligns the 'ingest_viz' flags with the given object ids. Objects that are not in the flag
+    table are not flagged.
+
+    Parameters
+    ----------
+    df_ingest : Union[pd.DataFrame, pd.Series]
+        The table of flags, with 'id' and 'ingest_viz' columns, or the 'ingest_viz' flags
+        already indexed by id with index_ingest_flags.
+    ids : pd.Series
+        The ids of the objects to get the flags for.
+
+    Returns
+    -------
+    np.ndarray
+        A boolean array that is True for objects with a True 'ingest_viz' flag.
+    """
+
+    if isinstance(df_ingest, pd.DataFrame):
+        df_ingest = index_ingest_flags(df_ingest)
+
+    ingest_viz = df_ingest.reindex(ids, fill_value=False)
+
+    return ingest_viz.to_numpy(dtype=bool)
+
+
+def get_min_max_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Returns a dataframe with two rows, the minimum and maximum of each column of the dataframe
+    (ignoring NaNs). The minimum and maximum of a whole catalogue can then be found from these rows
+    for each of its chunks, without keeping the chunks in memory.
+    """
+    return df.agg(["min", "max"])
+
+
 ## Organizational functions
 
 
+def load_and_process_catalogue(
+    file_name: str,
+    cat: Catalogue,
+    field_params: Mapping,
+    memmap: bool = False,
+    cache_dir: Optional[Path] = None,
+    max_cache_bytes: int = cache.DEFAULT_MAX_CACHE_BYTES,
+    compact: bool = False,
+    make_flags: bool = False,
+) -> Catalogue:
+    """Loads in the dataframe of a Catalogue object and, if it was loaded, converts and filters its columns.
+    If a cache directory is given, the processed dataframe is read from the cache when the catalogue file and
+    its columns have not changed since it was cached, and is written to the cache otherwise.
+    If make_flags is True, the ingest flags are also made from the fluxes and flux errors of the catalogue
+    before they are converted (see filterobjects.make_flag_table), and stored in the flags of the Catalogue.
+
+    Parameters
+    ----------
+    file_name : str
+        The key associated with the file name in the config file, i.e. 'cat_filename'
+    cat : Catalogue
+        The Catalogue object to load and process.
+    field_params : Mapping
+        The field parameters dictionary for that catalog.
+    memmap : bool, optional
+        If True, fits files are memory-mapped, by default False
+    cache_dir : Optional[Path], optional
+        The path to the cache directory, by default None, which does not use a cache.
+    max_cache_bytes : int, optional
+        The maximum total size of the cache directory, by default cache.DEFAULT_MAX_CACHE_BYTES
+    compact : bool, optional
+        If True, the columns are stored in the narrowest safe dtypes, by default False
+    make_flags : bool, optional
+        If True, make the ingest flags from the catalogue as it is loaded, by default False. The processed
+        dataframe is then not read from the cache, as the flags need the unprocessed fluxes.
+
+    Returns
+    -------
+    Catalogue
+        The updated Catalogue object.
+    """
+
+    use_cache = (
+        cache_dir is not None and cat.file_path is not None and cat.file_path.is_file()
+    )
+
+    # the flux error columns are only read for the flags
+    flag_columns = None
+    if make_flags:
+        flag_columns = filterobjects.get_flag_input_columns(
+            cat.output_columns, field_params["columns"]
+        )
+
+    if use_cache:
+        cache_key = cache.get_cache_key(
+            cat.file_path,
+            cat.file_format,
+            cat.input_columns,
+            cat.output_columns,
+            field_params["columns"],
+            compact,
+        )
+        df = None if make_flags else cache.read_cached_dataframe(cache_dir, cache_key)
+
+        if df is not None:
+            # the processed dataframe is already cached
+            cat.df = df
+            cat.loaded = True
+            return cat
+
+    with profiling.stage("read_table"):
+        cat = load_dataframe(file_name, cat, memmap, flag_columns)
+
+    if cat.loaded:
+        if make_flags:
+            # flag the fluxes while they are in memory, before they are converted to magnitudes
+            with profiling.stage("make_flag_table", len(cat.df)):
+                cat.flags, cat.flag_header = filterobjects.make_flag_table(
+                    cat.output_columns, field_params["columns"], cat.df
+                )
+
+        with profiling.stage("process_column_data", len(cat.df)):
+            cat = process_column_data(cat, field_params, compact)
+
+        if use_cache:
+            cache.write_cached_dataframe(cache_dir, cache_key, cat.df, max_cache_bytes)
+
+    return cat
+
+
+def submit_additional_catalogues(
+    data_frames: Dict[str, Catalogue],
+    names: List[str],
+    field_params: Mapping,
+    memmap: bool = False,
+    num_workers: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    max_cache_bytes: int = cache.DEFAULT_MAX_CACHE_BYTES,
+    compact: bool = False,
+) -> Tuple[ThreadPoolExecutor, Dict[str, Future]]:
+    """Starts loading and processing the catalogues with the given names in the background, with
+    load_and_process_catalogue in a pool of threads. The executor should be shut down once the
+    results of the futures have been collected.
+
+    Parameters
+    ----------
+    data_frames : Dict[str, Catalogue]
+        The dictionary of Catalogue objects.
+    names : List[str]
+        The keys of the catalogues to load.
+    field_params : Mapping
+        The field parameters from the field.yaml files.
+    memmap : bool, optional
+        If True, fits catalogues are memory-mapped, by default False
+    num_workers : Optional[int], optional
+        The number of threads, by default None, which uses one thread per catalogue.
+    cache_dir : Optional[Path], optional
+        The path to the cache directory, by default None, which does not use a cache.
+    max_cache_bytes : int, optional
+        The maximum total size of the cache directory, by default cache.DEFAULT_MAX_CACHE_BYTES
+    compact : bool, optional
+        If True, the columns are stored in the narrowest safe dtypes, by default False
+
+    Returns
+    -------
+    Tuple[ThreadPoolExecutor, Dict[str, Future]]
+        The executor, and the future of the processed Catalogue for each of the names.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=num_workers or max(len(names), 1))
+    futures = {
+        name: executor.submit(
+            load_and_process_catalogue,
+            name,
+            data_frames[name],
+            field_params[name],
+            memmap,
+            cache_dir,
+            max_cache_bytes,
+            compact,
+        )
+        for name in names
+    }
+
+    return executor, futures
+
+
 def process_data(
     config_params: Mapping,
     field_params: Mapping,
     output_path: Path,
     use_flag_file: bool,
     flag_file_path: Optional[Path] = None,
+    memmap: bool = False,
+    num_workers: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    max_cache_bytes: int = cache.DEFAULT_MAX_CACHE_BYTES,
+    output_format: str = "csv",
+    compact: bool = False,
+    column_bundle: bool = False,
+    tile_order: Optional[int] = None,
+    make_flags: bool = False,
 ) -> pd.DataFrame:
     """This is the main function that processes the data file and writes out the processed
     version to a .csv. The function converts columns as desired, filters them to be NaNs outside
@@ -297,7 +862,32 @@ def process_data(
     use_flag_file: bool
         If True, we will create two catalogues, a 'core' and a 'raw', where 'core' consists of objects that have 'ingest_viz' flags that are True.
     flag_file_path: Optional[Path]
-        The full path to the flag file that has the 'ingest_viz' column. Required if use_flag_file is True, None if not.
+        The full path to the flag file (see filterobjects.read_ingest_viz). Required if use_flag_file is True and make_flags is
+        False. If make_flags is True, the flags that are made are written to this file instead, unless it is None.
+    memmap: bool
+        If True, fits catalogues are memory-mapped, and only the columns needed are read as they are processed. By default False.
+    num_workers: Optional[int]
+        The number of threads used to load and process the additional catalogues while the main catalogue is processed.
+        By default None, which uses one thread per additional catalogue.
+    cache_dir: Optional[Path]
+        The path to a directory to cache the processed catalogues in, so that catalogues whose files and columns have
+        not changed are not processed again. By default None, which does not use a cache.
+    max_cache_bytes: int
+        The maximum total size of the cache directory, by default cache.DEFAULT_MAX_CACHE_BYTES.
+    output_format: str
+        The format to write the data files in, one of the keys of utils.OUTPUT_FORMATS. By default "csv".
+    compact: bool
+        If True, every column is stored in the narrowest safe dtype for its data_type in memory and in the output files
+        (i.e. float32 and Int32, see utils.get_column_dtypes). By default False.
+    column_bundle: bool
+        If True, each output is also written as a bundle of binary typed-array columns with a json manifest
+        (see bundle.ColumnBundleWriter), for clients to load without parsing. By default False.
+    tile_order: Optional[int]
+        If given, each output is also partitioned into HEALPix tiles of this order by ra and dec, with one file
+        per tile and a tile index (see tiles.TiledDataWriter). By default None, which does not write tiles.
+    make_flags: bool
+        If True (with use_flag_file), the ingest flags are made from the main catalogue as it is processed, in the same
+        way as filterobjects.create_and_write_flag_file, instead of being read from the flag file. By default False.
 
     Returns
     -------
@@ -305,80 +895,392 @@ def process_data(
         The new dataframe.
     """
 
-    # read in flag file if it's being used
-    if use_flag_file:
-        df_ingest = utils.read_table(flag_file_path, file_format="fits")
+    make_flags = use_flag_file and make_flags
 
-    # Create dictionary to store all file names and data frames once loaded
-    data_frames: Dict[str, Catalogue] = {}
+    # read in flag file if it's being used, and the flags are not made in this run
+    if use_flag_file and not make_flags:
+        with profiling.stage("read_flag_file") as stage:
+            ingest_viz = filterobjects.read_ingest_viz(flag_file_path)
+            stage["num_rows"] = len(ingest_viz)
 
-    # load in main catalogue file and populate columns to use per file and load in any additional data files
-    data_frames["cat_filename"] = Catalogue(
-        file_name=config_params["file_names"]["cat_filename"],
-        file_path=utils.get_cat_filepath("cat_filename", config_params),
-        file_format=field_params["cat_filename"]["file_format"],
+    # Create dictionary to store all file names and data frames once loaded
+    data_frames = create_catalogues(config_params, field_params)
+
+    # start loading and processing any additional catalogues in the background
+    additional_names = [name for name in data_frames.keys() if name != "cat_filename"]
+    executor, futures = submit_additional_catalogues(
+        data_frames,
+        additional_names,
+        field_params,
+        memmap,
+        num_workers,
+        cache_dir,
+        max_cache_bytes,
+        compact,
     )
-    data_frames = populate_column_information(data_frames, config_params, field_params)
 
-    # read in main catalogue and convert and filter necessary columns
-    data_frames["cat_filename"] = load_dataframe(
-        "cat_filename", data_frames["cat_filename"]
-    )
+    try:
+        # read in main catalogue and convert and filter necessary columns
+        with profiling.stage("load_and_process_catalogue[cat_filename]") as stage:
+            data_frames["cat_filename"] = load_and_process_catalogue(
+                "cat_filename",
+                data_frames["cat_filename"],
+                field_params["cat_filename"],
+                memmap,
+                cache_dir,
+                max_cache_bytes,
+                compact,
+                make_flags,
+            )
+            stage["num_rows"] = len(data_frames["cat_filename"].df)
 
-    data_frames["cat_filename"] = process_column_data(
-        data_frames["cat_filename"], field_params["cat_filename"]
-    )
+        if make_flags:
+            main_cat = data_frames["cat_filename"]
+            ingest_viz = filterobjects.get_ingest_viz(
+                main_cat.flags, main_cat.flag_header
+            )
+
+            # write out the flags as the flag file
+            if flag_file_path is not None:
+                with profiling.stage("write_flag_file", len(main_cat.flags)):
+                    filterobjects.write_flag_file(
+                        main_cat.flags,
+                        main_cat.flag_header,
+                        flag_file_path,
+                        overwrite=True,
+                    )
+
+        # wait for the additional catalogues to be ready
+        with profiling.stage("wait_for_additional_catalogues"):
+            for name, future in futures.items():
+                data_frames[name] = future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    # join the columns of all the loaded catalogues to the main one
+    with profiling.stage("join_catalogues") as stage:
+        other_dfs = get_loaded_dataframes(data_frames, additional_names)
+        df_merged = join_catalogues(data_frames["cat_filename"].df, other_dfs)
+
+        # keep ints and bools with missing values from the join as ints and bools (in compact dtypes if needed)
+        decimals = get_output_decimals(data_frames)
+        df_merged = utils.set_column_dtypes(
+            df_merged,
+            get_column_data_types(config_params, field_params),
+            decimals,
+            compact,
+        )
+        stage["num_rows"] = len(df_merged)
 
     if use_flag_file:
-        # get two catalogues, one with good object and one with raw
-        df_core = data_frames["cat_filename"].df[df_ingest["ingest_viz"]]
-        df_raw = data_frames["cat_filename"].df[~df_ingest["ingest_viz"]]
+        # get two catalogues, one with good object and one with raw, matching the flags by id
+        with profiling.stage("split_core_and_raw", len(df_merged)):
+            ingest_mask = get_ingest_mask(ingest_viz, df_merged["id"])
+            df_core = df_merged[ingest_mask]
+            df_raw = df_merged[~ingest_mask]
 
     else:
         # just get one catalogue with everything
-        df_raw = data_frames["cat_filename"].df
+        df_raw = df_merged
 
-    # if there is one or more additional dfs loaded
-    if len(data_frames.keys()) > 1:
+    # write out the data to a file, with each column at its number of decimals
+    with profiling.stage("write_raw", len(df_raw)):
+        output_file_path_raw = get_data_output_filepath(
+            output_path, "raw", output_format
+        )
+        utils.write_data(df_raw, output_file_path_raw, decimals)
+        if column_bundle:
+            bundle.write_column_bundle(df_raw, output_path, "raw", decimals)
+        if tile_order is not None:
+            tiles.write_tiled_data(
+                df_raw, output_path, "raw", output_format, tile_order, decimals
+            )
+
+    # write out core data if necessary
+    if use_flag_file:
+        with profiling.stage("write_core", len(df_core)):
+            output_file_path_core = get_data_output_filepath(
+                output_path, "core", output_format
+            )
+            utils.write_data(df_core, output_file_path_core, decimals)
+            if column_bundle:
+                bundle.write_column_bundle(df_core, output_path, "core", decimals)
+            if tile_order is not None:
+                tiles.write_tiled_data(
+                    df_core, output_path, "core", output_format, tile_order, decimals
+                )
 
-        for name in data_frames.keys():
+        return df_raw, df_core
+    else:
+        return df_raw
 
-            if name == "cat_filename":
-                # skip, this one is already completed
-                continue
 
-            # load in data frame
-            data_frames[name] = load_dataframe(name, data_frames[name])
+def process_data_in_chunks(
+    config_params: Mapping,
+    field_params: Mapping,
+    output_path: Path,
+    use_flag_file: bool,
+    flag_file_path: Optional[Path] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    memmap: bool = False,
+    num_workers: Optional[int] = None,
+    cache_dir: Optional[Path] = None,
+    max_cache_bytes: int = cache.DEFAULT_MAX_CACHE_BYTES,
+    output_format: str = "csv",
+    compact: bool = False,
+    column_bundle: bool = False,
+    tile_order: Optional[int] = None,
+    make_flags: bool = False,
+    percentiles: Optional[Iterable[float]] = stats.DEFAULT_PERCENTILES,
+) -> Dict[str, Tuple[pd.DataFrame, int]]:
+    """Processes the data in the same way as process_data, but streams the main catalogue through in chunks of rows
+    so that the peak memory depends on the chunk size rather than the size of the catalogue. Each chunk is read,
+    converted and filtered, joined to the additional catalogues (which are loaded in whole and indexed by id once),
+    split into core and raw with the ingest flags, and appended to the output files before the next chunk is read.
+    The output files are the same as those written by process_data.
 
-            if data_frames[name].loaded:
-                # if data frame is loaded, convert any columns needed and join to previous table
-                data_frames[name] = process_column_data(
-                    data_frames[name], field_params[name]
+    Parameters
+    ----------
+    config_params : Mapping
+        The config parameters from the config.yaml file
+    field_params : Mapping
+        The field parameters from the field.yaml file
+    output_path : Path
+        The full path to the directory where the output file will be saved.
+    use_flag_file: bool
+        If True, we will create two catalogues, a 'core' and a 'raw', where 'core' consists of objects that have 'ingest_viz' flags that are True.
+    flag_file_path: Optional[Path]
+        The full path to the flag file (see filterobjects.read_ingest_viz). Required if use_flag_file is True and make_flags is
+        False. If make_flags is True, the flags that are made are written to this file instead, unless it is None.
+    chunk_size: int
+        The number of rows of the main catalogue to process at a time, by default DEFAULT_CHUNK_SIZE.
+    memmap: bool
+        If True, additional fits catalogues are memory-mapped. By default False.
+    num_workers: Optional[int]
+        The number of threads used to load and process the additional catalogues. By default None, which uses one thread per additional catalogue.
+    cache_dir: Optional[Path]
+        The path to a directory to cache the processed additional catalogues in. By default None, which does not use a cache.
+    max_cache_bytes: int
+        The maximum total size of the cache directory, by default cache.DEFAULT_MAX_CACHE_BYTES.
+    output_format: str
+        The format to write the data files in, one of the keys of utils.OUTPUT_FORMATS. By default "csv".
+    compact: bool
+        If True, every column is stored in the narrowest safe dtype for its data_type in memory and in the output files
+        (i.e. float32 and Int32, see utils.get_column_dtypes). The dtypes are widened if a later chunk does not fit
+        them (see utils.widen_column_dtypes). By default False.
+    column_bundle: bool
+        If True, each output is also written as a bundle of binary typed-array columns with a json manifest
+        (see bundle.ColumnBundleWriter), for clients to load without parsing. By default False.
+    tile_order: Optional[int]
+        If given, each output is also partitioned into HEALPix tiles of this order by ra and dec, with one file
+        per tile and a tile index (see tiles.TiledDataWriter). By default None, which does not write tiles.
+    make_flags: bool
+        If True (with use_flag_file), the ingest flags of each chunk are made from the chunk as it is processed, instead of
+        being read from the flag file. By default False.
+    percentiles: Optional[Iterable[float]]
+        The percentiles of each column to find from its sketch (see sketches.get_sketch_percentile_stats), which are exact
+        for columns with at most the compression of the sketches of values, and otherwise accurate in rank. By default stats.DEFAULT_PERCENTILES. None finds no percentiles.
+
+    Returns
+    -------
+    Dict[str, Tuple[pd.DataFrame, int]]
+        For each output ('raw', and 'core' if use_flag_file is True), the stats of every column merged from the
+        stats of each chunk (see stats.merge_column_stats), i.e. with the rows 'min' and 'max', and a row for each
+        percentile, and the number of objects written out. The sketches of the columns of each output
+        (see sketches.ColumnSketchWriter) are also written out, for the metadata files.
+    """
+
+    make_flags = use_flag_file and make_flags
+
+    # read in flag file if it's being used (and the flags are not made in this run), and index it by id once for every chunk
+    if use_flag_file and not make_flags:
+        with profiling.stage("read_flag_file") as stage:
+            ingest_viz = filterobjects.read_ingest_viz(flag_file_path)
+            stage["num_rows"] = len(ingest_viz)
+
+    data_frames = create_catalogues(config_params, field_params)
+    main_cat = data_frames["cat_filename"]
+
+    if main_cat.file_path is None:
+        # this file is required to run
+        raise RuntimeError("Could not load dataframe for the main cat file")
+
+    # start loading and processing any additional catalogues in the background
+    additional_names = [name for name in data_frames.keys() if name != "cat_filename"]
+    executor, futures = submit_additional_catalogues(
+        data_frames,
+        additional_names,
+        field_params,
+        memmap,
+        num_workers,
+        cache_dir,
+        max_cache_bytes,
+        compact,
+    )
+
+    data_types = get_column_data_types(config_params, field_params)
+    decimals = get_output_decimals(data_frames)
+    suffixes = ["raw", "core"] if use_flag_file else ["raw"]
+
+    writers = {
+        suffix: utils.ChunkedDataWriter(
+            get_data_output_filepath(output_path, suffix, output_format), decimals
+        )
+        for suffix in suffixes
+    }
+    # any other outputs that each chunk is written to, including the sketches of the int and float columns for the metadata
+    sketch_columns = [c for c, t in data_types.items() if t in ["float", "int"]]
+    sketch_writers = {
+        suffix: sketches.ColumnSketchWriter(
+            sketches.get_sketch_filepath(output_path, suffix), sketch_columns
+        )
+        for suffix in suffixes
+    }
+    extra_writers = {suffix: [sketch_writers[suffix]] for suffix in suffixes}
+    for suffix in suffixes:
+        if column_bundle:
+            extra_writers[suffix].append(
+                bundle.ColumnBundleWriter(
+                    *bundle.get_bundle_filepaths(output_path, suffix), decimals
+                )
+            )
+        if tile_order is not None:
+            extra_writers[suffix].append(
+                tiles.TiledDataWriter(
+                    output_path, suffix, output_format, tile_order, decimals
+                )
+            )
+    # the stats of the columns of each output in each chunk, without percentiles as they cannot be merged (they are
+    # found from the sketches instead)
+    column_stats = {suffix: [] for suffix in suffixes}
+    # the tables of flags of each chunk, to write out as the flag file
+    flag_tables = []
+    flag_columns = []
+    if make_flags:
+        flag_columns = filterobjects.get_flag_input_columns(
+            main_cat.output_columns, field_params["cat_filename"]["columns"]
+        )
+    other_dfs = None
+    column_dtypes = None
+
+    try:
+        chunks = utils.iter_table_chunks(
+            main_cat.file_path,
+            main_cat.file_format,
+            chunk_size,
+            main_cat.input_columns + flag_columns,
+        )
+        while True:
+            # the stages of every chunk are added together in the profile
+            with profiling.stage("read_chunk") as stage:
+                chunk = next(chunks, None)
+                stage["num_rows"] = 0 if chunk is None else len(chunk)
+            if chunk is None:
+                break
+
+            if make_flags:
+                # flag the fluxes of this chunk before they are converted to magnitudes
+                with profiling.stage("make_flag_table", len(chunk)):
+                    df_flags, flag_header = filterobjects.make_flag_table(
+                        main_cat.output_columns,
+                        field_params["cat_filename"]["columns"],
+                        chunk,
+                    )
+                    ingest_viz = filterobjects.get_ingest_viz(df_flags, flag_header)
+                    if flag_file_path is not None:
+                        flag_tables.append(df_flags)
+
+            # convert and filter the columns of this chunk of the main catalogue
+            with profiling.stage("process_column_data", len(chunk)):
+                chunk_cat = process_column_data(
+                    main_cat.model_copy(update={"df": chunk, "loaded": True}),
+                    field_params["cat_filename"],
+                    compact,
                 )
 
-                if use_flag_file:
-                    # only add to the core dataframe if it exists
-                    df_core = df_core.join(
-                        data_frames[name].df.set_index("id"), on="id"
+            if other_dfs is None:
+                # wait for the additional catalogues to be ready, and index them by id once
+                with profiling.stage("wait_for_additional_catalogues"):
+                    for name, future in futures.items():
+                        data_frames[name] = future.result()
+                    other_dfs = index_catalogues_by_id(
+                        get_loaded_dataframes(data_frames, additional_names)
                     )
 
-                df_raw = df_raw.join(data_frames[name].df.set_index("id"), on="id")
+            with profiling.stage("join_catalogues", len(chunk)):
+                df_merged = join_catalogues(chunk_cat.df, other_dfs, indexed=True)
 
-            else:
-                # dataframe failed to load
-                print(
-                    f"{data_frames[name]} was not properly loaded, its columns will not be present in the final dataframe."
+                # the dtypes of every chunk so far are widened to fit this chunk (i.e. Int32 to Int64 if a later
+                # chunk has larger ids), and the writers widen the columns they have written already to match
+                chunk_dtypes = utils.get_column_dtypes(
+                    df_merged, data_types, decimals, compact
                 )
+                column_dtypes = (
+                    chunk_dtypes
+                    if column_dtypes is None
+                    else utils.widen_column_dtypes(column_dtypes, chunk_dtypes)
+                )
+                df_merged = utils.apply_column_dtypes(df_merged, column_dtypes)
 
-    # write out the data to a csv file
-    output_file_path_raw = get_data_output_filepath(output_path, "raw")
-    utils.write_data(df_raw, output_file_path_raw)
+                if use_flag_file:
+                    ingest_mask = get_ingest_mask(ingest_viz, df_merged["id"])
+                    df_outputs = {
+                        "raw": df_merged[~ingest_mask],
+                        "core": df_merged[ingest_mask],
+                    }
+                else:
+                    df_outputs = {"raw": df_merged}
+
+            # append the chunk to the output files
+            for suffix, df in df_outputs.items():
+                with profiling.stage(f"write_{suffix}", len(df)):
+                    writers[suffix].write(df)
+                    for writer in extra_writers[suffix]:
+                        writer.write(df)
+
+            # the stats of the raw and core objects are computed together from the ingest mask
+            with profiling.stage("column_stats", len(df_merged)):
+                if use_flag_file:
+                    chunk_stats = stats.get_masked_column_stats(
+                        df_merged,
+                        {"raw": ~ingest_mask, "core": ingest_mask},
+                        percentiles=None,
+                    )
+                else:
+                    chunk_stats = {
+                        "raw": stats.get_column_stats(df_merged, percentiles=None)
+                    }
+                for suffix, df_stats in chunk_stats.items():
+                    column_stats[suffix].append(df_stats)
+
+        # write out the flags of every chunk as the flag file
+        if len(flag_tables) > 0:
+            with profiling.stage("write_flag_file"):
+                filterobjects.write_flag_file(
+                    pd.concat(flag_tables, ignore_index=True),
+                    flag_header,
+                    flag_file_path,
+                    overwrite=True,
+                )
 
-    # write out core data if necessary
-    if use_flag_file:
-        output_file_path_core = get_data_output_filepath(output_path, "core")
-        utils.write_data(df_core, output_file_path_core)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        with profiling.stage("close_writers"):
+            for suffix in suffixes:
+                for writer in [writers[suffix]] + extra_writers[suffix]:
+                    writer.close()
+
+    outputs = {}
+    for suffix in suffixes:
+        df_stats = stats.merge_column_stats(column_stats[suffix])
+        if percentiles:
+            sketch_writer = sketch_writers[suffix]
+            df_percentiles = sketches.get_sketch_percentile_stats(
+                sketch_writer.column_sketches, percentiles
+            )
+            df_stats = pd.concat(
+                [df_stats, df_percentiles.reindex(columns=df_stats.columns)]
+            )
+        outputs[suffix] = (df_stats, writers[suffix].num_rows)
 
-        return df_raw, df_core
-    else:
-        return df_raw
+    return outputs
@@ -0,0 +1,276 @@
+## Script to build multi-resolution pyramids of binned counts of catalogues, so scatter plots can be drawn as densities
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from . import distributions
+from . import utils
+
+# the pairs of (x, y) columns to bin, the sky positions and the pairs that are plotted in distributions.TO_PLOT
+DENSITY_PAIRS = [("ra", "dec")] + distributions.TO_PLOT
+# the default finest level of the pyramids, which has 2**level bins along each axis
+DEFAULT_DENSITY_MAX_LEVEL = 8
+# the dtype of the counts in the level files, little-endian
+DENSITY_DTYPE = np.dtype("<u4")
+
+
+def get_density_paths(output_path: Path, suffix: str) -> Dict[str, Path]:
+    """Returns the path to the directory of the level files and the path to the density index of a catalogue.
+
+    Parameters
+    ----------
+    output_path : Path
+        The path to the directory where the catalogue is saved.
+    suffix : str
+        The suffix string of the catalogue, i.e. 'raw'.
+
+    Returns
+    -------
+    Dict[str, Path]
+        The paths, with the keys 'directory' and 'index'.
+    """
+
+    base_filename = "catalog_" + suffix + "_density"
+
+    return {
+        "directory": output_path / base_filename,
+        "index": output_path / (base_filename + ".json"),
+    }
+
+
+def get_density_pairs(
+    columns: Iterable[str], pairs: Iterable[Tuple[str, str]] = DENSITY_PAIRS
+) -> List[Tuple[str, str]]:
+    """Returns the pairs of columns that are both in the given columns."""
+
+    columns = set(columns)
+
+    return [(x, y) for x, y in pairs if x in columns and y in columns]
+
+
+def get_bin_indices(
+    values: np.ndarray, min_val: float, max_val: float, num_bins: int
+) -> np.ndarray:
+    """Gets the index of the bin of each value, for num_bins equal bins from min_val to max_val. The
+    maximum value is put in the last bin, and values outside of the limits are put in the first or last bin.
+    """
+
+    span = max_val - min_val
+    if span <= 0:
+        return np.zeros(len(values), dtype=np.int64)
+
+    indices = np.floor((values - min_val) * (num_bins / span)).astype(np.int64)
+
+    return np.clip(indices, 0, num_bins - 1)
+
+
+def downsample_counts(counts: np.ndarray) -> np.ndarray:
+    """Sums each 2x2 block of bins of a square array of counts, to get the counts of the next coarser level."""
+
+    num_bins = counts.shape[0] // 2
+
+    return counts.reshape(num_bins, 2, num_bins, 2).sum(axis=(1, 3))
+
+
+class DensityPyramidBuilder:
+    """Builds a pyramid of binned counts for each pair of columns, from level 0 (a single bin) to max_level
+    (2**max_level bins along each axis), over the range of each column. The counts of the finest level are
+    found with a single bincount of the flattened bin indices of each chunk of rows, and each coarser level is
+    then summed from the level below, so the counts of all of the levels add up to the same number of objects.
+    Objects with a missing value in either column of a pair are not counted for that pair.
+
+    Parameters
+    ----------
+    df_limits : pd.DataFrame
+        The minimum and maximum of each column of the whole catalogue, with the index 'min' and 'max'
+        (see dataproc.get_min_max_rows or stats.get_column_stats).
+    pairs : Iterable[Tuple[str, str]], optional
+        The pairs of (x, y) columns to bin, by default DENSITY_PAIRS. Pairs with a column that is not in
+        df_limits, or that has no values, are skipped.
+    max_level : int, optional
+        The finest level of the pyramids, by default DEFAULT_DENSITY_MAX_LEVEL
+    """
+
+    def __init__(
+        self,
+        df_limits: pd.DataFrame,
+        pairs: Iterable[Tuple[str, str]] = DENSITY_PAIRS,
+        max_level: int = DEFAULT_DENSITY_MAX_LEVEL,
+    ):
+        self.max_level = max_level
+        self.num_bins = 2**max_level
+        self.limits: Dict[str, Tuple[float, float]] = {}
+        self._counts: Dict[Tuple[str, str], np.ndarray] = {}
+
+        for x, y in get_density_pairs(df_limits.columns, pairs):
+            limits = df_limits[[x, y]].astype(np.float64)
+            if limits.isna().any().any():
+                print(f"Column {x} or {y} has no values, it will not be binned.")
+                continue
+            for colname in (x, y):
+                self.limits[colname] = (
+                    float(limits.at["min", colname]),
+                    float(limits.at["max", colname]),
+                )
+            self._counts[(x, y)] = np.zeros(self.num_bins**2, dtype=np.int64)
+
+    @property
+    def pairs(self) -> List[Tuple[str, str]]:
+        return list(self._counts.keys())
+
+    def add(self, df_chunk: pd.DataFrame):
+        """Adds the objects of the next chunk of rows to the counts of the finest level."""
+
+        values = {
+            colname: df_chunk[colname].to_numpy(dtype=np.float64, na_value=np.nan)
+            for colname in self.limits
+        }
+
+        for x, y in self._counts:
+            valid = np.isfinite(values[x]) & np.isfinite(values[y])
+            ix = get_bin_indices(values[x][valid], *self.limits[x], self.num_bins)
+            iy = get_bin_indices(values[y][valid], *self.limits[y], self.num_bins)
+
+            # rows are y bins and columns are x bins
+            self._counts[(x, y)] += np.bincount(
+                iy * self.num_bins + ix, minlength=self.num_bins**2
+            )
+
+    def get_levels(self, x: str, y: str) -> List[np.ndarray]:
+        """Returns the counts of each level of the pyramid of the pair, from level 0 to max_level."""
+
+        levels = [self._counts[(x, y)].reshape(self.num_bins, self.num_bins)]
+        for _ in range(self.max_level):
+            levels.append(downsample_counts(levels[-1]))
+
+        return levels[::-1]
+
+    def write(self, output_path: Path, suffix: str):
+        """Writes the counts of each level of each pyramid to a binary file of DENSITY_DTYPE values
+        (row-major, with rows of y bins from the minimum y), and writes the density index.
+
+        Parameters
+        ----------
+        output_path : Path
+            The path to the directory where the catalogue is saved.
+        suffix : str
+            The suffix string of the catalogue, i.e. 'raw'.
+        """
+
+        paths = get_density_paths(output_path, suffix)
+        paths["directory"].mkdir(parents=True, exist_ok=True)
+
+        pairs = []
+        for x, y in self._counts:
+            levels = []
+            for level, counts in enumerate(self.get_levels(x, y)):
+                file_name = f"{x}-{y}_{level}.bin"
+                counts.astype(DENSITY_DTYPE).tofile(paths["directory"] / file_name)
+                levels.append(
+                    {
+                        "level": level,
+                        "num_bins": counts.shape[0],
+                        "file": paths["directory"].name + "/" + file_name,
+                        "max_count": int(counts.max()),
+                    }
+                )
+
+            pairs.append(
+                {
+                    "x": x,
+                    "y": y,
+                    "x_min": self.limits[x][0],
+                    "x_max": self.limits[x][1],
+                    "y_min": self.limits[y][0],
+                    "y_max": self.limits[y][1],
+                    "num_objects": int(self._counts[(x, y)].sum()),
+                    "levels": levels,
+                }
+            )
+
+        density_index = {
+            "max_level": self.max_level,
+            "dtype": "uint32",
+            "byte_order": "little",
+            "layout": "row-major, rows of y bins",
+            "pairs": pairs,
+        }
+        with open(paths["index"], "w") as f:
+            json.dump(density_index, f, indent=4)
+
+
+def write_density_pyramids(
+    df_cat: pd.DataFrame,
+    output_path: Path,
+    suffix: str,
+    max_level: int = DEFAULT_DENSITY_MAX_LEVEL,
+    pairs: Iterable[Tuple[str, str]] = DENSITY_PAIRS,
+):
+    """Builds and writes out the density pyramids of the catalogue (see DensityPyramidBuilder).
+
+    Parameters
+    ----------
+    df_cat : pd.DataFrame
+        The catalogue to bin.
+    output_path : Path
+        The path to the directory where the catalogue is saved.
+    suffix : str
+        The suffix string of the catalogue, i.e. 'raw'.
+    max_level : int, optional
+        The finest level of the pyramids, by default DEFAULT_DENSITY_MAX_LEVEL
+    pairs : Iterable[Tuple[str, str]], optional
+        The pairs of (x, y) columns to bin, by default DENSITY_PAIRS
+    """
+
+    # the limits of only the binned columns
+    columns = list(
+        {c for pair in get_density_pairs(df_cat.columns, pairs) for c in pair}
+    )
+    df_limits = pd.DataFrame(
+        {c: [df_cat[c].min(), df_cat[c].max()] for c in columns}, index=["min", "max"]
+    )
+
+    builder = DensityPyramidBuilder(df_limits, pairs, max_level)
+    builder.add(df_cat)
+    builder.write(output_path, suffix)
+
+
+def write_density_pyramids_from_file(
+    data_file_path: Path,
+    df_limits: pd.DataFrame,
+    output_path: Path,
+    suffix: str,
+    max_level: int = DEFAULT_DENSITY_MAX_LEVEL,
+    pairs: Iterable[Tuple[str, str]] = DENSITY_PAIRS,
+    chunk_size: Optional[int] = None,
+):
+    """Builds and writes out the density pyramids of a catalogue from its data file, reading only the binned
+    columns a chunk at a time, i.e. for catalogues that were processed in chunks.
+
+    Parameters
+    ----------
+    data_file_path : Path
+        The full path to the data file of the catalogue.
+    df_limits : pd.DataFrame
+        The minimum and maximum of each column of the catalogue, with the index 'min' and 'max'.
+    output_path : Path
+        The path to the directory where the catalogue is saved.
+    suffix : str
+        The suffix string of the catalogue, i.e. 'raw'.
+    max_level : int, optional
+        The finest level of the pyramids, by default DEFAULT_DENSITY_MAX_LEVEL
+    pairs : Iterable[Tuple[str, str]], optional
+        The pairs of (x, y) columns to bin, by default DENSITY_PAIRS
+    chunk_size : Optional[int], optional
+        The number of rows to read at a time, by default None, which uses utils.CSV_CHUNK_ROWS.
+    """
+
+    builder = DensityPyramidBuilder(df_limits, pairs, max_level)
+    if builder.pairs:
+        for df_chunk in utils.iter_data_chunks(
+            data_file_path, chunk_size or utils.CSV_CHUNK_ROWS, list(builder.limits)
+        ):
+            builder.add(df_chunk)
+    builder.write(output_path, suffix)
@@ -1,18 +1,50 @@
-import pandas as pd
-import numpy as np
 import json
-import matplotlib.pyplot as plt
 import typer
 from pathlib import Path
-from typing_extensions import Annotated, Tuple, List
+from typing_extensions import TYPE_CHECKING, Annotated, Tuple, List
 
-from . import utils
+from . import profiling
+
+# numpy and pandas (and utils, which imports them) are slow to import, so they are only imported by the
+# functions that use them, and the command starts quickly (i.e. for --help)
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 TO_PLOT = [("logSFRinst_50", "logM_50"), ("zfit_50", "logM_50")]
 
 
-def read_files_to_dataframe(input_path: Path) -> Tuple[pd.DataFrame, List]:
-    """Reads in all catalog files contained in the input path called 'catalog_core.csv' and concatenates them into one long dataframe.
+def get_core_datafile_paths(input_path: Path) -> List[Path]:
+    """Gets the paths to the core catalog file in each field folder of the input path. The core catalog file
+    can be in any of the output formats in utils.OUTPUT_FORMATS, and if there is more than one, the csv file is used.
+
+    Parameters
+    ----------
+    input_path : Path
+        The path to search for catalog files.
+
+    Returns
+    -------
+    List[Path]
+        The paths to the core catalog files, one for each field folder.
+    """
+
+    from . import utils
+
+    core_datafile_paths = []
+
+    for field_path in sorted(p for p in input_path.iterdir() if p.is_dir()):
+        for suffix in utils.OUTPUT_FORMATS.values():
+            datafile_path = field_path / ("catalog_core" + suffix)
+            if datafile_path.is_file():
+                core_datafile_paths.append(datafile_path)
+                break
+
+    return core_datafile_paths
+
+
+def read_files_to_dataframe(input_path: Path) -> Tuple["pd.DataFrame", List]:
+    """Reads in all catalog files contained in the input path called 'catalog_core' (in any of the output formats) and concatenates them into one long dataframe.
 
     Parameters
     ----------
@@ -27,8 +59,12 @@ def read_files_to_dataframe(input_path: Path) -> Tuple[pd.DataFrame, List]:
         A list of the folders where catalog data was found (essentially the field keys).
     """
 
-    # create generator of files to import
-    core_datafile_list = input_path.glob("*/catalog_core.csv")
+    import pandas as pd
+
+    from . import utils
+
+    # get the list of files to import
+    core_datafile_list = get_core_datafile_paths(input_path)
 
     # read in files and concat them to the main df
     full_df = pd.DataFrame()
@@ -39,7 +75,7 @@ def read_files_to_dataframe(input_path: Path) -> Tuple[pd.DataFrame, List]:
         field_keys.append(str(datafile_path.parts[-2]))
 
         # read in file and add to end of master catalog
-        tmp_df = pd.read_csv(datafile_path)
+        tmp_df = utils.read_data(datafile_path)
 
         full_df = pd.concat([full_df, tmp_df])
 
@@ -47,8 +83,8 @@ def read_files_to_dataframe(input_path: Path) -> Tuple[pd.DataFrame, List]:
 
 
 def get_limits_and_bins(
-    column: pd.Series, num_bins: int = 100
-) -> Tuple[float, float, np.ndarray]:
+    column: "pd.Series", num_bins: int = 100
+) -> Tuple[float, float, "np.ndarray"]:
     """Takes a column and returns the maximum and minimum non-Nan values, and an array of bins generated between those two limits. The number of bins is set by num_bins.
 
     Parameters
@@ -64,6 +100,8 @@ def get_limits_and_bins(
         The minimum, maximum, and array of bins.
     """
 
+    import numpy as np
+
     min = np.nanmin(column)
     max = np.nanmax(column)
     bins = np.linspace(min, max, num_bins)
@@ -72,7 +110,7 @@ def get_limits_and_bins(
 
 
 def plot_2d_distribution(
-    col_x: pd.Series, col_y: pd.Series, base_output_path: Path, cmap: str = "bone_r"
+    col_x: "pd.Series", col_y: "pd.Series", base_output_path: Path, cmap: str = "bone_r"
 ) -> Path:
     """Function that takes two columns of float data from a pandas dataframe, plots them as a contour plot, and saves the plot as an svg.
 
@@ -92,6 +130,9 @@ def plot_2d_distribution(
     Path
         The path that the plot was written to.
     """
+    # matplotlib is slow to import, so it is only imported when plotting
+    import matplotlib.pyplot as plt
+    import numpy as np
 
     # get the contour levels
     x_min, x_max, x_bins = get_limits_and_bins(col_x)
@@ -126,7 +167,7 @@ def plot_2d_distribution(
 
 
 def create_dist_csvs(
-    df_data: pd.DataFrame, base_output_path: Path, metadata_dict: dict
+    df_data: "pd.DataFrame", base_output_path: Path, metadata_dict: dict
 ):
     """Given a dataframe, iterates through the columns and gets the histogrammed frequency distribution of the values in that column, and saves it and the bin centers as a csv.
 
@@ -139,6 +180,12 @@ def create_dist_csvs(
     metadata_dict : dict
         The metadata dictionary to add to.
     """
+
+    import numpy as np
+    import pandas as pd
+
+    from . import utils
+
     # function that creates the distribution csvs
 
     for c in df_data.columns:
@@ -162,54 +209,76 @@ def create_dist_csvs(
 def generate_distributions_and_write_output(
     input_path: Annotated[
         str, typer.Option(help="The path to the output for this version of the code.")
-    ] = "./output/v1.0/"
+    ] = "./output/v1.0/",
+    profile: Annotated[
+        bool,
+        typer.Option(
+            help="If True, record the wall time, CPU time, rows and peak memory of each stage and write them to profile.json in the distributions folder."
+        ),
+    ] = False,
+    profile_stacks: Annotated[
+        bool,
+        typer.Option(
+            help="If True (with --profile), also profile each stage with cProfile and write the collapsed stacks to profile_stacks.txt, to draw as a flame graph."
+        ),
+    ] = False,
 ):
     """This function generates plots and data for the JHIVE Visualization Tool's details pane and the detail page. It generates contour plots of the given columns in 'TO_PLOT', and saves those as SVGs. It also saves histograms of the distributions of data in each column of the core catalog as csvs. Finally, it generates and writes a metadata.json file which contains paths to all of these files, as well as the minimum and maximum values of the distributions for each of the columns.
 
     Parameters
     ----------
     input_path : Annotated[ str, typer.Option, optional
-        The path to the output for this version of the code, where the catalog_core.csv files are stored, by default ="./output/v1.0/"
+        The path to the output for this version of the code, where the catalog_core files are stored, by default ="./output/v1.0/"
+    profile : bool, optional
+        If True, record the wall time, CPU time, rows and peak memory of each stage and write them to profile.json in the distributions folder, by default False
+    profile_stacks : bool, optional
+        If True (with profile), also write the collapsed cProfile stacks of each stage to profile_stacks.txt, by default False
 
     Raises
     ------
     FileNotFoundError
-        Raises a FileNotFoundError if there are no catalog_core.csv files found within the file structure of the input path folder.
+        Raises a FileNotFoundError if there are no catalog_core files found within the file structure of the input path folder.
     """
 
+    from . import utils
+
     # create and validate output and input paths
     input_path = utils.validate_dir_path(input_path)
     output_path = input_path / "distributions"
     dist_output_path = utils.validate_dir_path(output_path / "data_files")
     plot_output_path = utils.validate_dir_path(output_path / "plots")
 
-    df_data, field_keys = read_files_to_dataframe(input_path)
-
-    if len(df_data) == 0:
-        raise FileNotFoundError(f"No core data files found in {input_path}")
-
-    # create metadata dict and put information in
-    metadata_dict = {"dist": {}, "limits": {}, "plots": {}}
-    metadata_dict["field_keys_included"] = field_keys
-    metadata_dict["num_objects"] = len(df_data)
-
-    # get the distribution csvs
-    create_dist_csvs(df_data, dist_output_path, metadata_dict)
-
-    # make plots
-
-    for i in range(0, len(TO_PLOT)):
-        plot_path = plot_2d_distribution(
-            df_data[TO_PLOT[i][0]], df_data[TO_PLOT[i][1]], plot_output_path
-        )
-
-        # add to metadata file
-        metadata_dict["plots"][f"{TO_PLOT[i][0]}-{TO_PLOT[i][1]}"] = str(
-            plot_path.relative_to("output")
-        )
-
-    # write out metadata file
-    utils.write_json(metadata_dict, output_path, "metadata")
+    with profiling.profile_run(output_path, profile, use_cprofile=profile_stacks):
+        with profiling.stage("read_files") as stage:
+            df_data, field_keys = read_files_to_dataframe(input_path)
+            stage["num_rows"] = len(df_data)
+
+        if len(df_data) == 0:
+            raise FileNotFoundError(f"No core data files found in {input_path}")
+
+        # create metadata dict and put information in
+        metadata_dict = {"dist": {}, "limits": {}, "plots": {}}
+        metadata_dict["field_keys_included"] = field_keys
+        metadata_dict["num_objects"] = len(df_data)
+
+        # get the distribution csvs
+        with profiling.stage("create_dist_csvs", len(df_data)):
+            create_dist_csvs(df_data, dist_output_path, metadata_dict)
+
+        # make plots
+        for i in range(0, len(TO_PLOT)):
+            with profiling.stage("plot_2d_distribution", len(df_data)):
+                plot_path = plot_2d_distribution(
+                    df_data[TO_PLOT[i][0]], df_data[TO_PLOT[i][1]], plot_output_path
+                )
+
+            # add to metadata file
+            metadata_dict["plots"][f"{TO_PLOT[i][0]}-{TO_PLOT[i][1]}"] = str(
+                plot_path.relative_to("output")
+            )
+
+        # write out metadata file
+        utils.write_json(metadata_dict, output_path, "metadata")
 
 
 def generate_distributions_and_write_output_entrypoint():
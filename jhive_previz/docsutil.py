@@ -1,15 +1,16 @@
-import pandas as pd
 from pathlib import Path
 import yaml
 import typer
 from typing import List
 from typing_extensions import Annotated
 from importlib import resources as impresources
-from rich import print
-from . import docs
 
-# get path to docs folder to write files to
-out_filepath = impresources.files(docs)
+# pandas and rich are only imported by the commands that use them, so that the commands start quickly
+
+
+def get_docs_path():
+    """Returns the path to the docs folder of the package, to write files to."""
+    return impresources.files("jhive_previz.docs")
 
 
 def convert_yaml_metadata_to_csv(
@@ -31,6 +32,8 @@ def convert_yaml_metadata_to_csv(
         Path to the yaml file you want converted to a csv file.
     """
 
+    import pandas as pd
+
     file_path = Path(file_path)
 
     # read in config from yaml file
@@ -77,10 +80,13 @@ def convert_tables_to_markdown(
         The full path to the .csv file.
     """
 
+    import pandas as pd
+    from rich import print
+
     new_path = Path(new_path)
 
     for name in file_names:
-        file_path = out_filepath / name
+        file_path = get_docs_path() / name
 
         if not file_path.is_file():
             raise FileNotFoundError(
@@ -127,6 +133,8 @@ def merge_doc_csvs(
     file_write : str
         The full path to the file to write the merged .csv to. Must be a path that does not already exist.
     """
+    import pandas as pd
+
     # read in tables
 
     df_old = pd.read_csv(file_old)
@@ -167,6 +175,9 @@ def convert_yaml_to_csv_and_merge(
     new_filename = file_part + "_catalogue_fields_table_tomerge.csv"
     merge_filename = file_part + "_catalogue_fields_table_toedit.csv"
 
+    from rich import print
+
+    out_filepath = get_docs_path()
     table_path = out_filepath / table_filename
     write_path = out_filepath / new_filename
     merge_path = out_filepath / merge_filename
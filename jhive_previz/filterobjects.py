@@ -1,12 +1,28 @@
 ## Script to filter objects in all the catalogues and determine which are 'good'
 from pathlib import Path
-from typing_extensions import List
+from typing_extensions import Dict, List, Mapping, Optional, Tuple
+import numpy as np
 import pandas as pd
 
+from . import profiling
 from . import utils
 
 SNR_MAG = 10
 NUM_FLAGS = 4
+# the signal to noise ratios and numbers of flags of the grid of cuts in a selection sweep, by default
+SWEEP_SNR_VALUES = [3.0, 5.0, 7.0, 10.0, 15.0, 20.0, 30.0, 50.0]
+SWEEP_NUM_FLAGS = [1, 2, 3, 4, 5, 6, 8, 10, 15, 20]
+# the column of the flag file with the bitmask of the flags of each object, where bit i is the flag of the
+# filter named by the BIT{i} keyword in the header
+FLAG_COLUMN = "ingest_flags"
+# the integer types of the bitmask for each number of filters. FITS bytes are unsigned, so all 8 bits of a uint8 are
+# used, but the larger FITS integers are signed, so the sign bit of those is never used
+BITMASK_DTYPES = [(8, np.uint8), (15, np.int16), (31, np.int32), (63, np.int64)]
+# the number of bits that are set in each byte
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# the number of flux values (objects x filters) to flag at a time, so the flux and error matrices of each
+# block stay small enough to be cached (4 MB each)
+FLAG_BLOCK_VALUES = 2**19
 
 
 def get_flagfile_filepath(output_path: Path) -> Path:
@@ -28,6 +44,12 @@ def get_flagfile_filepath(output_path: Path) -> Path:
     return output_path / data_output_filename
 
 
+def get_selection_curve_filepath(output_path: Path) -> Path:
+    """Returns the path to output the selection curve .csv file of a selection sweep to."""
+
+    return output_path / "selection_curve.csv"
+
+
 def get_err_column_name(flux_col_name: str) -> str:
     """Gets the column name of the flux error associated with the given flux column.
 
@@ -69,10 +91,153 @@ def get_new_column_name(flux_col_name: str) -> str:
     return "ingest_" + colname_split[0]
 
 
+def get_flag_input_columns(columns: List[str], col_field_params: dict) -> List[str]:
+    """Gets the names of the columns in the DJA catalog that are needed to create the flags, which are
+    the id column, and the flux and flux error columns of every magnitude column in the columns to use.
+
+    Parameters
+    ----------
+    columns : List[str]
+        The list of columns to use for the DJA catalog.
+    col_field_params : dict
+        The dictionaries of parameters for the columns.
+
+    Returns
+    -------
+    List[str]
+        The list of input column names to read from the catalog.
+    """
+
+    input_columns = [col_field_params["id"]["input_column_name"]]
+
+    for c in columns:
+        if col_field_params[c]["is_magnitude"]:
+            col_name = col_field_params[c]["input_column_name"]
+            input_columns += [col_name, get_err_column_name(col_name)]
+
+    return input_columns
+
+
+def get_flux_column_names(columns: List[str], col_field_params: dict) -> List[str]:
+    """Gets the input flux column names of the columns to use that are magnitudes calculated from fluxes."""
+
+    return [
+        col_field_params[c]["input_column_name"]
+        for c in columns
+        if col_field_params[c]["is_magnitude"]
+    ]
+
+
+def get_snr_flags(
+    fluxes: np.ndarray,
+    errors: np.ndarray,
+    snr: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Flags the fluxes that are positive and more than snr times their errors. Missing fluxes or errors are
+    not flagged.
+
+    Parameters
+    ----------
+    fluxes : np.ndarray
+        The matrix of fluxes, with a row for each object and a column for each filter.
+    errors : np.ndarray
+        The matrix of flux errors, with the same shape as fluxes.
+    snr : Optional[float], optional
+        The signal to noise ratio to flag the fluxes above, by default None, which uses SNR_MAG.
+    out : Optional[np.ndarray], optional
+        The boolean array to write the flags to, by default None, which creates a new array.
+
+    Returns
+    -------
+    np.ndarray
+        The boolean matrix of flags, with the same shape as fluxes.
+    """
+
+    if snr is None:
+        snr = SNR_MAG
+
+    # comparisons with NaNs are False, so missing values are never flagged
+    flags = np.greater(fluxes, errors * snr, out=out)
+    flags &= fluxes > 0
+
+    return flags
+
+
+def get_ingest_flags(
+    columns: List[str],
+    col_field_params: dict,
+    cat: pd.DataFrame,
+    snr: Optional[float] = None,
+) -> Tuple[List[str], np.ndarray]:
+    """Flags the fluxes of the magnitude columns to use that have a signal to noise ratio above snr. For each
+    block of objects (with FLAG_BLOCK_VALUES values in total), the fluxes and flux errors are stacked into matrices with a column for
+    each filter, which are flagged in one pass by get_snr_flags.
+
+    Parameters
+    ----------
+    columns : List[str]
+        The list of columns to use for the DJA catalog.
+    col_field_params : dict
+        The dictionaries of parameters for the columns.
+    cat : pd.DataFrame
+        The DJA catalog dataframe for the field.
+    snr : Optional[float], optional
+        The signal to noise ratio to flag the fluxes above, by default None, which uses SNR_MAG.
+
+    Returns
+    -------
+    Tuple[List[str], np.ndarray]
+        The names of the flag column of each filter (see get_new_column_name), and the boolean matrix of flags,
+        with a row for each object and a column for each filter.
+    """
+
+    flux_col_names = get_flux_column_names(columns, col_field_params)
+    flux_cols = [
+        cat[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in flux_col_names
+    ]
+    err_cols = [
+        cat[get_err_column_name(c)].to_numpy(dtype=np.float64, na_value=np.nan)
+        for c in flux_col_names
+    ]
+
+    num_objects = len(cat)
+    block_size = max(
+        min(FLAG_BLOCK_VALUES // max(len(flux_col_names), 1), num_objects), 1
+    )
+    flags = np.empty((num_objects, len(flux_col_names)), dtype=bool, order="F")
+    fluxes = np.empty((block_size, len(flux_col_names)), dtype=np.float64, order="F")
+    errors = np.empty_like(fluxes)
+
+    for start in range(0, num_objects, block_size):
+        stop = min(start + block_size, num_objects)
+        for j in range(len(flux_col_names)):
+            fluxes[: stop - start, j] = flux_cols[j][start:stop]
+            errors[: stop - start, j] = err_cols[j][start:stop]
+
+        get_snr_flags(
+            fluxes[: stop - start], errors[: stop - start], snr, out=flags[start:stop]
+        )
+
+    return [get_new_column_name(c) for c in flux_col_names], flags
+
+
+def get_flag_dataframe(
+    ids: pd.Series, flag_col_names: List[str], flags: np.ndarray
+) -> pd.DataFrame:
+    """Creates the dataframe of the ids and the flags of each filter, without copying the flags."""
+
+    flag_dict = {"id": ids}
+    for j, new_col_name in enumerate(flag_col_names):
+        flag_dict[new_col_name] = flags[:, j]
+
+    return pd.DataFrame(flag_dict, copy=False)
+
+
 def filter_catalog(
     columns: List[str], col_field_params: dict, cat: pd.DataFrame
 ) -> pd.DataFrame:
-    """Takes the given catalog, and the list of columns to use. Iterates through the columns to use, and for those that are magnitudes (fluxes in the input catalog), it then finds the associated error column, and checks if the flux is SNR_MAG times the flux error. A column of flags is created for this, and the flag columns are then compiled into a dataframe and returned.
+    """Takes the given catalog, and the list of columns to use. For the columns to use that are magnitudes (fluxes in the input catalog), it checks if the flux is SNR_MAG times the associated flux error, for every filter at once (see get_ingest_flags). A column of flags is created for each filter, and the flag columns are returned as a dataframe.
 
     Parameters
     ----------
@@ -89,38 +254,414 @@ def filter_catalog(
         The dataframe of flags.
     """
 
-    # dict for new table
-    flag_dict = {}
-    flag_dict["id"] = cat[col_field_params["id"]["input_column_name"]]
+    flag_col_names, flags = get_ingest_flags(columns, col_field_params, cat)
 
-    # iterate through the list of flux columns to use and get mask of column
-    for c in columns:
+    return get_flag_dataframe(
+        cat[col_field_params["id"]["input_column_name"]], flag_col_names, flags
+    )
 
-        if not col_field_params[c]["is_magnitude"]:
-            # skip columns that are not magnitudes calculated from fluxes
-            continue
 
-        # get necessary column names
-        col_name = col_field_params[c]["input_column_name"]
-        new_col_name = get_new_column_name(col_name)
-        err_colname = get_err_column_name(col_name)
+def get_bitmask_dtype(num_filters: int) -> np.dtype:
+    """Returns the smallest integer type that can store a bit for each of the filters.
 
-        # replace negative fluxes with nans
-        data_col = cat[col_name].mask(cat[col_name] <= 0, pd.NA)
+    Raises
+    ------
+    ValueError
+        Raises an error if there are more filters than bits in the largest type.
+    """
 
-        # check if flux column is SNR_MAG times the error column and put that data in to the dict
-        flag_col = data_col > (cat[err_colname] * SNR_MAG)
-        flag_dict[new_col_name] = flag_col
+    for max_filters, dtype in BITMASK_DTYPES:
+        if num_filters <= max_filters:
+            return np.dtype(dtype)
 
-    df_ingest = pd.DataFrame.from_dict(flag_dict)
+    raise ValueError(
+        f"The flags of {num_filters} filters cannot be packed into a bitmask, there can be at most {BITMASK_DTYPES[-1][0]} filters."
+    )
 
-    return df_ingest
 
+def pack_flags(flags: np.ndarray) -> np.ndarray:
+    """Packs the flags of each object into a bitmask integer, where bit i is the flag of filter i.
 
-def create_and_write_flag_file(
-    config_params: dict, field_params: dict, output_path: Path
+    Parameters
+    ----------
+    flags : np.ndarray
+        The boolean matrix of flags, with a row for each object and a column for each filter.
+
+    Returns
+    -------
+    np.ndarray
+        The bitmask of each object, with the type from get_bitmask_dtype.
+    """
+
+    dtype = get_bitmask_dtype(flags.shape[1])
+    packed = np.packbits(flags, axis=1, bitorder="little")
+
+    # pad the bytes of each object to the size of the integer type
+    bitmask_bytes = np.zeros((len(flags), dtype.itemsize), dtype=np.uint8)
+    bitmask_bytes[:, : packed.shape[1]] = packed
+
+    return bitmask_bytes.view(dtype.newbyteorder("<")).ravel().astype(dtype)
+
+
+def unpack_flags(bitmasks: np.ndarray, num_filters: int) -> np.ndarray:
+    """Unpacks the bitmasks made by pack_flags into the boolean matrix of flags of the given number of filters."""
+
+    bitmask_bytes = np.ascontiguousarray(
+        bitmasks, dtype=bitmasks.dtype.newbyteorder("<")
+    ).view(np.uint8)
+    flags = np.unpackbits(
+        bitmask_bytes.reshape(len(bitmasks), -1), axis=1, bitorder="little"
+    )
+
+    return flags[:, :num_filters].astype(bool)
+
+
+def count_flags(bitmasks: np.ndarray) -> np.ndarray:
+    """Counts the number of flags that are set in each bitmask (the population count of the bits), by looking
+    up the number of bits in each byte.
+    """
+
+    bitmasks = np.ascontiguousarray(bitmasks)
+    bitmask_bytes = bitmasks.view(np.uint8).reshape(len(bitmasks), -1)
+
+    return POPCOUNT_TABLE[bitmask_bytes].sum(axis=1, dtype=np.int64)
+
+
+def get_flag_header(
+    flag_col_names: List[str],
+    snr: Optional[float] = None,
+    num_flags: Optional[int] = None,
+) -> Dict:
+    """Creates the header keywords of the flag file. The BIT{i} keyword is the name of the flag of bit i of the
+    bitmasks, and the SNR_MAG and NUMFLAGS keywords are the cuts that the flags were made with.
+
+    Parameters
+    ----------
+    flag_col_names : List[str]
+        The names of the flag of each filter (see get_new_column_name), in the order of the bits.
+    snr : Optional[float], optional
+        The signal to noise ratio the flags were made with, by default None, which uses SNR_MAG.
+    num_flags : Optional[int], optional
+        The number of flags an object needs to be a 'good' object, by default None, which uses NUM_FLAGS.
+
+    Returns
+    -------
+    Dict
+        The header keywords.
+    """
+
+    header = {
+        "SNR_MAG": SNR_MAG if snr is None else snr,
+        "NUMFLAGS": NUM_FLAGS if num_flags is None else num_flags,
+    }
+    for i, flag_col_name in enumerate(flag_col_names):
+        header[f"BIT{i}"] = flag_col_name
+
+    return header
+
+
+def get_flag_legend(header: Mapping) -> List[str]:
+    """Gets the name of the flag of each bit of the bitmasks from the header of a flag file."""
+
+    legend = []
+    while f"BIT{len(legend)}" in header:
+        legend.append(header[f"BIT{len(legend)}"])
+
+    return legend
+
+
+def read_flag_file(flag_file_path: Path) -> Tuple[pd.DataFrame, Dict]:
+    """Reads the id and bitmask columns of a flag file, and its header. Flag files made before the flags were
+    packed into bitmasks have an 'ingest_viz' column instead of the bitmasks, which is read instead.
+
+    Parameters
+    ----------
+    flag_file_path : Path
+        The full path to the flag file.
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, Dict]
+        The dataframe with the 'id' and FLAG_COLUMN (or 'ingest_viz') columns, and the header keywords of the
+        flag file.
+    """
+    from astropy.io import fits
+
+    with fits.open(flag_file_path, memmap=True) as hdul:
+        table_hdu = utils.get_fits_table_hdu(hdul)
+        header = dict(table_hdu.header)
+        flag_column = (
+            FLAG_COLUMN if FLAG_COLUMN in table_hdu.columns.names else "ingest_viz"
+        )
+
+    df_flags = utils.read_table(
+        flag_file_path, file_format="fits", columns=["id", flag_column]
+    )
+
+    return df_flags, header
+
+
+def get_ingest_viz(
+    df_flags: pd.DataFrame, header: Mapping, num_flags: Optional[int] = None
+) -> pd.Series:
+    """Selects the 'good' objects of a table of flags (see read_flag_file and make_flag_table), which have at
+    least num_flags flags set in their bitmask.
+
+    Parameters
+    ----------
+    df_flags : pd.DataFrame
+        The table of flags, with 'id' and FLAG_COLUMN (or 'ingest_viz') columns.
+    header : Mapping
+        The header keywords of the table of flags (see get_flag_header).
+    num_flags : Optional[int], optional
+        The number of flags an object needs to be a 'good' object, by default None, which uses the NUMFLAGS
+        the flags were made with.
+
+    Returns
+    -------
+    pd.Series
+        The 'ingest_viz' flag of each object, indexed by id.
+    """
+
+    ids = pd.Index(df_flags["id"], name="id")
+
+    if FLAG_COLUMN not in df_flags.columns:
+        return pd.Series(
+            df_flags["ingest_viz"].to_numpy(), index=ids, name="ingest_viz"
+        )
+
+    if num_flags is None:
+        num_flags = header["NUMFLAGS"]
+
+    ingest_viz = count_flags(df_flags[FLAG_COLUMN].to_numpy()) >= num_flags
+
+    return pd.Series(ingest_viz, index=ids, name="ingest_viz")
+
+
+def read_ingest_viz(flag_file_path: Path, num_flags: Optional[int] = None) -> pd.Series:
+    """Reads the flag file and selects the 'good' objects, which have at least num_flags flags set in their
+    bitmask (see get_ingest_viz).
+
+    Parameters
+    ----------
+    flag_file_path : Path
+        The full path to the flag file.
+    num_flags : Optional[int], optional
+        The number of flags an object needs to be a 'good' object, by default None, which uses the NUMFLAGS
+        the flag file was made with.
+
+    Returns
+    -------
+    pd.Series
+        The 'ingest_viz' flag of each object, indexed by id.
+    """
+
+    df_flags, header = read_flag_file(flag_file_path)
+
+    return get_ingest_viz(df_flags, header, num_flags)
+
+
+def make_flag_table(
+    columns: List[str],
+    col_field_params: dict,
+    cat: pd.DataFrame,
+    snr: Optional[float] = None,
+    num_flags: Optional[int] = None,
+) -> Tuple[pd.DataFrame, Dict]:
+    """Flags which objects of the DJA catalog have high enough SNR in each filter (see get_ingest_flags), and
+    packs the flags of each object into a bitmask (see pack_flags).
+
+    Parameters
+    ----------
+    columns : List[str]
+        The list of columns to use for the DJA catalog.
+    col_field_params : dict
+        The dictionaries of parameters for the columns.
+    cat : pd.DataFrame
+        The DJA catalog dataframe for the field, with at least the columns from get_flag_input_columns.
+    snr : Optional[float], optional
+        The signal to noise ratio to flag the fluxes above, by default None, which uses SNR_MAG.
+    num_flags : Optional[int], optional
+        The number of flags an object needs to be a 'good' object, by default None, which uses NUM_FLAGS.
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, Dict]
+        The table of flags, with 'id' and FLAG_COLUMN columns, and its header keywords (see get_flag_header).
+    """
+
+    flag_col_names, flags = get_ingest_flags(columns, col_field_params, cat, snr)
+    df_flags = pd.DataFrame(
+        {
+            "id": cat[col_field_params["id"]["input_column_name"]],
+            FLAG_COLUMN: pack_flags(flags),
+        }
+    )
+
+    return df_flags, get_flag_header(flag_col_names, snr, num_flags)
+
+
+def write_flag_file(
+    df_flags: pd.DataFrame,
+    header: Mapping,
+    output_filepath: Path,
+    overwrite: bool = False,
 ):
-    """This function creates a file that flags if each object in the DJA catalog for the given field has high enough SNR in all of the filters available for that field, and also generates an overall flag that identifies if the object should be considered part of the 'good' objects in the JHIVE Visualization Tool. This is done by checking if the flux of the object is SNR_MAG times greater than the error on the flux. The overall flag is True if the object has high enough SNR in NUM_FLAGS or more filters.
+    """Writes the table of flags to a fits file, with its header keywords in the header of the table."""
+
+    utils.write_pd_to_fits(
+        df_flags, output_filepath, header=header, overwrite=overwrite
+    )
+
+
+def get_snr_matrix(
+    columns: List[str], col_field_params: dict, cat: pd.DataFrame
+) -> Tuple[List[str], np.ndarray]:
+    """Gets the signal to noise ratio (the flux over the flux error) of each object in each filter. Fluxes that
+    are flagged at any cut (positive fluxes with errors that are not positive) have an SNR of inf, and fluxes
+    that are never flagged (missing or not positive fluxes, or missing errors) have an SNR of -inf, so a flux is
+    flagged by get_snr_flags with a cut of snr if its SNR is above snr.
+
+    Parameters
+    ----------
+    columns : List[str]
+        The list of columns to use for the DJA catalog.
+    col_field_params : dict
+        The dictionaries of parameters for the columns.
+    cat : pd.DataFrame
+        The DJA catalog dataframe for the field.
+
+    Returns
+    -------
+    Tuple[List[str], np.ndarray]
+        The names of the flag column of each filter (see get_new_column_name), and the matrix of signal to noise
+        ratios, with a row for each object and a column for each filter.
+    """
+
+    flux_col_names = get_flux_column_names(columns, col_field_params)
+    snr = np.empty((len(cat), len(flux_col_names)), dtype=np.float64, order="F")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for j, col_name in enumerate(flux_col_names):
+            fluxes = cat[col_name].to_numpy(dtype=np.float64, na_value=np.nan)
+            errors = cat[get_err_column_name(col_name)].to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+            is_positive = fluxes > 0
+
+            snr[:, j] = np.where(is_positive & (errors <= 0), np.inf, fluxes / errors)
+            snr[~is_positive | np.isnan(snr[:, j]), j] = -np.inf
+
+    return [get_new_column_name(c) for c in flux_col_names], snr
+
+
+def get_core_snr(snr: np.ndarray, num_flags_values: List[int]) -> np.ndarray:
+    """Gets the highest signal to noise ratio cut at which each object is a 'good' object for each number of
+    flags n, which is the n-th highest SNR of the object over its filters. An object is a 'good' object with the
+    cuts snr_mag and n if this SNR is above snr_mag.
+
+    Parameters
+    ----------
+    snr : np.ndarray
+        The matrix of signal to noise ratios from get_snr_matrix.
+    num_flags_values : List[int]
+        The numbers of flags to get the SNRs for.
+
+    Returns
+    -------
+    np.ndarray
+        The SNRs, with a row for each object and a column for each number of flags.
+    """
+
+    num_objects, num_filters = snr.shape
+
+    # sort the SNRs of each object once, so its n-th highest SNR is in the n-th column from the end
+    sorted_snr = np.sort(snr, axis=1)
+
+    core_snr = np.full((num_objects, len(num_flags_values)), -np.inf)
+    for i, num_flags in enumerate(num_flags_values):
+        if num_flags <= 0:
+            # every object has at least no flags
+            core_snr[:, i] = np.inf
+        elif num_flags <= num_filters:
+            core_snr[:, i] = sorted_snr[:, num_filters - num_flags]
+
+    return core_snr
+
+
+def get_selection_curve(
+    core_snr: np.ndarray, snr_values: List[float], num_flags_values: List[int]
+) -> pd.DataFrame:
+    """Counts the 'good' objects for every pair of cuts in the grid of signal to noise ratios and numbers of
+    flags. The SNRs of the objects for each number of flags are sorted once, so the number of objects above each
+    SNR cut is found by a binary search.
+
+    Parameters
+    ----------
+    core_snr : np.ndarray
+        The SNRs from get_core_snr, with a column for each of the num_flags_values.
+    snr_values : List[float]
+        The signal to noise ratio cuts.
+    num_flags_values : List[int]
+        The numbers of flags of the columns of core_snr.
+
+    Returns
+    -------
+    pd.DataFrame
+        The selection curve, with a row for each pair of cuts, and the columns 'snr_mag', 'num_flags',
+        'num_core' (the number of 'good' objects) and 'core_fraction' (the fraction of objects that are 'good').
+    """
+
+    num_objects = len(core_snr)
+    snr_values = np.asarray(snr_values, dtype=np.float64)
+
+    curves = []
+    for i, num_flags in enumerate(num_flags_values):
+        sorted_core_snr = np.sort(core_snr[:, i])
+        num_core = num_objects - np.searchsorted(
+            sorted_core_snr, snr_values, side="right"
+        )
+        curves.append(
+            pd.DataFrame(
+                {
+                    "snr_mag": snr_values,
+                    "num_flags": num_flags,
+                    "num_core": num_core,
+                    "core_fraction": num_core / max(num_objects, 1),
+                }
+            )
+        )
+
+    return pd.concat(curves, ignore_index=True)
+
+
+def read_flag_input_catalogue(config_params: dict, field_params: dict) -> pd.DataFrame:
+    """Reads in only the columns of the DJA catalogue that are needed for the flags (see get_flag_input_columns)."""
+
+    file_path = utils.get_cat_filepath("cat_filename", config_params)
+    file_format = field_params["cat_filename"]["file_format"]
+    input_columns = get_flag_input_columns(
+        config_params["columns_to_use"]["cat_filename"],
+        field_params["cat_filename"]["columns"],
+    )
+    with profiling.stage("read_table") as stage:
+        cat = utils.read_table(file_path, file_format, columns=input_columns)
+        stage["num_rows"] = len(cat)
+
+    return cat
+
+
+def create_and_write_selection_curve(
+    config_params: dict,
+    field_params: dict,
+    output_path: Path,
+    snr_values: Optional[List[float]] = None,
+    num_flags_values: Optional[List[int]] = None,
+) -> pd.DataFrame:
+    """Sweeps over a grid of SNR_MAG and NUM_FLAGS cuts, and writes out the number and fraction of 'good' objects
+    with each pair of cuts, to choose the cuts without making the flag file for each of them. The DJA catalogue is
+    read once, and the signal to noise ratio of each object in each filter is found once (see get_snr_matrix), from
+    which the 'good' objects for every pair of cuts are found (see get_core_snr and get_selection_curve).
 
     Parameters
     ----------
@@ -130,29 +671,78 @@ def create_and_write_flag_file(
         The dictionary of field parameters for the DJA catalogue.
     output_path : Path
         The full path to the directory where the file will be written.
+    snr_values : Optional[List[float]], optional
+        The signal to noise ratio cuts, by default None, which uses SWEEP_SNR_VALUES.
+    num_flags_values : Optional[List[int]], optional
+        The numbers of flags cuts, by default None, which uses SWEEP_NUM_FLAGS.
+
+    Returns
+    -------
+    pd.DataFrame
+        The selection curve (see get_selection_curve).
     """
 
-    # read in fits catalog for DJA
-    file_path = utils.get_cat_filepath("cat_filename", config_params)
-    file_format = field_params["cat_filename"]["file_format"]
-    cat = utils.read_table(file_path, file_format)
+    snr_values = snr_values or SWEEP_SNR_VALUES
+    num_flags_values = num_flags_values or SWEEP_NUM_FLAGS
 
-    # create a dataframe of flags that identify which objects have high enough SNR in each filter
-    df_ingest = filter_catalog(
-        config_params["columns_to_use"]["cat_filename"],
-        field_params["cat_filename"]["columns"],
-        cat,
-    )
+    cat = read_flag_input_catalogue(config_params, field_params)
+
+    with profiling.stage("get_selection_curve", len(cat)):
+        _, snr = get_snr_matrix(
+            config_params["columns_to_use"]["cat_filename"],
+            field_params["cat_filename"]["columns"],
+            cat,
+        )
+        core_snr = get_core_snr(snr, num_flags_values)
+        df_curve = get_selection_curve(core_snr, snr_values, num_flags_values)
+
+    # write out the file
+    with profiling.stage("write_selection_curve", len(df_curve)):
+        utils.write_csv(
+            df_curve,
+            get_selection_curve_filepath(output_path),
+            decimals={"snr_mag": 2, "core_fraction": 4},
+        )
+
+    return df_curve
+
+
+def create_and_write_flag_file(
+    config_params: dict,
+    field_params: dict,
+    output_path: Path,
+    snr: Optional[float] = None,
+    num_flags: Optional[int] = None,
+):
+    """This function creates a file that flags if each object in the DJA catalog for the given field has high enough SNR in each of the filters available for that field. This is done by checking if the flux of the object is SNR_MAG times greater than the error on the flux. The flags of each object are packed into a bitmask (see pack_flags), with the filter of each bit in the header of the file (see get_flag_header). An object is considered part of the 'good' objects in the JHIVE Visualization Tool if it has high enough SNR in NUM_FLAGS or more filters, which is found from the bitmasks when the file is read (see read_ingest_viz).
 
-    # get a column that has the number of truth values in that row
-    columns_to_sum = df_ingest.drop("id", axis=1)  # don't add up the id column
-    flag_values = columns_to_sum.sum(axis=1)
+    Parameters
+    ----------
+    config_params : dict
+        The dictionary of configuration parameters for the field.
+    field_params : dict
+        The dictionary of field parameters for the DJA catalogue.
+    output_path : Path
+        The full path to the directory where the file will be written.
+    snr : Optional[float], optional
+        The signal to noise ratio to flag the fluxes above, by default None, which uses SNR_MAG.
+    num_flags : Optional[int], optional
+        The number of flags an object needs to be a 'good' object, by default None, which uses NUM_FLAGS.
+    """
 
-    # create viz flag column based on the number of positive flags in flag_values
-    viz_flag = flag_values >= NUM_FLAGS
+    # read in only the columns of the fits catalog for DJA that are needed for the flags
+    cat = read_flag_input_catalogue(config_params, field_params)
 
-    df_ingest["ingest_viz"] = viz_flag
+    with profiling.stage("filter_catalog", len(cat)):
+        # flag which objects have high enough SNR in each filter, and pack the flags of each object into a bitmask
+        df_ingest, header = make_flag_table(
+            config_params["columns_to_use"]["cat_filename"],
+            field_params["cat_filename"]["columns"],
+            cat,
+            snr,
+            num_flags,
+        )
 
     # write out the file
-    output_filepath = get_flagfile_filepath(output_path)
-    utils.write_pd_to_fits(df_ingest, output_filepath)
+    with profiling.stage("write_flag_file", len(df_ingest)):
+        write_flag_file(df_ingest, header, get_flagfile_filepath(output_path))
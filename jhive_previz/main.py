@@ -1,12 +1,22 @@
 from pathlib import Path
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import yaml
-from typing import Union, Mapping, Tuple, List, Dict
+from typing import Union, Mapping, Tuple, List, Dict, Optional
 import typer
 from typing_extensions import Annotated
 
-from . import dataproc
-from . import metadata
-from . import filterobjects
+from . import cache
+from . import profiling
+
+# the modules that process the catalogues import pandas and astropy, which are slow to import, so they are
+# only imported by the commands that process a field, and the commands start quickly (i.e. for --help)
+
+# the field parameters of a worker process of a batch, see init_batch_worker
+_batch_field_params: Optional[Mapping] = None
 
 
 # Validation functions
@@ -124,15 +134,63 @@ def load_config(
     config_params = read_yaml(config_path)
 
     # read the field params files into a dictionary
-    field_params = {}
-
-    for i in range(0, len(field_paths)):
-        field_param = read_yaml(field_paths[i])
-        field_params[field_param["file_name"]] = field_param
+    field_params = load_field_params(field_paths)
 
     return config_params, field_params
 
 
+def load_field_params(field_paths: List[Path]) -> Dict[str, Mapping]:
+    """Loads in the fields files and returns them as a dictionary, with the file name key of each
+    fields file (i.e. 'cat_filename') as the key. Each fields file is validated and compiled into a
+    schema.CatalogueSchema, which can be used as the dictionary of the fields file, and the compiled
+    fields files are cached (see schema.get_schema_cache_dir) so they are only parsed again if they change.
+
+    Parameters
+    ----------
+    field_paths: List[Path]
+        The full paths to the fields yaml files.
+
+    Returns
+    -------
+    Dict[str, Mapping]
+        The field_params dictionary.
+    """
+    from . import schema
+
+    return schema.load_field_schema(field_paths, schema.get_schema_cache_dir())
+
+
+def get_batch_config_paths(config_paths: str) -> List[Path]:
+    """Gets the paths to all of the config files to process in a batch. If the given path is a directory,
+    every '*_config.yaml' file in it is used, otherwise it is treated as a glob pattern.
+
+    Parameters
+    ----------
+    config_paths : str
+        The path to a directory of config files, or a glob pattern matching config files.
+
+    Returns
+    -------
+    List[Path]
+        The sorted list of paths to the config files.
+
+    Raises
+    ------
+    FileNotFoundError
+        Raises an error if no config files are found.
+    """
+
+    if Path(config_paths).is_dir():
+        paths = sorted(Path(config_paths).glob("*_config.yaml"))
+    else:
+        paths = sorted(Path(p) for p in glob.glob(config_paths))
+
+    if len(paths) == 0:
+        raise FileNotFoundError(f"No config files found at {config_paths}.")
+
+    return paths
+
+
 def validate_config_paths(
     config_path: str, field_paths: List[str]
 ) -> Tuple[Path, List[Path]]:
@@ -188,6 +246,237 @@ def validate_config_paths(
 
 
 # Organizational functions
+def process_field(
+    config_params: Mapping,
+    field_params: Mapping,
+    use_flag_file: bool = True,
+    process_options: Optional[Dict] = None,
+    chunk_size: Optional[int] = None,
+    density_max_level: Optional[int] = None,
+    write_flag_file: bool = True,
+    percentiles: Optional[List[float]] = None,
+):
+    """Processes the catalogues for a single field and writes out the data and metadata files to
+    the output folder of that field.
+
+    Parameters
+    ----------
+    config_params : Mapping
+        The dictionary of config parameters for the field.
+    field_params : Mapping
+        The dictionary of field parameters for all of the catalogues.
+    use_flag_file : bool, optional
+        If True, use the flag file to split the objects into a core and raw catalogue, by default True
+    process_options : Optional[Dict], optional
+        Any additional keyword arguments to pass to dataproc.process_data (or process_data_in_chunks), i.e. {'memmap': True}, by default None
+    chunk_size : Optional[int], optional
+        If given, process the main catalogue in chunks of this many rows with dataproc.process_data_in_chunks, by default None
+    density_max_level : Optional[int], optional
+        If given, also write density pyramids of each catalogue with 2**density_max_level bins along each axis at the finest level, by default None
+    write_flag_file : bool, optional
+        If True (with 'make_flags' in process_options), write the ingest flags that are made to the flag file, by default True
+    percentiles : Optional[List[float]], optional
+        The percentiles of each column to add to the metadata files, by default None, which uses stats.DEFAULT_PERCENTILES
+    """
+
+    from . import bundle, dataproc, density, metadata, sketches, stats, tiles
+
+    process_options = process_options or {}
+    percentiles = percentiles or stats.DEFAULT_PERCENTILES
+
+    # validate and create the output path if necessary
+    validate_cat_path(config_params)
+    output_path = create_and_validate_output_path(config_params)
+
+    # validate the flag file path if necessary
+    flag_file_path = None
+    if use_flag_file and process_options.get("make_flags", False):
+        # the flags are made in this run, and written to the flag file
+        if write_flag_file:
+            flag_file_path = output_path / config_params["flag_file_name"]
+    elif use_flag_file:
+        flag_file_path = output_path / config_params["flag_file_name"]
+        if not flag_file_path.is_file():
+            raise FileNotFoundError(
+                f"The ingest flag file does not exist at {flag_file_path}, please make sure that this file exists or set use_flag_file to False."
+            )
+
+    if chunk_size is not None:
+        # stream the catalogue through in chunks, keeping only the stats of the columns of each chunk for the metadata,
+        # with the percentiles found from the column sketches
+        with profiling.stage("process_data_in_chunks") as stage:
+            outputs = dataproc.process_data_in_chunks(
+                config_params,
+                field_params,
+                output_path,
+                use_flag_file,
+                flag_file_path,
+                chunk_size,
+                percentiles=percentiles,
+                **process_options,
+            )
+            stage["num_rows"] = sum(num_objects for _, num_objects in outputs.values())
+
+    # create the data file(s)
+    elif use_flag_file:
+        with profiling.stage("process_data") as stage:
+            df_raw, df_core = dataproc.process_data(
+                config_params,
+                field_params,
+                output_path,
+                use_flag_file,
+                flag_file_path,
+                **process_options,
+            )
+            stage["num_rows"] = len(df_raw) + len(df_core)
+        outputs = {"raw": (df_raw, None), "core": (df_core, None)}
+    else:
+        with profiling.stage("process_data") as stage:
+            df_raw = dataproc.process_data(
+                config_params,
+                field_params,
+                output_path,
+                use_flag_file,
+                **process_options,
+            )
+            stage["num_rows"] = len(df_raw)
+        outputs = {"raw": (df_raw, None)}
+
+    # bin the processed catalogue(s) into density pyramids
+    if density_max_level is not None:
+        for suffix, (df_cat, num_objects) in outputs.items():
+            if chunk_size is None:
+                with profiling.stage("density_pyramids", len(df_cat)):
+                    density.write_density_pyramids(
+                        df_cat, output_path, suffix, density_max_level
+                    )
+            else:
+                # only the stats of the catalogue are in memory, so the binned columns are read back in chunks
+                data_file_path = dataproc.get_data_output_filepath(
+                    output_path, suffix, process_options.get("output_format", "csv")
+                )
+                with profiling.stage("density_pyramids", num_objects):
+                    density.write_density_pyramids_from_file(
+                        data_file_path,
+                        df_cat.loc[["min", "max"]],
+                        output_path,
+                        suffix,
+                        density_max_level,
+                        chunk_size=chunk_size,
+                    )
+
+    # create the related metadata file(s), with the names of the other files written for each catalogue
+    for suffix, (df_cat, num_objects) in outputs.items():
+        output_files = {}
+        if process_options.get("column_bundle", False):
+            output_files["column_bundle"] = bundle.get_bundle_filepaths(
+                output_path, suffix
+            )[1].name
+        if process_options.get("tile_order") is not None:
+            output_files["tile_index"] = tiles.get_tile_paths(output_path, suffix)[
+                "index"
+            ].name
+        if density_max_level is not None:
+            output_files["density_index"] = density.get_density_paths(
+                output_path, suffix
+            )["index"].name
+        if chunk_size is not None:
+            # the column sketches of catalogues processed in chunks are written as they are processed
+            output_files["column_sketches"] = sketches.get_sketch_filepath(
+                output_path, suffix
+            ).name
+
+        with profiling.stage("create_metadata_file"):
+            metadata.create_metadata_file(
+                config_params,
+                field_params,
+                df_cat,
+                output_path,
+                suffix,
+                num_objects,
+                output_files,
+                # the stats of catalogues processed in chunks are already computed
+                column_stats=df_cat if chunk_size is not None else None,
+                percentiles=percentiles,
+                write_sketches=chunk_size is None,
+            )
+
+
+def init_batch_worker(field_params: Mapping):
+    """Sets the field parameters of a worker process of a batch, so that they are sent to each worker once
+    (and are shared by every field it processes), rather than with each field.
+
+    Parameters
+    ----------
+    field_params : Mapping
+        The dictionary of field parameters for all of the catalogues.
+    """
+
+    global _batch_field_params
+    _batch_field_params = field_params
+
+
+def process_field_and_time(
+    config_path: Path,
+    field_params: Optional[Mapping] = None,
+    use_flag_file: bool = True,
+    process_options: Optional[Dict] = None,
+    **field_options,
+) -> Dict:
+    """Loads the config file for a field and processes it with process_field, catching any errors
+    so that one failing field does not stop a batch. This is run in the worker processes of a batch.
+
+    Parameters
+    ----------
+    config_path : Path
+        The full path to the config file for the field.
+    field_params : Optional[Mapping], optional
+        The dictionary of field parameters for all of the catalogues, by default None, which uses the field
+        parameters of the batch worker (see init_batch_worker).
+    use_flag_file : bool, optional
+        If True, use the flag file to split the objects into a core and raw catalogue, by default True
+    process_options : Optional[Dict], optional
+        Any additional keyword arguments to pass to dataproc.process_data, by default None
+    **field_options
+        The other keyword arguments of process_field, i.e. chunk_size.
+
+    Returns
+    -------
+    Dict
+        The summary for the field, with its name, status, error message (if any), and the time taken in seconds.
+    """
+
+    start_time = time.perf_counter()
+    summary = {"config_path": str(config_path), "field_name": None}
+    if field_params is None:
+        field_params = _batch_field_params
+
+    try:
+        config_params = read_yaml(config_path)
+        summary["field_name"] = config_params["field_name"]
+        summary["output_path"] = str(
+            Path(config_params["output_path"]) / config_params["version"]
+        )
+
+        process_field(
+            config_params,
+            field_params,
+            use_flag_file,
+            process_options,
+            **field_options,
+        )
+        summary["status"] = "success"
+        summary["error"] = None
+
+    except Exception as e:
+        summary["status"] = "failed"
+        summary["error"] = f"{type(e).__name__}: {e}"
+
+    summary["time_seconds"] = round(time.perf_counter() - start_time, 3)
+
+    return summary
+
+
 def process_data_and_write_metadata(
     config_path: Annotated[
         str, typer.Option(help="The full path and file name of the base config file.")
@@ -207,6 +496,93 @@ def process_data_and_write_metadata(
             help="If True, use the given flag file. If False, will put all objects into raw catalog."
         ),
     ] = True,
+    make_flags: Annotated[
+        bool,
+        typer.Option(
+            help="If True (with --use-flag-file), make the ingest flags from the DJA catalogue while it is processed, instead of reading the flag file made by make_flag_file."
+        ),
+    ] = False,
+    write_flag_file: Annotated[
+        bool,
+        typer.Option(
+            help="If True (with --make-flags), also write the flags that are made to the flag file in the output folder."
+        ),
+    ] = True,
+    memmap: Annotated[
+        bool,
+        typer.Option(
+            help="If True, memory-map fits catalogues and only read the columns needed as they are processed."
+        ),
+    ] = False,
+    cache_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            help="The path to a directory to cache processed catalogues in, so unchanged catalogues are not processed again. No cache is used if not given."
+        ),
+    ] = None,
+    cache_max_size_gb: Annotated[
+        float,
+        typer.Option(
+            help="The maximum size of the cache directory in GB, the least recently used files are deleted past this size."
+        ),
+    ] = cache.DEFAULT_MAX_CACHE_GB,
+    output_format: Annotated[
+        str,
+        typer.Option(
+            help="The format of the output data files, one of 'csv', 'parquet' or 'feather'. Parquet and feather require pyarrow."
+        ),
+    ] = "csv",
+    chunk_size: Annotated[
+        Optional[int],
+        typer.Option(
+            help="If given, process the main catalogue in chunks of this many rows, so that catalogues larger than memory can be processed."
+        ),
+    ] = None,
+    compact: Annotated[
+        bool,
+        typer.Option(
+            help="If True, store each column in the narrowest dtype that keeps its output decimals (i.e. float32), to use less memory."
+        ),
+    ] = False,
+    column_bundle: Annotated[
+        bool,
+        typer.Option(
+            help="If True, also write each catalogue as a bundle of binary typed-array columns with a json manifest, for the visualization tool to load without parsing."
+        ),
+    ] = False,
+    tile_order: Annotated[
+        Optional[int],
+        typer.Option(
+            help="If given, also partition each catalogue into HEALPix tiles of this order (from 0 to 29) by ra and dec, with one file per tile and a tile index (i.e. 10 for tiles about 3.4 arcmin across).",
+            # tiles.MAX_TILE_ORDER, as tiles is not imported until a field is processed
+            min=0,
+            max=29,
+        ),
+    ] = None,
+    density_max_level: Annotated[
+        Optional[int],
+        typer.Option(
+            help="If given, also bin each catalogue into density pyramids of ra and dec (and the other pairs in density.DENSITY_PAIRS) for scatter plots, with 2**level bins along each axis at the finest level (i.e. 8 for 256 x 256 bins)."
+        ),
+    ] = None,
+    percentiles: Annotated[
+        Optional[List[float]],
+        typer.Option(
+            help="The percentiles of each column to add to the metadata files (i.e. --percentiles 5 --percentiles 95). Defaults to stats.DEFAULT_PERCENTILES. For catalogues processed in chunks, they are found from the column sketches: exactly for columns with at most sketches.DEFAULT_COMPRESSION values, and otherwise to within about 0.1% in rank."
+        ),
+    ] = None,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            help="If True, record the wall time, CPU time, rows and peak memory of each stage of the run and write them to profile.json in the output folder."
+        ),
+    ] = False,
+    profile_stacks: Annotated[
+        bool,
+        typer.Option(
+            help="If True (with --profile), also profile each stage with cProfile and write the collapsed stacks to profile_stacks.txt, to draw as a flame graph."
+        ),
+    ] = False,
 ):
     """The main function. This reads in the two config files, validates that
     the required parameters exist, and then creates the new filtered and converted
@@ -222,43 +598,74 @@ def process_data_and_write_metadata(
         "./metadata_files/v1.0/mf_fields.yaml",
         "./metadata_files/v1.0/umap_fields.yaml",]
         The full path and file name of the fields yaml file.
+    use_flag_file: bool, default = True
+        If True, use the flag file to split the objects into a core and raw catalogue.
+    make_flags: bool, default = False
+        If True (with use_flag_file), make the ingest flags from the DJA catalogue while it is processed, instead of reading the flag file.
+    write_flag_file: bool, default = True
+        If True (with make_flags), also write the flags that are made to the flag file in the output folder.
+    memmap: bool, default = False
+        If True, memory-map fits catalogues and only read the columns needed as they are processed.
+    cache_dir: Optional[str], default = None
+        The path to a directory to cache processed catalogues in. No cache is used if None.
+    cache_max_size_gb: float, default = 5
+        The maximum size of the cache directory in GB.
+    output_format: str, default = 'csv'
+        The format of the output data files, one of 'csv', 'parquet' or 'feather'.
+    chunk_size: Optional[int], default = None
+        If given, process the main catalogue in chunks of this many rows. The whole catalogue is processed at once if None.
+    compact: bool, default = False
+        If True, store each column in the narrowest dtype that keeps its output decimals.
+    column_bundle: bool, default = False
+        If True, also write each catalogue as a bundle of binary typed-array columns with a json manifest.
+    tile_order: Optional[int], default = None
+        If given, also partition each catalogue into HEALPix tiles of this order (from 0 to tiles.MAX_TILE_ORDER), with one file per tile and a tile index.
+    density_max_level: Optional[int], default = None
+        If given, also bin each catalogue into density pyramids for scatter plots, with 2**density_max_level bins along each axis at the finest level.
+    percentiles: Optional[List[float]], default = None
+        The percentiles of each column to add to the metadata files. Uses stats.DEFAULT_PERCENTILES if None.
+    profile: bool, default = False
+        If True, record the wall time, CPU time, rows and peak memory of each stage and write them to profile.json in the output folder.
+    profile_stacks: bool, default = False
+        If True (with profile), also write the collapsed cProfile stacks of each stage to profile_stacks.txt.
     """
 
+    from . import utils
+
     # get the config parameters
     config_path, field_paths = validate_config_paths(config_path, field_paths)
     config_params, field_params = load_config(config_path, field_paths)
 
-    # validate and create the output path if necessary
-    validate_cat_path(config_params)
-    output_path = create_and_validate_output_path(config_params)
+    process_options = {
+        "memmap": memmap,
+        "cache_dir": cache_dir,
+        "max_cache_bytes": int(cache_max_size_gb * 1024**3),
+        "output_format": utils.validate_output_format(output_format),
+        "compact": compact,
+        "column_bundle": column_bundle,
+        "tile_order": tile_order,
+        "make_flags": make_flags,
+    }
+    # the options of the field itself, rather than of processing its catalogues
+    field_options = {
+        "chunk_size": chunk_size,
+        "density_max_level": density_max_level,
+        "write_flag_file": write_flag_file,
+        "percentiles": percentiles,
+    }
 
-    # validate the flag file path if necessary
-    if use_flag_file:
-        flag_file_path = output_path / config_params["flag_file_name"]
-        if not flag_file_path.is_file():
-            raise FileNotFoundError(
-                f"The ingest flag file does not exist at {flag_file_path}, please make sure that this file exists or set use_flag_file to False."
+    # the profile is written to the output folder of the field
+    output_path = create_and_validate_output_path(config_params)
+    with profiling.profile_run(output_path, profile, use_cprofile=profile_stacks):
+        with profiling.stage("process_field"):
+            process_field(
+                config_params,
+                field_params,
+                use_flag_file,
+                process_options,
+                **field_options,
             )
 
-    # create the csv file(s) and related metadata file(s)
-    if use_flag_file:
-        df_raw, df_core = dataproc.process_data(
-            config_params, field_params, output_path, use_flag_file, flag_file_path
-        )
-        metadata.create_metadata_file(
-            config_params, field_params, df_raw, output_path, "raw"
-        )
-        metadata.create_metadata_file(
-            config_params, field_params, df_core, output_path, "core"
-        )
-    else:
-        df_raw = dataproc.process_data(
-            config_params, field_params, output_path, use_flag_file
-        )
-        metadata.create_metadata_file(
-            config_params, field_params, df_raw, output_path, "raw"
-        )
-
 
 def generate_flag_file(
     config_path: Annotated[
@@ -267,8 +674,51 @@ def generate_flag_file(
     field_path: Annotated[
         str, typer.Option(help="The full path and file name of the DJA fields file.")
     ] = "./metadata_files/v1.0/dja_fields.yaml",
+    snr_mag: Annotated[
+        Optional[float],
+        typer.Option(
+            help="The signal to noise ratio to flag the fluxes above. Defaults to filterobjects.SNR_MAG."
+        ),
+    ] = None,
+    num_flags: Annotated[
+        Optional[int],
+        typer.Option(
+            help="The number of flags an object needs to be in the core catalogue. Defaults to filterobjects.NUM_FLAGS."
+        ),
+    ] = None,
+    sweep: Annotated[
+        bool,
+        typer.Option(
+            help="If True, instead of making the flag file, count the core objects for a grid of signal to noise ratio and number of flags cuts, and write them to selection_curve.csv in the output folder."
+        ),
+    ] = False,
+    sweep_snr: Annotated[
+        Optional[List[float]],
+        typer.Option(
+            help="The signal to noise ratio cuts of the sweep (i.e. --sweep-snr 5 --sweep-snr 10). Defaults to filterobjects.SWEEP_SNR_VALUES."
+        ),
+    ] = None,
+    sweep_num_flags: Annotated[
+        Optional[List[int]],
+        typer.Option(
+            help="The number of flags cuts of the sweep. Defaults to filterobjects.SWEEP_NUM_FLAGS."
+        ),
+    ] = None,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            help="If True, record the wall time, CPU time, rows and peak memory of each stage of making the flag file and write them to profile.json in the output folder."
+        ),
+    ] = False,
+    profile_stacks: Annotated[
+        bool,
+        typer.Option(
+            help="If True (with --profile), also profile each stage with cProfile and write the collapsed stacks to profile_stacks.txt, to draw as a flame graph."
+        ),
+    ] = False,
 ):
-    """The script that generates a flag file for a specific field and writes it to 'ingest_flag.fits' in the output directory. This flag file contains a flag for each object in the field for each filter available in that field, which is True if the flux detected in the filter is SNR_MAG (currently 5) times the flux error. There is also an 'ingest_viz' column, which identifies if the object is considered 'good' for the JHIVE Visualization Tool. This flag is True if the object has at least NUM_FLAGS (currently 1) True flags in any of the filters it was observed in.
+    """The script that generates a flag file for a specific field and writes it to 'ingest_flags.fits' in the output directory. This flag file contains a bitmask for each object in the field, with a flag for each filter available in that field, which is True if the flux detected in the filter is SNR_MAG (currently 10) times the flux error. An object is considered 'good' for the JHIVE Visualization Tool if it has at least NUM_FLAGS (currently 4) True flags in any of the filters it was observed in.
+    With sweep, the flag file is not made. Instead, the number of 'good' objects for each pair of cuts in a grid of signal to noise ratios and numbers of flags is written to 'selection_curve.csv' in the output directory, to choose the cuts with.
 
     Parameters
     ----------
@@ -276,8 +726,24 @@ def generate_flag_file(
         The full path and file name of the base config file, by default "./config_files/v1.0/abell2744_config.yaml"
     field_path : str
         The full path and file name of the DJA fields file, by default "./metadata_files/v1.0/dja_fields.yaml"
+    snr_mag : Optional[float], optional
+        The signal to noise ratio to flag the fluxes above, by default None, which uses filterobjects.SNR_MAG
+    num_flags : Optional[int], optional
+        The number of flags an object needs to be 'good', by default None, which uses filterobjects.NUM_FLAGS
+    sweep : bool, optional
+        If True, write the selection curve of a grid of cuts instead of the flag file, by default False
+    sweep_snr : Optional[List[float]], optional
+        The signal to noise ratio cuts of the sweep, by default None, which uses filterobjects.SWEEP_SNR_VALUES
+    sweep_num_flags : Optional[List[int]], optional
+        The number of flags cuts of the sweep, by default None, which uses filterobjects.SWEEP_NUM_FLAGS
+    profile : bool, optional
+        If True, record the wall time, CPU time, rows and peak memory of each stage and write them to profile.json in the output folder, by default False
+    profile_stacks : bool, optional
+        If True (with profile), also write the collapsed cProfile stacks of each stage to profile_stacks.txt, by default False
     """
 
+    from . import filterobjects
+
     # get the config parameters
     config_path, field_path = validate_config_paths(config_path, [field_path])
     config_params, field_params = load_config(config_path, field_path)
@@ -286,7 +752,303 @@ def generate_flag_file(
     validate_cat_path(config_params)
     output_path = create_and_validate_output_path(config_params)
 
-    filterobjects.create_and_write_flag_file(config_params, field_params, output_path)
+    with profiling.profile_run(output_path, profile, use_cprofile=profile_stacks):
+        if sweep:
+            filterobjects.create_and_write_selection_curve(
+                config_params, field_params, output_path, sweep_snr, sweep_num_flags
+            )
+        else:
+            filterobjects.create_and_write_flag_file(
+                config_params, field_params, output_path, snr_mag, num_flags
+            )
+
+
+def process_batch(
+    config_paths: Annotated[
+        str,
+        typer.Option(
+            help="The path to a directory of config files, or a glob pattern matching the config files to process."
+        ),
+    ] = "./config_files/v1.0/",
+    field_paths: Annotated[
+        List[str],
+        typer.Option(help="A list of full paths to the field config files."),
+    ] = [
+        "./metadata_files/v1.0/dja_fields.yaml",
+        "./metadata_files/v1.0/db_fields.yaml",
+        "./metadata_files/v1.0/mf_fields.yaml",
+        "./metadata_files/v1.0/umap_fields.yaml",
+    ],
+    num_workers: Annotated[
+        Optional[int],
+        typer.Option(
+            help="The number of fields to process at once. Defaults to the number of CPUs."
+        ),
+    ] = None,
+    use_flag_file: Annotated[
+        bool,
+        typer.Option(
+            help="If True, use the flag file of each field. If False, will put all objects into raw catalog."
+        ),
+    ] = True,
+    make_flags: Annotated[
+        bool,
+        typer.Option(
+            help="If True (with --use-flag-file), make the ingest flags from the DJA catalogue while it is processed, instead of reading the flag file made by make_flag_file."
+        ),
+    ] = False,
+    write_flag_file: Annotated[
+        bool,
+        typer.Option(
+            help="If True (with --make-flags), also write the flags that are made to the flag file in the output folder."
+        ),
+    ] = True,
+    memmap: Annotated[
+        bool,
+        typer.Option(
+            help="If True, memory-map fits catalogues and only read the columns needed as they are processed."
+        ),
+    ] = False,
+    cache_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            help="The path to a directory to cache processed catalogues in, so unchanged catalogues are not processed again. No cache is used if not given."
+        ),
+    ] = None,
+    cache_max_size_gb: Annotated[
+        float,
+        typer.Option(
+            help="The maximum size of the cache directory in GB, the least recently used files are deleted past this size."
+        ),
+    ] = cache.DEFAULT_MAX_CACHE_GB,
+    output_format: Annotated[
+        str,
+        typer.Option(
+            help="The format of the output data files, one of 'csv', 'parquet' or 'feather'. Parquet and feather require pyarrow."
+        ),
+    ] = "csv",
+    chunk_size: Annotated[
+        Optional[int],
+        typer.Option(
+            help="If given, process the main catalogue in chunks of this many rows, so that catalogues larger than memory can be processed."
+        ),
+    ] = None,
+    compact: Annotated[
+        bool,
+        typer.Option(
+            help="If True, store each column in the narrowest dtype that keeps its output decimals (i.e. float32), to use less memory."
+        ),
+    ] = False,
+    column_bundle: Annotated[
+        bool,
+        typer.Option(
+            help="If True, also write each catalogue as a bundle of binary typed-array columns with a json manifest, for the visualization tool to load without parsing."
+        ),
+    ] = False,
+    tile_order: Annotated[
+        Optional[int],
+        typer.Option(
+            help="If given, also partition each catalogue into HEALPix tiles of this order (from 0 to 29) by ra and dec, with one file per tile and a tile index (i.e. 10 for tiles about 3.4 arcmin across).",
+            # tiles.MAX_TILE_ORDER, as tiles is not imported until a field is processed
+            min=0,
+            max=29,
+        ),
+    ] = None,
+    density_max_level: Annotated[
+        Optional[int],
+        typer.Option(
+            help="If given, also bin each catalogue into density pyramids of ra and dec (and the other pairs in density.DENSITY_PAIRS) for scatter plots, with 2**level bins along each axis at the finest level (i.e. 8 for 256 x 256 bins)."
+        ),
+    ] = None,
+    percentiles: Annotated[
+        Optional[List[float]],
+        typer.Option(
+            help="The percentiles of each column to add to the metadata files (i.e. --percentiles 5 --percentiles 95). Defaults to stats.DEFAULT_PERCENTILES. For catalogues processed in chunks, they are found from the column sketches: exactly for columns with at most sketches.DEFAULT_COMPRESSION values, and otherwise to within about 0.1% in rank."
+        ),
+    ] = None,
+) -> List[Dict]:
+    """Processes every field with a config file in the given directory (or matching the given glob pattern)
+    concurrently in a pool of processes. The fields files are only read once and shared with every field.
+    The outputs of each field are the same as running jhive_previz on that field. A summary of the status and
+    time taken for each field is printed, and written to 'batch_summary.json' in the [output_path]/[version]/
+    directory of the fields.
+
+    Parameters
+    ----------
+    config_paths : str, default = './config_files/v1.0/'
+        The path to a directory of config files, or a glob pattern matching the config files to process.
+    field_paths : List[str]
+        The full paths to the fields yaml files.
+    num_workers : Optional[int], default = None
+        The number of fields to process at once. If None, the number of CPUs is used.
+    use_flag_file : bool, default = True
+        If True, use the flag file of each field to split the objects into a core and raw catalogue.
+    make_flags : bool, default = False
+        If True (with use_flag_file), make the ingest flags of each field from its DJA catalogue while it is processed, instead of reading its flag file.
+    write_flag_file : bool, default = True
+        If True (with make_flags), also write the flags that are made to the flag file of each field.
+    memmap : bool, default = False
+        If True, memory-map fits catalogues and only read the columns needed as they are processed.
+    cache_dir : Optional[str], default = None
+        The path to a directory to cache processed catalogues in, shared by all of the fields. No cache is used if None.
+    cache_max_size_gb : float, default = 5
+        The maximum size of the cache directory in GB.
+    output_format : str, default = 'csv'
+        The format of the output data files, one of 'csv', 'parquet' or 'feather'.
+    chunk_size : Optional[int], default = None
+        If given, process the main catalogue of each field in chunks of this many rows. The whole catalogue is processed at once if None.
+    compact : bool, default = False
+        If True, store each column in the narrowest dtype that keeps its output decimals.
+    column_bundle : bool, default = False
+        If True, also write each catalogue as a bundle of binary typed-array columns with a json manifest.
+    tile_order : Optional[int], default = None
+        If given, also partition each catalogue into HEALPix tiles of this order (from 0 to tiles.MAX_TILE_ORDER), with one file per tile and a tile index.
+    density_max_level : Optional[int], default = None
+        If given, also bin each catalogue into density pyramids for scatter plots, with 2**density_max_level bins along each axis at the finest level.
+    percentiles : Optional[List[float]], default = None
+        The percentiles of each column to add to the metadata files of each field. Uses stats.DEFAULT_PERCENTILES if None.
+
+    Returns
+    -------
+    List[Dict]
+        The summary of each field.
+    """
+
+    # import the processing modules before the workers are started, so each worker does not import them again
+    from . import dataproc, utils
+
+    batch_config_paths = get_batch_config_paths(config_paths)
+
+    # read in the field params once for all of the fields
+    _, field_paths = validate_config_paths(batch_config_paths[0], field_paths)
+    field_params = load_field_params(field_paths)
+
+    if num_workers is None:
+        num_workers = os.cpu_count()
+
+    process_options = {
+        "memmap": memmap,
+        "cache_dir": cache_dir,
+        "max_cache_bytes": int(cache_max_size_gb * 1024**3),
+        "output_format": utils.validate_output_format(output_format),
+        "compact": compact,
+        "column_bundle": column_bundle,
+        "tile_order": tile_order,
+        "make_flags": make_flags,
+    }
+    # the options of the field itself, rather than of processing its catalogues
+    field_options = {
+        "chunk_size": chunk_size,
+        "density_max_level": density_max_level,
+        "write_flag_file": write_flag_file,
+        "percentiles": percentiles,
+    }
+
+    # the compiled field parameters are given to each worker once, and shared read-only by its fields
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=init_batch_worker,
+        initargs=(field_params,),
+    ) as executor:
+        futures = [
+            executor.submit(
+                process_field_and_time,
+                path,
+                None,
+                use_flag_file,
+                process_options,
+                **field_options,
+            )
+            for path in batch_config_paths
+        ]
+        summaries = [future.result() for future in futures]
+
+    # print out the summary
+    for summary in summaries:
+        print(
+            f"{summary['field_name'] or summary['config_path']}: {summary['status']} in {summary['time_seconds']} s"
+            + (f" ({summary['error']})" if summary["error"] else "")
+        )
+
+    # write out the summaries of the fields in each output directory
+    output_summaries = {}
+    for summary in summaries:
+        if summary.get("output_path") is not None:
+            output_summaries.setdefault(summary["output_path"], []).append(summary)
+
+    for batch_output_path, fields_summary in output_summaries.items():
+        batch_output_path = utils.validate_dir_path(batch_output_path)
+        utils.write_json({"fields": fields_summary}, batch_output_path, "batch_summary")
+
+    return summaries
+
+
+def merge_sketches_and_write_output(
+    input_path: Annotated[
+        str, typer.Option(help="The path to the output for this version of the code.")
+    ] = "./output/v1.0/",
+    suffix: Annotated[
+        str,
+        typer.Option(
+            help="The suffix of the catalogue of each field to merge the sketches of, i.e. 'core' or 'raw'."
+        ),
+    ] = "core",
+    percentiles: Annotated[
+        Optional[List[float]],
+        typer.Option(
+            help="The percentiles of each column to find (i.e. --percentiles 5 --percentiles 95). Defaults to stats.DEFAULT_PERCENTILES."
+        ),
+    ] = None,
+):
+    """Merges the column sketches of the catalogue of every field in the input path (written with the metadata
+    files of each field), and writes the number of values, min and max value, and percentiles of each column over
+    all of the fields to the global percentiles file in the input path (i.e. global_percentiles_core.json). No
+    catalogues are read.
+
+    Parameters
+    ----------
+    input_path : str, optional
+        The path to the output for this version of the code, where the field folders are, by default "./output/v1.0/"
+    suffix : str, optional
+        The suffix of the catalogue of each field to merge the sketches of, by default "core"
+    percentiles : Optional[List[float]], optional
+        The percentiles of each column to find, by default None, which uses stats.DEFAULT_PERCENTILES
+
+    Raises
+    ------
+    FileNotFoundError
+        Raises a FileNotFoundError if there are no column sketches files within the field folders of the input path.
+    """
+
+    from . import sketches, stats, utils
+
+    input_path = utils.validate_dir_path(input_path)
+    sketch_file_paths = sketches.get_sketch_filepaths(input_path, suffix)
+    if len(sketch_file_paths) == 0:
+        raise FileNotFoundError(
+            f"No column sketches files for the {suffix} catalogues found in {input_path}"
+        )
+
+    merged_sketches, compression = sketches.merge_field_sketches(sketch_file_paths)
+
+    global_percentiles = {
+        "field_keys_included": [p.parent.name for p in sketch_file_paths],
+        "compression": compression,
+        "columns": {
+            c: {
+                "num_values": sketch["num_values"],
+                "min_val": sketch["min_val"],
+                "max_val": sketch["max_val"],
+                "percentiles": sketches.get_sketch_percentiles(
+                    sketch, percentiles or stats.DEFAULT_PERCENTILES
+                ),
+            }
+            for c, sketch in merged_sketches.items()
+        },
+    }
+
+    with open(sketches.get_global_percentiles_filepath(input_path, suffix), "w") as f:
+        json.dump(global_percentiles, f, indent=4)
 
 
 def process_data_and_write_metadata_entrypoint():
@@ -295,3 +1057,11 @@ def process_data_and_write_metadata_entrypoint():
 
 def generate_flag_file_entrypoint():
     typer.run(generate_flag_file)
+
+
+def process_batch_entrypoint():
+    typer.run(process_batch)
+
+
+def merge_sketches_and_write_output_entrypoint():
+    typer.run(merge_sketches_and_write_output)
@@ -2,7 +2,11 @@ import json
 from pathlib import Path
 import pandas as pd
 import numpy as np
-from typing import Mapping, Union, Dict, List
+from typing import Mapping, Union, Dict, List, Optional
+
+from . import schema
+from . import sketches
+from . import stats
 
 
 def get_metadata_output_path(output_path: Path, suffix: str) -> Path:
@@ -48,24 +52,44 @@ def get_desired_column_metadata(
     initial_json_dict = {}
 
     for filename, columns in columns_to_use.items():
+        column_specs = schema.get_catalogue_schema(field_params[filename]).column_specs
         for c in columns:
             if c in whole_cat.columns:
-                initial_json_dict[c] = field_params[filename]["columns"][c]
+                # copy the parameters, as the field parameters are shared and the min and max are added to these
+                initial_json_dict[c] = dict(column_specs[c].params)
 
     return initial_json_dict
 
 
-def add_min_max_val_to_json(initial_json_dict: Dict, whole_cat: pd.DataFrame) -> Dict:
-    """Takes an existing metadata dictionary, and adds the min and max value of each column
-    that contains ints or floats to the dictionary. It also removes any metadata columns from the
-    dictionary that don't exist in the dataframe.
+def get_stat_value(value: float, data_type: str, num_decimals: Optional[int] = None):
+    """Converts a stat of a column to a python int (for int columns) or float so it can be written to json,
+    rounding floats to the column's number of decimals to remove any float32 rounding error. NaN values are None.
+    """
+
+    if np.isnan(value):
+        return None
+    if data_type == "int":
+        return int(value)
+
+    value = float(value)
+    if num_decimals is not None:
+        value = round(value, num_decimals)
+
+    return value
+
+
+def add_column_stats_to_json(initial_json_dict: Dict, df_stats: pd.DataFrame) -> Dict:
+    """Takes an existing metadata dictionary, and adds the stats of each column that contains ints or floats
+    to the dictionary: the min and max value ('min_val' and 'max_val', which are 0 if the column has no values),
+    the number of values and missing values ('num_values' and 'num_nan'), the mean ('mean_val'), and the
+    percentiles that are in the stats ('percentiles', i.e. {'p50': 1.2}).
 
     Parameters
     ----------
     initial_json_dict : Dict
         The metadata dictionary for the pandas table, with a key for each column name.
-    whole_cat : pd.DataFrame
-        The pandas table with the data.
+    df_stats : pd.DataFrame
+        The stats of each column of the table (see stats.get_column_stats).
 
     Returns
     -------
@@ -73,34 +97,56 @@ def add_min_max_val_to_json(initial_json_dict: Dict, whole_cat: pd.DataFrame) ->
         The updated metadata dictionary.
     """
 
-    for colname in initial_json_dict.keys():
+    # the rows of the stats other than these are the percentiles (see stats.get_block_stats)
+    percentile_rows = [
+        r for r in df_stats.index if r not in stats.MERGEABLE_STATS + ["mean"]
+    ]
+
+    for colname, col_metadata in initial_json_dict.items():
+
+        # only add in the stats if the column is an int or float type
+        data_type = col_metadata["data_type"]
+        if data_type not in ["float", "int"]:
+            continue
+
+        col_stats = df_stats[colname]
+        num_decimals = col_metadata.get("output_num_decimals")
+        # the min and max are 0 if the column is empty
+        for key, stat in [("min_val", "min"), ("max_val", "max")]:
+            value = get_stat_value(col_stats[stat], data_type, num_decimals)
+            col_metadata[key] = 0 if value is None else value
+
+        col_metadata["num_values"] = int(col_stats["count"])
+        col_metadata["num_nan"] = int(col_stats["nan_count"])
+        # the mean and percentiles of int columns can be between integers, so they are floats
+        col_metadata["mean_val"] = get_stat_value(
+            col_stats["mean"], "float", num_decimals
+        )
+        if len(percentile_rows) > 0:
+            col_metadata["percentiles"] = {
+                r: get_stat_value(col_stats[r], "float", num_decimals)
+                for r in percentile_rows
+            }
 
-        # only add in a min/max value if the column is an int or float type
-        if initial_json_dict[colname]["data_type"] in ["float", "int"]:
-
-            if whole_cat[colname].dropna().empty:
-                # add in a min and max of 0 if the column is empty
-                min_val = 0.0
-                max_val = 0.0
-            else:
-                # calculate the max and min
-                min_val = whole_cat[colname].min()
-                max_val = whole_cat[colname].max()
+    return initial_json_dict
 
-            if initial_json_dict[colname]["data_type"] == "int":
-                # make sure these values are integers if the column is an integer type
-                min_val = int(min_val)
-                max_val = int(max_val)
 
-            # add the min and max values to the metadata json
-            initial_json_dict[colname]["min_val"] = min_val
-            initial_json_dict[colname]["max_val"] = max_val
+def get_stats_columns(initial_json_dict: Dict) -> List[str]:
+    """Returns the columns of the metadata dictionary that contain ints or floats, to compute the stats of."""
 
-    return initial_json_dict
+    return [
+        c
+        for c, col_metadata in initial_json_dict.items()
+        if col_metadata["data_type"] in ["float", "int"]
+    ]
 
 
 def add_top_level_metadata(
-    initial_json_dict: Dict, config_params: Mapping, whole_cat: pd.DataFrame
+    initial_json_dict: Dict,
+    config_params: Mapping,
+    whole_cat: pd.DataFrame,
+    num_objects: Optional[int] = None,
+    output_files: Optional[Dict[str, str]] = None,
 ) -> Dict:
     """Adds the top level metadata to the final output dictionary. Currently adds the field name and number of objects in the final dataframe.
 
@@ -112,6 +158,11 @@ def add_top_level_metadata(
         Dictionary of configuration parameters.
     whole_cat : pd.DataFrame
         The dataframe of data.
+    num_objects : Optional[int], optional
+        The number of objects in the catalogue, by default None, which uses the length of whole_cat.
+    output_files : Optional[Dict[str, str]], optional
+        The names of any other files written for the catalogue (i.e. {'column_bundle': 'catalog_core_columns.json'}),
+        which are added as top level keys, by default None
 
     Returns
     -------
@@ -125,7 +176,12 @@ def add_top_level_metadata(
     }
 
     # add number of objects
-    final_json_dict["num_objects"] = len(whole_cat)
+    final_json_dict["num_objects"] = (
+        len(whole_cat) if num_objects is None else num_objects
+    )
+
+    # add the other files written for the catalogue
+    final_json_dict.update(output_files or {})
 
     return final_json_dict
 
@@ -151,9 +207,15 @@ def create_metadata_file(
     whole_cat: pd.DataFrame,
     output_path: Path,
     prefix: str,
+    num_objects: Optional[int] = None,
+    output_files: Optional[Dict[str, str]] = None,
+    column_stats: Optional[pd.DataFrame] = None,
+    percentiles: Optional[List[float]] = stats.DEFAULT_PERCENTILES,
+    write_sketches: bool = True,
 ):
     """Creates a metadata file for the given data table, using metadata from field_params and generating additional values as necessary.
-      It has keys for each column, and is written as a json.
+      It has keys for each column, and is written as a json. The sketch of each int and float column (see sketches.make_column_sketch)
+      is also written to the column sketches file of the catalogue, which is referenced by the 'column_sketches' key.
 
     Parameters
     ----------
@@ -162,11 +224,26 @@ def create_metadata_file(
     field_params : Mapping
         The field parameters dictionary.
     whole_cat : pd.DataFrame
-        The dataframe to generate metadata for.
+        The dataframe to generate metadata for. This can also be the stats of the columns of the catalogue
+        (i.e. from dataproc.process_data_in_chunks), if they are also given as column_stats and num_objects is given.
     output_path : Path
         The full path to the directory where the output files will be saved.
     prefix : str
         The prefix to add to the metadata file name
+    num_objects : Optional[int], optional
+        The number of objects in the catalogue, by default None, which uses the length of whole_cat.
+    output_files : Optional[Dict[str, str]], optional
+        The names of any other files written for the catalogue, which are added as top level keys, by default None
+    column_stats : Optional[pd.DataFrame], optional
+        The stats of the columns of the catalogue (see stats.get_column_stats), by default None, which computes
+        them from whole_cat.
+    percentiles : Optional[List[float]], optional
+        The percentiles of each column to add if the stats are computed from whole_cat, by default
+        stats.DEFAULT_PERCENTILES
+    write_sketches : bool, optional
+        If True, the column sketches are made from whole_cat and written out, by default True. This should be False
+        if whole_cat is the stats of the catalogue, and the sketches are written as it is processed instead
+        (i.e. by sketches.ColumnSketchWriter).
     """
 
     # get the full path to write out metadata to
@@ -176,11 +253,29 @@ def create_metadata_file(
     initial_json_dict = get_desired_column_metadata(
         field_params, config_params["columns_to_use"], whole_cat
     )
-    initial_json_dict = add_min_max_val_to_json(initial_json_dict, whole_cat)
+    if column_stats is None:
+        # compute every stat of the int and float columns in one pass over the catalogue
+        column_stats = stats.get_column_stats(
+            whole_cat, get_stats_columns(initial_json_dict), percentiles
+        )
+    initial_json_dict = add_column_stats_to_json(initial_json_dict, column_stats)
+
+    if write_sketches:
+        sketch_file_path = sketches.get_sketch_filepath(output_path, prefix)
+        sketches.write_column_sketches(
+            sketches.get_column_sketches(
+                whole_cat, get_stats_columns(initial_json_dict)
+            ),
+            sketch_file_path,
+        )
+        output_files = {
+            **(output_files or {}),
+            "column_sketches": sketch_file_path.name,
+        }
 
     # add top level metadata
     final_json_dict = add_top_level_metadata(
-        initial_json_dict, config_params, whole_cat
+        initial_json_dict, config_params, whole_cat, num_objects, output_files
     )
 
     # write out file
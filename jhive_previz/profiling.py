@@ -0,0 +1,386 @@
+## Script to profile the stages of a run, i.e. to find which stage of a slow field run is slow
+import contextlib
+import cProfile
+import json
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PROFILE_FILENAME = "profile.json"
+STACKS_FILENAME = "profile_stacks.txt"
+# call paths with less time than this (in microseconds) are left out of the collapsed stacks
+MIN_STACK_MICROSECONDS = 1
+# the deepest call path written to the collapsed stacks
+MAX_STACK_DEPTH = 64
+
+# the profiler of the current run, if the run is being profiled
+_active_profiler: Optional["Profiler"] = None
+
+
+def get_peak_rss_mb() -> float:
+    """Returns the peak resident memory of the process so far in MB (ru_maxrss is in bytes on macOS and KB on Linux)."""
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return max_rss / 1024**2
+    return max_rss / 1024
+
+
+def get_function_name(func_key: Tuple[str, int, str]) -> str:
+    """Returns the name of a function in the stats of cProfile as 'module:function'."""
+
+    file_name, _, func_name = func_key
+    if file_name == "~":
+        # built in functions
+        return func_name
+    return Path(file_name).stem + ":" + func_name
+
+
+def get_collapsed_stacks(profile: cProfile.Profile, root: str) -> List[Tuple[str, int]]:
+    """Converts the stats of a cProfile profile to collapsed stacks (the format used to draw flame graphs), with the
+    time spent in each function on each call path in microseconds. cProfile only records the time of each caller and
+    callee pair, so the time of a function that is called from more than one path is split between the paths by the
+    time of each call.
+
+    Parameters
+    ----------
+    profile : cProfile.Profile
+        The profile to convert.
+    root : str
+        The frame to put at the root of every stack, i.e. the path of the stage.
+
+    Returns
+    -------
+    List[Tuple[str, int]]
+        The call paths, as frames separated by ';', and their time in microseconds.
+    """
+
+    stats = pstats.Stats(profile).stats
+
+    # get the functions called by each function, with the cumulative time of each call
+    callees: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+    for func_key, (_, _, _, _, callers) in stats.items():
+        for caller_key, caller_stats in callers.items():
+            callees.setdefault(caller_key, []).append((func_key, caller_stats[3]))
+
+    stacks: Dict[str, float] = {}
+
+    def add_stacks(func_key: Tuple, path: List[str], fraction: float):
+        _, _, own_time, total_time, _ = stats[func_key]
+        frames = path + [get_function_name(func_key)]
+        stack = ";".join(frames)
+        stacks[stack] = stacks.get(stack, 0.0) + own_time * fraction * 1e6
+
+        if len(frames) >= MAX_STACK_DEPTH or total_time <= 0:
+            return
+
+        for callee_key, call_time in callees.get(func_key, []):
+            callee_fraction = fraction * call_time / max(stats[callee_key][3], 1e-12)
+            # skip recursive calls and calls that are too short to show
+            if get_function_name(callee_key) in frames:
+                continue
+            if stats[callee_key][3] * callee_fraction * 1e6 < MIN_STACK_MICROSECONDS:
+                continue
+            add_stacks(callee_key, frames, min(callee_fraction, fraction))
+
+    # start from the functions that were not called by another profiled function
+    for func_key, (_, _, _, _, callers) in stats.items():
+        if len(callers) == 0:
+            add_stacks(func_key, [root], 1.0)
+
+    return [
+        (stack, int(round(microseconds)))
+        for stack, microseconds in stacks.items()
+        if microseconds >= MIN_STACK_MICROSECONDS
+    ]
+
+
+class Profiler:
+    """Records the wall time, CPU time (of the whole process), number of rows and peak memory of each stage of a
+    run. Stages can be nested, and each stage is recorded with its path (i.e. 'process_field/process_data/write_raw').
+    The peak memory is the peak memory traced by tracemalloc while the stage ran, and the peak resident memory of the
+    process once it finished. Optionally, each stage is also profiled with cProfile (only counting the time that is
+    not in one of its nested stages), and the results are written as collapsed stacks. Only the stages of the thread
+    that created the profiler are recorded.
+
+    Parameters
+    ----------
+    trace_memory : bool, optional
+        If True, trace the memory allocated by each stage with tracemalloc, by default True
+    use_cprofile : bool, optional
+        If True, profile each stage with cProfile, by default False
+    """
+
+    def __init__(self, trace_memory: bool = True, use_cprofile: bool = False):
+        self.trace_memory = trace_memory
+        self.use_cprofile = use_cprofile
+        self.stages: List[Dict] = []
+        self._records: Dict[str, Dict] = {}
+        self._thread = threading.current_thread()
+        self._open_stages: List[Dict] = []
+        self._stacks: Dict[str, int] = {}
+
+    def is_recording(self) -> bool:
+        """Returns True if the stages of the current thread are recorded."""
+        return threading.current_thread() is self._thread
+
+    def start(self):
+        """Starts tracing memory if needed."""
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        """Stops tracing memory."""
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _pause_parent(self):
+        """Keeps the peak memory of the open stage so far, and pauses its cProfile profile, before a nested stage starts."""
+
+        if len(self._open_stages) == 0:
+            return
+
+        parent = self._open_stages[-1]
+        if self.trace_memory:
+            parent["_peak_bytes"] = max(
+                parent["_peak_bytes"], tracemalloc.get_traced_memory()[1]
+            )
+        if parent["_profile"] is not None:
+            parent["_profile"].disable()
+
+    def _resume_parent(self, child_peak_bytes: int):
+        """Adds the peak memory of a nested stage to the open stage, and resumes its cProfile profile."""
+
+        if len(self._open_stages) == 0:
+            return
+
+        parent = self._open_stages[-1]
+        parent["_peak_bytes"] = max(parent["_peak_bytes"], child_peak_bytes)
+        if parent["_profile"] is not None:
+            parent["_profile"].enable()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, num_rows: Optional[int] = None) -> Iterator[Dict]:
+        """Records a stage of the run while the with block runs. The number of rows processed can be given,
+        or set in the with block as the 'num_rows' key of the dictionary that is returned. If a stage with the same
+        path is run more than once (i.e. for each chunk of a catalogue), its times and rows are added together.
+
+        Parameters
+        ----------
+        name : str
+            The name of the stage.
+        num_rows : Optional[int], optional
+            The number of rows processed by the stage, by default None
+
+        Yields
+        ------
+        Iterator[Dict]
+            The dictionary for the number of rows processed by this run of the stage.
+        """
+
+        self._pause_parent()
+
+        parent_path = self._open_stages[-1]["path"] if self._open_stages else None
+        path = name if parent_path is None else parent_path + "/" + name
+
+        if path not in self._records:
+            # the stages are kept in the order they first started
+            self._records[path] = {
+                "name": name,
+                "path": path,
+                "depth": len(self._open_stages),
+                "calls": 0,
+                "num_rows": None,
+                "wall_seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "_peak_bytes": 0,
+            }
+            self.stages.append(self._records[path])
+
+        stage_run = {
+            "path": path,
+            "num_rows": num_rows,
+            "_peak_bytes": 0,
+            "_profile": cProfile.Profile() if self.use_cprofile else None,
+        }
+        self._open_stages.append(stage_run)
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        if stage_run["_profile"] is not None:
+            stage_run["_profile"].enable()
+
+        try:
+            yield stage_run
+        finally:
+            wall_seconds = time.perf_counter() - start_wall
+            cpu_seconds = time.process_time() - start_cpu
+
+            if stage_run["_profile"] is not None:
+                stage_run["_profile"].disable()
+                for stack, microseconds in get_collapsed_stacks(
+                    stage_run["_profile"], path.replace("/", ";")
+                ):
+                    self._stacks[stack] = self._stacks.get(stack, 0) + microseconds
+
+            if self.trace_memory:
+                stage_run["_peak_bytes"] = max(
+                    stage_run["_peak_bytes"], tracemalloc.get_traced_memory()[1]
+                )
+
+            self._open_stages.pop()
+            self._resume_parent(stage_run["_peak_bytes"])
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+
+            # add this run to the record of the stage
+            record = self._records[path]
+            record["calls"] += 1
+            record["wall_seconds"] += wall_seconds
+            record["cpu_seconds"] += cpu_seconds
+            if stage_run["num_rows"] is not None:
+                record["num_rows"] = (record["num_rows"] or 0) + stage_run["num_rows"]
+            record["_peak_bytes"] = max(record["_peak_bytes"], stage_run["_peak_bytes"])
+            record["peak_rss_mb"] = round(get_peak_rss_mb(), 3)
+
+    def get_report(self) -> Dict:
+        """Returns the records of the stages, in the order they first started, with the rows processed per second
+        and the peak traced memory in MB.
+        """
+
+        stages = []
+        for record in self.stages:
+            stage = {k: v for k, v in record.items() if not k.startswith("_")}
+            stage["wall_seconds"] = round(record["wall_seconds"], 6)
+            stage["cpu_seconds"] = round(record["cpu_seconds"], 6)
+            stage["rows_per_second"] = None
+            if record["num_rows"] is not None and record["wall_seconds"] > 0:
+                stage["rows_per_second"] = round(
+                    record["num_rows"] / record["wall_seconds"], 1
+                )
+            stage["peak_traced_mb"] = (
+                round(record["_peak_bytes"] / 1024**2, 3) if self.trace_memory else None
+            )
+            stages.append(stage)
+
+        return {
+            "trace_memory": self.trace_memory,
+            "cprofile": self.use_cprofile,
+            "peak_rss_mb": round(get_peak_rss_mb(), 3),
+            "stages": stages,
+        }
+
+    def write(self, output_path: Path) -> Path:
+        """Writes the report of the stages to PROFILE_FILENAME in the output path, and the collapsed stacks to
+        STACKS_FILENAME if cProfile was used.
+
+        Parameters
+        ----------
+        output_path : Path
+            The path to the directory to write the files to.
+
+        Returns
+        -------
+        Path
+            The path to the report.
+        """
+
+        report = self.get_report()
+
+        if self.use_cprofile:
+            stacks_path = output_path / STACKS_FILENAME
+            with open(stacks_path, "w") as f:
+                for stack, microseconds in self._stacks.items():
+                    f.write(f"{stack} {microseconds}\n")
+            report["stacks_file"] = stacks_path.name
+
+        profile_path = output_path / PROFILE_FILENAME
+        with open(profile_path, "w") as f:
+            json.dump(report, f, indent=4)
+
+        return profile_path
+
+
+@contextlib.contextmanager
+def profile_run(
+    output_path: Optional[Path] = None,
+    enabled: bool = True,
+    trace_memory: bool = True,
+    use_cprofile: bool = False,
+) -> Iterator[Optional[Profiler]]:
+    """Profiles the stages of a run (see stage) while the with block runs, and writes the report to the output path
+    once it finishes (even if the run fails).
+
+    Parameters
+    ----------
+    output_path : Optional[Path], optional
+        The path to the directory to write the report to, by default None, which does not write it.
+    enabled : bool, optional
+        If False, the run is not profiled, by default True
+    trace_memory : bool, optional
+        If True, trace the memory allocated by each stage with tracemalloc, by default True
+    use_cprofile : bool, optional
+        If True, profile each stage with cProfile, by default False
+
+    Yields
+    ------
+    Iterator[Optional[Profiler]]
+        The profiler of the run, or None if it is not enabled.
+    """
+
+    global _active_profiler
+
+    if not enabled:
+        yield None
+        return
+
+    profiler = Profiler(trace_memory, use_cprofile)
+    previous_profiler = _active_profiler
+    _active_profiler = profiler
+    profiler.start()
+
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active_profiler = previous_profiler
+
+        if output_path is not None:
+            profile_path = profiler.write(output_path)
+            print(f"Profile written to {profile_path}")
+
+
+@contextlib.contextmanager
+def stage(name: str, num_rows: Optional[int] = None) -> Iterator[Dict]:
+    """Records a stage with the profiler of the current run (see Profiler.stage). If the run is not being profiled,
+    or this is not the thread that is profiled, nothing is recorded.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    num_rows : Optional[int], optional
+        The number of rows processed by the stage, by default None
+
+    Yields
+    ------
+    Iterator[Dict]
+        The dictionary for the number of rows processed by this run of the stage, as its 'num_rows' key.
+    """
+
+    if _active_profiler is None or not _active_profiler.is_recording():
+        yield {}
+        return
+
+    with _active_profiler.stage(name, num_rows) as stage_run:
+        yield stage_run
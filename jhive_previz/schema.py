@@ -0,0 +1,282 @@
+## Script to compile the fields files into typed column specs, and cache them on disk so the yaml is only parsed once
+import collections.abc
+import dataclasses
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Union
+import yaml
+
+from . import conversions
+
+# the version of the compiled schema, which is part of the name of each cache file, so old cache files are not used
+SCHEMA_CACHE_VERSION = 1
+SCHEMA_CACHE_SUFFIX = ".schema.pkl"
+# the environment variable to set the schema cache directory with, an empty value turns the cache off
+SCHEMA_CACHE_DIR_ENV = "JHIVE_PREVIZ_SCHEMA_CACHE_DIR"
+
+# the keys that every fields file and every column in it must have
+REQUIRED_KEYS = ["file_name", "file_format", "columns"]
+REQUIRED_COLUMN_KEYS = [
+    "input_column_name",
+    "data_type",
+    "input_units",
+    "output_units",
+    "output_num_decimals",
+]
+DATA_TYPES = ["int", "float", "bool"]
+
+
+class FieldSchemaError(ValueError):
+    pass
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ColumnSpec:
+    """The compiled parameters of a column in a fields file, with its conversion function resolved. The
+    parameters of the column as they are in the fields file are kept in params (i.e. for the conversion functions
+    and the metadata), and should not be changed.
+    """
+
+    name: str
+    input_column_name: str
+    data_type: str
+    input_units: Optional[str]
+    output_units: Optional[str]
+    output_num_decimals: Optional[int]
+    filt_min_val: Optional[float]
+    filt_max_val: Optional[float]
+    conversion_function: Optional[Callable]
+    # the reason there is no conversion function between the units of the column, if there is none
+    conversion_error: Optional[str]
+    params: Mapping[str, Any]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CatalogueSchema(collections.abc.Mapping):
+    """The compiled fields file of a catalogue, with a ColumnSpec for each column in column_specs. It can be
+    used as the (read-only) dictionary of the fields file, i.e. schema['columns'][c]['data_type'], so it can be
+    used anywhere the field parameters of a catalogue are used.
+    """
+
+    file_name: str
+    file_format: str
+    column_specs: Dict[str, ColumnSpec]
+    params: Mapping[str, Any]
+
+    def __getitem__(self, key: str) -> Any:
+        return self.params[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.params)
+
+    def __len__(self) -> int:
+        return len(self.params)
+
+
+def validate_field_params(field_params: Mapping, field_path: Union[str, Path] = ""):
+    """Validates that the fields file has the required keys, and that each of its columns has the required
+    keys and a valid data_type.
+
+    Parameters
+    ----------
+    field_params : Mapping
+        The dictionary of parameters of the fields file.
+    field_path : Union[str, Path], optional
+        The path to the fields file, for the error messages, by default ""
+
+    Raises
+    ------
+    FieldSchemaError
+        Raises a FieldSchemaError if a key is missing or a data_type is not one of DATA_TYPES.
+    """
+
+    missing_keys = [k for k in REQUIRED_KEYS if k not in field_params]
+    if len(missing_keys) > 0:
+        raise FieldSchemaError(
+            f"The fields file {field_path} is missing the keys {missing_keys}."
+        )
+
+    for c, col_params in field_params["columns"].items():
+        missing_keys = [k for k in REQUIRED_COLUMN_KEYS if k not in col_params]
+        if len(missing_keys) > 0:
+            raise FieldSchemaError(
+                f"Column {c} in the fields file {field_path} is missing the keys {missing_keys}."
+            )
+        if col_params["data_type"] not in DATA_TYPES:
+            raise FieldSchemaError(
+                f"Column {c} in the fields file {field_path} has the data_type {col_params['data_type']}, which is not one of {DATA_TYPES}."
+            )
+
+
+def compile_column_spec(name: str, col_params: Mapping) -> ColumnSpec:
+    """Compiles the parameters of a column into a ColumnSpec, resolving its conversion function."""
+
+    conversion_function = None
+    conversion_error = None
+    try:
+        conversion_function = conversions.get_conversion_function(
+            col_params["input_units"], col_params["output_units"]
+        )
+    except ValueError as e:
+        # the column can only be used if its units can be converted, which is checked when it is used
+        conversion_error = str(e)
+
+    return ColumnSpec(
+        name=name,
+        input_column_name=col_params["input_column_name"],
+        data_type=col_params["data_type"],
+        input_units=col_params["input_units"],
+        output_units=col_params["output_units"],
+        output_num_decimals=col_params["output_num_decimals"],
+        filt_min_val=col_params.get("filt_min_val"),
+        filt_max_val=col_params.get("filt_max_val"),
+        conversion_function=conversion_function,
+        conversion_error=conversion_error,
+        params=col_params,
+    )
+
+
+def compile_catalogue_schema(
+    field_params: Mapping, field_path: Union[str, Path] = ""
+) -> CatalogueSchema:
+    """Validates the parameters of a fields file and compiles them into a CatalogueSchema.
+
+    Parameters
+    ----------
+    field_params : Mapping
+        The dictionary of parameters of the fields file.
+    field_path : Union[str, Path], optional
+        The path to the fields file, for the error messages, by default ""
+
+    Returns
+    -------
+    CatalogueSchema
+        The compiled fields file.
+    """
+
+    validate_field_params(field_params, field_path)
+
+    return CatalogueSchema(
+        file_name=field_params["file_name"],
+        file_format=field_params["file_format"],
+        column_specs={
+            c: compile_column_spec(c, col_params)
+            for c, col_params in field_params["columns"].items()
+        },
+        params=field_params,
+    )
+
+
+def get_catalogue_schema(field_params: Mapping) -> CatalogueSchema:
+    """Returns the compiled schema of the field parameters of a catalogue. The field parameters loaded by
+    load_field_schema are already compiled, and any other dictionary of field parameters is compiled.
+    """
+
+    if isinstance(field_params, CatalogueSchema):
+        return field_params
+
+    return compile_catalogue_schema(field_params)
+
+
+def get_schema_cache_dir() -> Optional[Path]:
+    """Returns the directory to cache the compiled fields files in, which is the SCHEMA_CACHE_DIR_ENV environment
+    variable if it is set (or None if it is empty, which turns the cache off), or 'jhive_previz/schema' in the
+    user's cache directory.
+    """
+
+    cache_dir = os.environ.get(SCHEMA_CACHE_DIR_ENV)
+    if cache_dir is not None:
+        return Path(cache_dir) if cache_dir != "" else None
+
+    base_cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+
+    return Path(base_cache_dir) / "jhive_previz" / "schema"
+
+
+def get_schema_cache_filepath(cache_dir: Path, file_bytes: bytes) -> Path:
+    """Returns the path to the cache file of a fields file, named by the hash of its contents."""
+
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+
+    return Path(cache_dir) / f"{file_hash}-v{SCHEMA_CACHE_VERSION}{SCHEMA_CACHE_SUFFIX}"
+
+
+def load_catalogue_schema(
+    field_path: Union[str, Path], cache_dir: Optional[Path] = None
+) -> CatalogueSchema:
+    """Loads a fields file as a CatalogueSchema. If a cache directory is given, the compiled schema is read from
+    the cache file with the hash of the fields file if there is one, so the yaml is not parsed again, otherwise the
+    fields file is parsed, validated and compiled, and written to the cache.
+
+    Parameters
+    ----------
+    field_path : Union[str, Path]
+        The full path to the fields yaml file.
+    cache_dir : Optional[Path], optional
+        The path to the directory to cache the compiled schema in, by default None, which does not cache it.
+
+    Returns
+    -------
+    CatalogueSchema
+        The compiled fields file.
+    """
+
+    with open(field_path, "rb") as f:
+        file_bytes = f.read()
+
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = get_schema_cache_filepath(cache_dir, file_bytes)
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # i.e. a partly written file, or a conversion function that no longer exists
+            print(f"Could not read the cached schema at {cache_path} due to {e}.")
+
+    # this uses unsafe load, and so should only be done on fields files in this code package
+    field_params = yaml.unsafe_load(file_bytes.decode("utf-8"))
+    cat_schema = compile_catalogue_schema(field_params, field_path)
+
+    if cache_path is not None:
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first so other processes never read a partial file
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(cat_schema, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"Could not cache the schema of {field_path} due to {e}.")
+
+    return cat_schema
+
+
+def load_field_schema(
+    field_paths: List[Union[str, Path]], cache_dir: Optional[Path] = None
+) -> Dict[str, CatalogueSchema]:
+    """Loads each fields file as a CatalogueSchema (see load_catalogue_schema).
+
+    Parameters
+    ----------
+    field_paths : List[Union[str, Path]]
+        The full paths to the fields yaml files.
+    cache_dir : Optional[Path], optional
+        The path to the directory to cache the compiled schemas in, by default None, which does not cache them.
+
+    Returns
+    -------
+    Dict[str, CatalogueSchema]
+        The compiled fields files, with the file name key of each fields file (i.e. 'cat_filename') as the key.
+    """
+
+    field_schema = {}
+    for field_path in field_paths:
+        cat_schema = load_catalogue_schema(field_path, cache_dir)
+        field_schema[cat_schema.file_name] = cat_schema
+
+    return field_schema
@@ -0,0 +1,417 @@
+## Script to summarise each numeric column of a catalogue in a compact sketch, which can be merged across chunks and fields
+## (i.e. for the global percentiles of every field, to set consistent slider ranges and colour scales)
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from . import stats
+from . import utils
+
+# the compression of the sketches, by default: a sketch has at most about half this many centroids, and the
+# sketch of a column with at most this many values keeps every value
+DEFAULT_COMPRESSION = 500
+
+
+def get_sketch_filepath(output_path: Path, suffix: str) -> Path:
+    """Gets the full path to the column sketches file of a catalogue, i.e. 'column_sketches_core.json'."""
+    return output_path / f"column_sketches_{suffix}.json"
+
+
+def get_global_percentiles_filepath(input_path: Path, suffix: str) -> Path:
+    """Gets the full path to the file of the percentiles of every field, i.e. 'global_percentiles_core.json'."""
+    return input_path / f"global_percentiles_{suffix}.json"
+
+
+def get_scale(quantiles: np.ndarray, compression: float) -> np.ndarray:
+    """Returns the t-digest scale function of the quantiles (from 0 to 1), which changes by one across each centroid
+    of a sketch. It is steepest at the ends, so the centroids are smallest (and the percentiles most accurate) in the tails.
+    """
+    return compression / (2 * np.pi) * np.arcsin(2 * quantiles - 1)
+
+
+def compress_centroids(
+    means: np.ndarray, weights: np.ndarray, compression: float = DEFAULT_COMPRESSION
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Merges the neighbouring centroids (sorted by mean) of a sketch whose quantiles are in the same unit of the scale
+    function (see get_scale), keeping the mean and total weight of the values of each. Centroids are only merged if
+    there are more than compression of them, so small sketches keep every value.
+
+    Parameters
+    ----------
+    means : np.ndarray
+        The mean value of each centroid, in increasing order.
+    weights : np.ndarray
+        The number of values of each centroid.
+    compression : float, optional
+        The compression of the sketch, by default DEFAULT_COMPRESSION
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The means and weights of the merged centroids.
+    """
+
+    if len(means) <= compression:
+        return means, weights
+
+    # the quantile of the middle of each centroid
+    cumulative_weights = np.cumsum(weights)
+    quantiles = (cumulative_weights - weights / 2) / cumulative_weights[-1]
+    groups = np.floor(get_scale(quantiles, compression)).astype(np.int64)
+    # the groups increase with the means, so the centroids of each group are next to each other
+    _, group_index = np.unique(groups, return_inverse=True)
+
+    new_weights = np.bincount(group_index, weights=weights)
+    new_means = np.bincount(group_index, weights=means * weights) / new_weights
+
+    return new_means, new_weights.astype(np.int64)
+
+
+def make_column_sketch(
+    values: np.ndarray, compression: float = DEFAULT_COMPRESSION
+) -> Dict:
+    """Makes the sketch of the values of a column: a t-digest, which keeps the sorted values in centroids of a mean
+    and a number of values, with the fewest values in the centroids at the ends. Any percentile of the values can be
+    found from it with an error in rank of about 1 / compression (see get_sketch_percentiles), whatever the range and
+    offset of the values, and sketches are merged by merging their centroids (see merge_column_sketches). Missing and
+    infinite values are not counted.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The values of the column.
+    compression : float, optional
+        The compression of the sketch, by default DEFAULT_COMPRESSION
+
+    Returns
+    -------
+    Dict
+        The sketch, with the number of values, the min and max value (None if there are no values), and the 'means'
+        and 'weights' of the centroids, in increasing order of mean.
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    values = np.sort(values[np.isfinite(values)])
+    means, weights = compress_centroids(
+        values, np.ones(len(values), dtype=np.int64), compression
+    )
+
+    return {
+        "num_values": len(values),
+        "min_val": float(values[0]) if len(values) > 0 else None,
+        "max_val": float(values[-1]) if len(values) > 0 else None,
+        "means": means,
+        "weights": weights,
+    }
+
+
+def get_column_sketches(
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    compression: float = DEFAULT_COMPRESSION,
+) -> Dict[str, Dict]:
+    """Makes the sketch of each of the given columns of a catalogue (see make_column_sketch).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The catalogue.
+    columns : Optional[List[str]], optional
+        The columns to make sketches of, by default None, which uses every numeric column (see stats.get_numeric_columns).
+    compression : float, optional
+        The compression of the sketches, by default DEFAULT_COMPRESSION
+
+    Returns
+    -------
+    Dict[str, Dict]
+        The sketch of each column, with the column names as keys.
+    """
+
+    if columns is None:
+        columns = stats.get_numeric_columns(df)
+
+    return {
+        c: make_column_sketch(
+            df[c].to_numpy(dtype=np.float64, na_value=np.nan), compression
+        )
+        for c in columns
+    }
+
+
+def merge_column_sketches(
+    sketches: List[Dict], compression: float = DEFAULT_COMPRESSION
+) -> Dict:
+    """Merges the sketches of a column from several catalogues (or chunks of a catalogue) into one sketch of all of
+    their values, by sorting their centroids together and compressing them again (see compress_centroids).
+
+    Parameters
+    ----------
+    sketches : List[Dict]
+        The sketches of the column (see make_column_sketch).
+    compression : float, optional
+        The compression of the merged sketch, by default DEFAULT_COMPRESSION
+
+    Returns
+    -------
+    Dict
+        The merged sketch.
+    """
+
+    min_vals = [s["min_val"] for s in sketches if s["min_val"] is not None]
+    max_vals = [s["max_val"] for s in sketches if s["max_val"] is not None]
+
+    means = np.concatenate([np.asarray(s["means"], dtype=np.float64) for s in sketches])
+    weights = np.concatenate(
+        [np.asarray(s["weights"], dtype=np.int64) for s in sketches]
+    )
+    sort_index = np.argsort(means, kind="stable")
+    means, weights = compress_centroids(
+        means[sort_index], weights[sort_index], compression
+    )
+
+    return {
+        "num_values": sum(s["num_values"] for s in sketches),
+        "min_val": min(min_vals) if len(min_vals) > 0 else None,
+        "max_val": max(max_vals) if len(max_vals) > 0 else None,
+        "means": means,
+        "weights": weights,
+    }
+
+
+def get_sketch_percentiles(
+    sketch: Dict,
+    percentiles: Iterable[float] = stats.DEFAULT_PERCENTILES,
+) -> Dict[str, Optional[float]]:
+    """Finds the percentiles of the values of a sketch. Each centroid is placed at the middle of the ranks of its
+    values, and each percentile is interpolated between the centroids at its rank (and the min and max value at the
+    ends), so the percentiles of a sketch that keeps every value are the same as np.percentile.
+
+    Parameters
+    ----------
+    sketch : Dict
+        The sketch of a column (see make_column_sketch).
+    percentiles : Iterable[float], optional
+        The percentiles (from 0 to 100) to find, by default stats.DEFAULT_PERCENTILES
+
+    Returns
+    -------
+    Dict[str, Optional[float]]
+        The value of each percentile, with the names of the percentiles as keys (see stats.get_percentile_name).
+        The values are None if the sketch has no values.
+    """
+
+    percentiles = list(percentiles)
+    names = [stats.get_percentile_name(p) for p in percentiles]
+    if sketch["num_values"] == 0:
+        return {name: None for name in names}
+
+    means = np.asarray(sketch["means"], dtype=np.float64)
+    weights = np.asarray(sketch["weights"], dtype=np.int64)
+    last_rank = sketch["num_values"] - 1
+
+    # the rank of the middle of each centroid, from 0 to last_rank, with the min and max value at the ends
+    ranks = np.cumsum(weights) - (weights + 1) / 2
+    ranks = np.concatenate([[0.0], ranks, [last_rank]])
+    means = np.concatenate([[sketch["min_val"]], means, [sketch["max_val"]]])
+
+    values = np.interp(np.array(percentiles) / 100 * last_rank, ranks, means)
+    values = np.clip(values, sketch["min_val"], sketch["max_val"])
+
+    return {name: float(v) for name, v in zip(names, values)}
+
+
+def get_sketch_percentile_stats(
+    column_sketches: Dict[str, Dict],
+    percentiles: Iterable[float] = stats.DEFAULT_PERCENTILES,
+) -> pd.DataFrame:
+    """Finds the percentiles of every column from its sketch (see get_sketch_percentiles), as rows of column stats,
+    i.e. to add to the stats of a catalogue processed in chunks (see stats.merge_column_stats).
+
+    Parameters
+    ----------
+    column_sketches : Dict[str, Dict]
+        The sketch of each column.
+    percentiles : Iterable[float], optional
+        The percentiles (from 0 to 100) to find, by default stats.DEFAULT_PERCENTILES
+
+    Returns
+    -------
+    pd.DataFrame
+        The percentiles, with a column for each sketch and a row for each percentile (see stats.get_percentile_name).
+        The percentiles of a column with no values are NaN.
+    """
+
+    percentiles = list(percentiles)
+
+    return pd.DataFrame(
+        {
+            c: get_sketch_percentiles(sketch, percentiles)
+            for c, sketch in column_sketches.items()
+        },
+        index=[stats.get_percentile_name(p) for p in percentiles],
+        dtype=np.float64,
+    )
+
+
+def write_column_sketches(
+    column_sketches: Dict[str, Dict],
+    output_file_path: Path,
+    compression: float = DEFAULT_COMPRESSION,
+):
+    """Writes out the sketches of the columns of a catalogue to a json file, with the compression they were made with.
+
+    Parameters
+    ----------
+    column_sketches : Dict[str, Dict]
+        The sketch of each column (see get_column_sketches).
+    output_file_path : Path
+        The full path to the file to write to (see get_sketch_filepath).
+    compression : float, optional
+        The compression the sketches were made with, by default DEFAULT_COMPRESSION
+    """
+
+    def to_json(sketch: Dict) -> Dict:
+        sketch = dict(sketch)
+        for key in ["means", "weights"]:
+            sketch[key] = np.asarray(sketch[key]).tolist()
+        return sketch
+
+    sketch_file = {
+        "compression": compression,
+        "columns": {c: to_json(sketch) for c, sketch in column_sketches.items()},
+    }
+    with open(output_file_path, "w") as f:
+        json.dump(sketch_file, f)
+
+
+def read_column_sketches(sketch_file_path: Path) -> Tuple[Dict[str, Dict], float]:
+    """Reads in the sketches of the columns of a catalogue (see write_column_sketches).
+
+    Parameters
+    ----------
+    sketch_file_path : Path
+        The full path to the column sketches file.
+
+    Returns
+    -------
+    Dict[str, Dict]
+        The sketch of each column.
+    float
+        The compression the sketches were made with.
+    """
+
+    with open(sketch_file_path) as f:
+        sketch_file = json.load(f)
+
+    column_sketches = sketch_file["columns"]
+    for sketch in column_sketches.values():
+        sketch["means"] = np.array(sketch["means"], dtype=np.float64)
+        sketch["weights"] = np.array(sketch["weights"], dtype=np.int64)
+
+    return column_sketches, sketch_file["compression"]
+
+
+class ColumnSketchWriter:
+    """Makes the sketches of the columns of a catalogue that is written in chunks of rows, by merging the sketches
+    of each chunk, and writes them out when it is closed. Use as a context manager, or call close once all of the
+    chunks are written.
+
+    Parameters
+    ----------
+    output_file_path : Path
+        The full path to the file to write the sketches to (see get_sketch_filepath).
+    columns : Optional[List[str]], optional
+        The columns to make sketches of, by default None, which uses every numeric column of the first chunk.
+    compression : float, optional
+        The compression of the sketches, by default DEFAULT_COMPRESSION
+    """
+
+    def __init__(
+        self,
+        output_file_path: Path,
+        columns: Optional[List[str]] = None,
+        compression: float = DEFAULT_COMPRESSION,
+    ):
+        self.output_file_path = output_file_path
+        self.columns = columns
+        self.compression = compression
+        self.column_sketches: Dict[str, Dict] = {}
+
+    def write(self, df_chunk: pd.DataFrame):
+        """Adds the values of a chunk of rows to the sketches."""
+
+        if self.columns is None:
+            self.columns = stats.get_numeric_columns(df_chunk)
+
+        chunk_sketches = get_column_sketches(
+            df_chunk,
+            [c for c in self.columns if c in df_chunk.columns],
+            self.compression,
+        )
+        for c, sketch in chunk_sketches.items():
+            if c in self.column_sketches:
+                sketch = merge_column_sketches(
+                    [self.column_sketches[c], sketch], self.compression
+                )
+            self.column_sketches[c] = sketch
+
+    def close(self):
+        """Writes out the sketches."""
+        write_column_sketches(
+            self.column_sketches, self.output_file_path, self.compression
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def get_sketch_filepaths(input_path: Path, suffix: str = "core") -> List[Path]:
+    """Gets the paths to the column sketches file of the catalogue with the given suffix in each field folder of the input path."""
+
+    return [
+        get_sketch_filepath(field_path, suffix)
+        for field_path in sorted(p for p in input_path.iterdir() if p.is_dir())
+        if get_sketch_filepath(field_path, suffix).is_file()
+    ]
+
+
+def merge_field_sketches(
+    sketch_file_paths: List[Path],
+) -> Tuple[Dict[str, Dict], float]:
+    """Reads in the column sketches files of several fields and merges the sketches of each column, so the
+    time taken only depends on the number of fields and the size of the sketches, not the number of objects.
+
+    Parameters
+    ----------
+    sketch_file_paths : List[Path]
+        The full paths to the column sketches files.
+
+    Returns
+    -------
+    Dict[str, Dict]
+        The merged sketch of each column that is in any of the fields.
+    float
+        The compression of the merged sketches, the largest of the compressions of the fields.
+    """
+
+    field_sketches: Dict[str, List[Dict]] = {}
+    compression = DEFAULT_COMPRESSION
+
+    for i, sketch_file_path in enumerate(sketch_file_paths):
+        column_sketches, file_compression = read_column_sketches(sketch_file_path)
+        compression = file_compression if i == 0 else max(compression, file_compression)
+
+        for c, sketch in column_sketches.items():
+            field_sketches.setdefault(c, []).append(sketch)
+
+    merged_sketches = {
+        c: merge_column_sketches(sketches, compression)
+        for c, sketches in field_sketches.items()
+    }
+
+    return merged_sketches, compression
@@ -0,0 +1,208 @@
+## Script to summarise the numeric columns of a catalogue (i.e. for the metadata files) in a single pass over a 2D block
+from typing import Dict, Iterable, List, Mapping, Optional
+import numpy as np
+import pandas as pd
+
+# the percentiles of each column to add to the metadata files, by default
+DEFAULT_PERCENTILES = [1.0, 5.0, 25.0, 50.0, 75.0, 95.0, 99.0]
+# the stats that can be merged across the chunks of a catalogue (see merge_column_stats)
+MERGEABLE_STATS = ["count", "nan_count", "sum", "min", "max"]
+
+
+def get_percentile_name(percentile: float) -> str:
+    """Returns the name of the row of a percentile in the column stats, i.e. 'p50' or 'p99.5'."""
+    return f"p{percentile:g}"
+
+
+def get_numeric_columns(df: pd.DataFrame) -> List[str]:
+    """Returns the columns of the dataframe with int, float or bool values (i.e. not strings)."""
+
+    return [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+
+
+def get_numeric_block(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Copies the given columns of the dataframe into a 2D float64 block with a column for each, in Fortran order
+    so each column is contiguous. Bools are 0 or 1, and missing values (including those of nullable int columns) are NaN.
+    """
+
+    block = np.empty((len(df), len(columns)), dtype=np.float64, order="F")
+    for i, c in enumerate(columns):
+        block[:, i] = df[c].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    return block
+
+
+def get_block_stats(
+    block: np.ndarray,
+    columns: List[str],
+    percentiles: Optional[Iterable[float]] = DEFAULT_PERCENTILES,
+) -> pd.DataFrame:
+    """Computes the stats of every column of a 2D block at once, ignoring NaNs. If there are percentiles to
+    compute, each column of the block is sorted in place (with the NaNs sorted to the end), so its min, max and
+    percentiles are read from the sorted values. The count, sum and mean are summed along the block.
+
+    Parameters
+    ----------
+    block : np.ndarray
+        The 2D float64 block of values, with a column for each of columns (see get_numeric_block). It is
+        sorted in place if there are percentiles to compute.
+    columns : List[str]
+        The names of the columns of the block.
+    percentiles : Optional[Iterable[float]], optional
+        The percentiles (from 0 to 100) to compute, with linear interpolation as in np.nanpercentile, by default
+        DEFAULT_PERCENTILES. None computes no percentiles.
+
+    Returns
+    -------
+    pd.DataFrame
+        The stats, with a column for each of columns and the rows MERGEABLE_STATS, 'mean', and a row for each
+        percentile (see get_percentile_name). The min, max, mean and percentiles of a column with no values are NaN.
+    """
+
+    percentiles = list(percentiles or [])
+    if len(percentiles) > 0:
+        block.sort(axis=0)
+    is_valid = ~np.isnan(block)
+    count = is_valid.sum(axis=0)
+    total = block.sum(axis=0, where=is_valid)
+
+    # the stats of the columns with no values are set to NaN
+    has_values = count > 0
+    last_row = np.maximum(count - 1, 0)
+    column_index = np.arange(block.shape[1])
+    empty_row = np.full(block.shape[1], np.nan)
+
+    stats = {
+        "count": count,
+        "nan_count": len(block) - count,
+        "sum": total,
+        "min": empty_row.copy(),
+        "max": empty_row.copy(),
+        "mean": np.divide(total, count, out=empty_row.copy(), where=has_values),
+    }
+    if len(block) > 0 and len(percentiles) > 0:
+        # the min and max are the first and last values of the sorted columns
+        stats["min"] = np.where(has_values, block[0], np.nan)
+        stats["max"] = np.where(has_values, block[last_row, column_index], np.nan)
+    elif len(block) > 0:
+        # the block is not sorted if there are no percentiles, as this is faster
+        stats["min"] = block.min(axis=0, where=is_valid, initial=np.inf)
+        stats["max"] = block.max(axis=0, where=is_valid, initial=-np.inf)
+        stats["min"][~has_values] = np.nan
+        stats["max"][~has_values] = np.nan
+
+    for percentile in percentiles:
+        name = get_percentile_name(percentile)
+        if len(block) == 0:
+            stats[name] = empty_row.copy()
+            continue
+        # the position of the percentile between the sorted values of each column
+        position = percentile / 100 * last_row
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last_row)
+        lower_vals = block[lower, column_index]
+        upper_vals = block[upper, column_index]
+        vals = lower_vals + (position - lower) * (upper_vals - lower_vals)
+        stats[name] = np.where(has_values, vals, np.nan)
+
+    return pd.DataFrame(
+        np.vstack(list(stats.values())), index=list(stats), columns=columns
+    )
+
+
+def get_column_stats(
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+    percentiles: Optional[Iterable[float]] = DEFAULT_PERCENTILES,
+) -> pd.DataFrame:
+    """Computes the stats of the numeric columns of a catalogue (see get_block_stats).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The catalogue.
+    columns : Optional[List[str]], optional
+        The columns to compute the stats of, by default None, which uses every numeric column (see get_numeric_columns).
+    percentiles : Optional[Iterable[float]], optional
+        The percentiles to compute, by default DEFAULT_PERCENTILES
+
+    Returns
+    -------
+    pd.DataFrame
+        The stats, with a column for each of columns and a row for each stat.
+    """
+
+    if columns is None:
+        columns = get_numeric_columns(df)
+
+    return get_block_stats(get_numeric_block(df, columns), columns, percentiles)
+
+
+def get_masked_column_stats(
+    df: pd.DataFrame,
+    masks: Mapping[str, np.ndarray],
+    columns: Optional[List[str]] = None,
+    percentiles: Optional[Iterable[float]] = DEFAULT_PERCENTILES,
+) -> Dict[str, pd.DataFrame]:
+    """Computes the stats of the numeric columns of several selections of the rows of a catalogue, i.e. the raw
+    and core objects from the ingest mask. The columns are copied into a block once, and the stats of each
+    selection are computed from the rows of the block in its mask.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The catalogue.
+    masks : Mapping[str, np.ndarray]
+        The boolean mask of the rows of each selection, i.e. {'raw': ~ingest_mask, 'core': ingest_mask}.
+    columns : Optional[List[str]], optional
+        The columns to compute the stats of, by default None, which uses every numeric column (see get_numeric_columns).
+    percentiles : Optional[Iterable[float]], optional
+        The percentiles to compute, by default DEFAULT_PERCENTILES
+
+    Returns
+    -------
+    Dict[str, pd.DataFrame]
+        The stats of each selection, with the same keys as masks.
+    """
+
+    if columns is None:
+        columns = get_numeric_columns(df)
+    block = get_numeric_block(df, columns)
+
+    return {
+        name: get_block_stats(block[mask], columns, percentiles)
+        for name, mask in masks.items()
+    }
+
+
+def merge_column_stats(stats_list: List[pd.DataFrame]) -> pd.DataFrame:
+    """Merges the stats of the chunks of a catalogue into the stats of the whole catalogue. Only
+    MERGEABLE_STATS (and the mean, from the merged count and sum) can be merged, so any percentiles are dropped.
+
+    Parameters
+    ----------
+    stats_list : List[pd.DataFrame]
+        The stats of each chunk, with the same columns (see get_block_stats).
+
+    Returns
+    -------
+    pd.DataFrame
+        The merged stats, with the rows MERGEABLE_STATS and 'mean'.
+    """
+
+    stats = {
+        name: pd.concat([df_stats.loc[name] for df_stats in stats_list], axis=1)
+        for name in MERGEABLE_STATS
+    }
+
+    merged = {
+        "count": stats["count"].sum(axis=1),
+        "nan_count": stats["nan_count"].sum(axis=1),
+        "sum": stats["sum"].sum(axis=1),
+        # ignoring the NaN min and max of the chunks with no values in a column
+        "min": stats["min"].min(axis=1),
+        "max": stats["max"].max(axis=1),
+    }
+    merged["mean"] = merged["sum"] / merged["count"].where(merged["count"] > 0)
+
+    return pd.DataFrame(merged).T
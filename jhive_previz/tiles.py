@@ -0,0 +1,399 @@
+## Script to partition catalogues into HEALPix sky tiles, so that only the tiles in a viewport need to be loaded
+import json
+import tempfile
+from pathlib import Path
+from typing import Mapping, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from . import utils
+
+# the default HEALPix order of the tiles, each tile is about 3.4 arcmin across
+DEFAULT_TILE_ORDER = 10
+# the highest HEALPix order, as the pixel numbers of higher orders do not fit in an int64
+MAX_TILE_ORDER = 29
+# the number of rows that are kept in memory for the tiles before they are written to temporary files
+DEFAULT_MAX_BUFFERED_ROWS = 1_000_000
+# the pixel number of objects that do not have a valid position
+NO_TILE_PIXEL = -1
+
+
+def spread_bits(values: np.ndarray) -> np.ndarray:
+    """Spreads the bits of each (up to 32 bit) value so that bit i moves to bit 2i, i.e. to interleave two values."""
+
+    values = values.astype(np.int64)
+    values = (values | (values << 16)) & 0x0000FFFF0000FFFF
+    values = (values | (values << 8)) & 0x00FF00FF00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F0F0F0F0F
+    values = (values | (values << 2)) & 0x3333333333333333
+    values = (values | (values << 1)) & 0x5555555555555555
+
+    return values
+
+
+def get_healpix_pixels(ra, dec, order: int) -> np.ndarray:
+    """Gets the HEALPix pixel number of each position in the nested scheme, for the given order
+    (nside = 2**order). The pixels of all of the positions are found at once with NumPy. Positions
+    that are not finite are given the pixel number NO_TILE_PIXEL.
+
+    Parameters
+    ----------
+    ra : array-like
+        The right ascensions of the positions in degrees.
+    dec : array-like
+        The declinations of the positions in degrees.
+    order : int
+        The HEALPix order of the pixels, from 0 to 29.
+
+    Returns
+    -------
+    np.ndarray
+        The pixel number of each position.
+
+    Raises
+    ------
+    ValueError
+        Raises a ValueError if the order is out of range (see validate_tile_order).
+    """
+
+    validate_tile_order(order)
+    nside = 2**order
+    ra = np.asarray(ra, dtype=np.float64)
+    dec = np.asarray(dec, dtype=np.float64)
+    valid = np.isfinite(ra) & np.isfinite(dec)
+    ra = np.where(valid, ra, 0.0)
+    dec = np.where(valid, dec, 0.0)
+
+    # z from the colatitude, as healpy does, so positions on pixel edges are given the same pixels
+    z = np.cos(np.radians(90.0 - dec))
+    za = np.abs(z)
+    # the longitude in units of 90 degrees, in [0, 4)
+    tt = np.mod(ra, 360.0) / 90.0
+    tt = np.where(tt >= 4.0, 0.0, tt)
+
+    # equatorial region
+    temp1 = nside * (0.5 + tt)
+    temp2 = nside * z * 0.75
+    jp = (temp1 - temp2).astype(np.int64)
+    jm = (temp1 + temp2).astype(np.int64)
+    ifp = jp // nside
+    ifm = jm // nside
+    face_eq = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm + 8))
+    ix_eq = jm & (nside - 1)
+    iy_eq = nside - (jp & (nside - 1)) - 1
+
+    # polar caps
+    ntt = np.minimum(tt.astype(np.int64), 3)
+    tp = tt - ntt
+    tmp = nside * np.sqrt(3.0 * (1.0 - za))
+    jp_pol = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+    jm_pol = np.minimum(((1.0 - tp) * tmp).astype(np.int64), nside - 1)
+    north = z >= 0
+    face_pol = np.where(north, ntt, ntt + 8)
+    ix_pol = np.where(north, nside - jm_pol - 1, jp_pol)
+    iy_pol = np.where(north, nside - jp_pol - 1, jm_pol)
+
+    equatorial = za <= 2.0 / 3.0
+    face = np.where(equatorial, face_eq, face_pol)
+    ix = np.where(equatorial, ix_eq, ix_pol)
+    iy = np.where(equatorial, iy_eq, iy_pol)
+
+    pixels = face * nside * nside + (spread_bits(ix) | (spread_bits(iy) << 1))
+
+    return np.where(valid, pixels, NO_TILE_PIXEL)
+
+
+def validate_tile_order(order: int):
+    """Validate that the HEALPix order of the tiles is from 0 to MAX_TILE_ORDER.
+
+    Parameters
+    ----------
+    order : int
+        The HEALPix order of the tiles.
+
+    Raises
+    ------
+    ValueError
+        Raises a ValueError if the order is out of range.
+    """
+
+    if not 0 <= order <= MAX_TILE_ORDER:
+        raise ValueError(
+            f"The HEALPix order of the tiles must be from 0 to {MAX_TILE_ORDER}, not {order}."
+        )
+
+
+def get_tile_paths(output_path: Path, suffix: str) -> Dict[str, Path]:
+    """Returns the path to the directory of the tile files and the path to the tile index of a catalogue.
+
+    Parameters
+    ----------
+    output_path : Path
+        The path to the directory where the catalogue is saved.
+    suffix : str
+        The suffix string of the catalogue, i.e. 'raw'.
+
+    Returns
+    -------
+    Dict[str, Path]
+        The paths, with the keys 'directory' and 'index'.
+    """
+
+    base_filename = "catalog_" + suffix + "_tiles"
+
+    return {
+        "directory": output_path / base_filename,
+        "index": output_path / (base_filename + ".json"),
+    }
+
+
+def get_tile_filename(suffix: str, pixel: int, output_format: str) -> str:
+    """Returns the file name of the tile with the given pixel number."""
+
+    tile_name = "none" if pixel == NO_TILE_PIXEL else str(pixel)
+
+    return "catalog_" + suffix + "_" + tile_name + utils.OUTPUT_FORMATS[output_format]
+
+
+def get_ra_limits(ra: np.ndarray) -> np.ndarray:
+    """Returns the min and max of the ra values (in degrees) from 0 to 360, and the min and max of the ra values
+    shifted to -180 to 180, to find the ra range of the values whether or not they straddle ra = 0 (see get_ra_range).
+    """
+
+    ra = np.mod(ra, 360.0)
+    shifted_ra = np.where(ra > 180.0, ra - 360.0, ra)
+
+    return np.array([ra.min(), ra.max(), shifted_ra.min(), shifted_ra.max()])
+
+
+def get_ra_range(ra_limits: np.ndarray) -> Tuple[float, float]:
+    """Returns the narrower of the ra ranges of a set of ra values from their limits (see get_ra_limits), from 0 to
+    360 or through ra = 0. The ra range of values that straddle ra = 0 has a min that is greater than the max,
+    i.e. (359.9, 0.1), so a value is in the range if it is at least the min or at most the max.
+
+    Parameters
+    ----------
+    ra_limits : np.ndarray
+        The min and max of the ra values from 0 to 360, and the min and max of the ra values shifted to -180 to 180.
+
+    Returns
+    -------
+    Tuple[float, float]
+        The min and max ra, from 0 to 360.
+    """
+
+    ra_min, ra_max, shifted_ra_min, shifted_ra_max = ra_limits
+
+    if shifted_ra_max - shifted_ra_min < ra_max - ra_min:
+        return float(np.mod(shifted_ra_min, 360.0)), float(shifted_ra_max)
+
+    return float(ra_min), float(ra_max)
+
+
+class TiledDataWriter:
+    """Writes out a catalogue partitioned into HEALPix tiles (nested scheme), with one file for every tile that
+    has objects in it, and a json tile index. Each tile file has the same columns as the whole catalogue, so the
+    catalogue can be written in chunks of rows. The rows of each tile are kept in memory, and once there are more
+    than max_buffered_rows they are written to temporary files next to the tiles, so only one file is open at a time
+    however many tiles there are. The tile files are written with utils.ChunkedDataWriter when the writer is closed.
+    The tile index lists the file, number of objects and ra and dec range of the objects of each tile. The ra range
+    of a tile that straddles ra = 0 wraps around, so its ra_min is greater than its ra_max (i.e. 359.9 to 0.1, see
+    get_ra_range). Objects without a valid position are put in a tile with a null pixel number.
+
+    Parameters
+    ----------
+    output_path : Path
+        The path to the directory where the catalogue is saved.
+    suffix : str
+        The suffix string of the catalogue, i.e. 'raw'.
+    output_format : str
+        The format of the tile files, one of the keys of utils.OUTPUT_FORMATS.
+    order : int, optional
+        The HEALPix order of the tiles, from 0 to MAX_TILE_ORDER, by default DEFAULT_TILE_ORDER
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals to write for each float column in csv files, by default None
+    max_buffered_rows : int, optional
+        The number of rows to keep in memory before writing them to temporary files, by default DEFAULT_MAX_BUFFERED_ROWS
+
+    Raises
+    ------
+    ValueError
+        Raises a ValueError if the order is out of range (see validate_tile_order).
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        suffix: str,
+        output_format: str,
+        order: int = DEFAULT_TILE_ORDER,
+        decimals: Optional[Mapping[str, int]] = None,
+        max_buffered_rows: int = DEFAULT_MAX_BUFFERED_ROWS,
+    ):
+        validate_tile_order(order)
+
+        self.paths = get_tile_paths(output_path, suffix)
+        self.suffix = suffix
+        self.output_format = output_format
+        self.order = order
+        self.decimals = decimals
+        self.max_buffered_rows = max_buffered_rows
+        # the rows of each tile that have not been written to a temporary file yet
+        self._buffers: Dict[int, List[pd.DataFrame]] = {}
+        self._num_buffered_rows = 0
+        # the number of temporary files of each tile
+        self._num_parts: Dict[int, int] = {}
+        self._tiles: Dict[int, Dict] = {}
+        # the min and max ra of each tile, from 0 to 360 and shifted to -180 to 180 (see get_ra_range)
+        self._ra_limits: Dict[int, np.ndarray] = {}
+
+        self.paths["directory"].mkdir(parents=True, exist_ok=True)
+        self._tmp_dir = tempfile.TemporaryDirectory(dir=self.paths["directory"])
+
+    def _get_tmp_path(self, pixel: int, part: int) -> Path:
+        return Path(self._tmp_dir.name) / f"{pixel}.{part}.pkl"
+
+    def write(self, df_chunk: pd.DataFrame):
+        """Adds the rows of the next chunk to the buffers of their tiles."""
+
+        if "ra" not in df_chunk.columns or "dec" not in df_chunk.columns:
+            raise ValueError(
+                "The catalogue needs ra and dec columns to be partitioned into tiles."
+            )
+
+        ra = df_chunk["ra"].to_numpy(dtype=np.float64, na_value=np.nan)
+        dec = df_chunk["dec"].to_numpy(dtype=np.float64, na_value=np.nan)
+        pixels = get_healpix_pixels(ra, dec, self.order)
+
+        # sort the rows by tile once, and then split them into the rows of each tile
+        sort_index = np.argsort(pixels, kind="stable")
+        tile_pixels, tile_starts = np.unique(pixels[sort_index], return_index=True)
+        tile_stops = np.append(tile_starts[1:], len(pixels))
+
+        for pixel, start, stop in zip(tile_pixels, tile_starts, tile_stops):
+            rows = sort_index[start:stop]
+            self._buffers.setdefault(int(pixel), []).append(df_chunk.iloc[rows])
+            self._update_tile(int(pixel), ra[rows], dec[rows])
+
+        self._num_buffered_rows += len(df_chunk)
+        if self._num_buffered_rows > self.max_buffered_rows:
+            self._flush()
+
+    def _flush(self):
+        """Writes the buffered rows of each tile to a new temporary file of the tile, one file at a time."""
+
+        for pixel, buffer in self._buffers.items():
+            part = self._num_parts.get(pixel, 0)
+            pd.concat(buffer).to_pickle(self._get_tmp_path(pixel, part))
+            self._num_parts[pixel] = part + 1
+
+        self._buffers = {}
+        self._num_buffered_rows = 0
+
+    def _update_tile(self, pixel: int, ra: np.ndarray, dec: np.ndarray):
+        """Adds the positions of the objects written to the tile to its number of objects and ra and dec range."""
+
+        if pixel not in self._tiles:
+            self._tiles[pixel] = {
+                "pixel": None if pixel == NO_TILE_PIXEL else pixel,
+                "file": self.paths["directory"].name
+                + "/"
+                + get_tile_filename(self.suffix, pixel, self.output_format),
+                "ra_min": None,
+                "ra_max": None,
+                "dec_min": None,
+                "dec_max": None,
+                "num_objects": 0,
+            }
+
+        tile = self._tiles[pixel]
+        tile["num_objects"] += len(ra)
+
+        if pixel == NO_TILE_PIXEL:
+            return
+
+        ra_limits = get_ra_limits(ra)
+        if pixel in self._ra_limits:
+            previous_limits = self._ra_limits[pixel]
+            ra_limits = np.array(
+                [
+                    min(ra_limits[0], previous_limits[0]),
+                    max(ra_limits[1], previous_limits[1]),
+                    min(ra_limits[2], previous_limits[2]),
+                    max(ra_limits[3], previous_limits[3]),
+                ]
+            )
+        self._ra_limits[pixel] = ra_limits
+        tile["ra_min"], tile["ra_max"] = get_ra_range(ra_limits)
+
+        for key, func in [("dec_min", np.min), ("dec_max", np.max)]:
+            values = dec if tile[key] is None else np.append(dec, tile[key])
+            tile[key] = float(func(values))
+
+    def close(self):
+        """Writes each tile file from its temporary files and buffered rows, and writes the tile index."""
+
+        if self._tmp_dir is None:
+            return
+
+        for pixel in sorted(self._tiles.keys()):
+            with utils.ChunkedDataWriter(
+                self.paths["directory"]
+                / get_tile_filename(self.suffix, pixel, self.output_format),
+                self.decimals,
+            ) as writer:
+                for part in range(self._num_parts.get(pixel, 0)):
+                    writer.write(pd.read_pickle(self._get_tmp_path(pixel, part)))
+                for df_rows in self._buffers.get(pixel, []):
+                    writer.write(df_rows)
+
+        self._tmp_dir.cleanup()
+        self._tmp_dir = None
+        self._buffers = {}
+
+        tiles = [self._tiles[pixel] for pixel in sorted(self._tiles.keys())]
+        tile_index = {
+            "scheme": "healpix_nested",
+            "order": self.order,
+            "nside": 2**self.order,
+            "num_objects": sum(tile["num_objects"] for tile in tiles),
+            "tiles": tiles,
+        }
+        with open(self.paths["index"], "w") as f:
+            json.dump(tile_index, f, indent=4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_tiled_data(
+    df_cat: pd.DataFrame,
+    output_path: Path,
+    suffix: str,
+    output_format: str,
+    order: int = DEFAULT_TILE_ORDER,
+    decimals: Optional[Mapping[str, int]] = None,
+):
+    """Writes out the catalogue partitioned into HEALPix tiles, with a tile index (see TiledDataWriter).
+
+    Parameters
+    ----------
+    df_cat : pd.DataFrame
+        The catalogue to write out.
+    output_path : Path
+        The path to the directory where the catalogue is saved.
+    suffix : str
+        The suffix string of the catalogue, i.e. 'raw'.
+    output_format : str
+        The format of the tile files, one of the keys of utils.OUTPUT_FORMATS.
+    order : int, optional
+        The HEALPix order of the tiles, by default DEFAULT_TILE_ORDER
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals to write for each float column in csv files, by default None
+    """
+
+    with TiledDataWriter(output_path, suffix, output_format, order, decimals) as writer:
+        writer.write(df_cat)
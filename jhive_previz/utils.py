@@ -1,9 +1,38 @@
 from pathlib import Path
-from astropy.table import Table
+import importlib.util
+import numpy as np
 import pandas as pd
 import json
 
-from typing_extensions import Mapping, Union
+from typing_extensions import (
+    TYPE_CHECKING,
+    Mapping,
+    Union,
+    List,
+    Optional,
+    Dict,
+    Iterable,
+    Iterator,
+    TextIO,
+)
+
+# astropy is slow to import, so it is only imported by the functions that read and write tables with it
+if TYPE_CHECKING:
+    from astropy.io import fits
+    from astropy.table import Table
+
+# the file suffix for each of the output formats
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# the number of rows formatted and written at a time, and the write buffer size, for csv files
+CSV_CHUNK_ROWS = 100_000
+CSV_BUFFER_BYTES = 8 * 1024**2
+
+# the largest relative rounding error of a float32 (24 bit significand)
+FLOAT32_RELATIVE_ERROR = 2.0**-24
+
+# the wider dtype to use for each compact dtype when a column's values no longer fit it (see widen_column_dtypes)
+WIDER_DTYPES = {"Int32": "Int64", "float32": "float64"}
 
 
 def get_cat_filepath(filename_key: str, config_params: Mapping) -> Path:
@@ -35,22 +64,170 @@ def get_cat_filepath(filename_key: str, config_params: Mapping) -> Path:
     return file_path
 
 
-def read_table(data_file_path: Path, file_format: str) -> pd.DataFrame:
-    """Reads the data fits file into a pandas dataframe via astropy.
+def get_unique_columns(columns: List[str]) -> List[str]:
+    """Returns the given list of column names with any duplicates removed, keeping the original order."""
+    return list(dict.fromkeys(columns))
+
+
+def get_fits_table_hdu(
+    hdul: "fits.HDUList",
+) -> Union["fits.BinTableHDU", "fits.TableHDU"]:
+    """Returns the first table HDU in the given fits HDU list."""
+    from astropy.io import fits
+
+    return next(
+        hdu for hdu in hdul if isinstance(hdu, (fits.BinTableHDU, fits.TableHDU))
+    )
+
+
+class FitsColumnView:
+    """A read-only, dataframe-like view of the columns of a memory-mapped fits binary table.
+    No data is read when the view is created. Each column is only read (and byte-swapped to the
+    native byte order) when it is accessed, and is returned as a pandas Series.
+
+    Parameters
+    ----------
+    data_file_path : Path
+        The full path to the fits file.
+    columns : Optional[List[str]], optional
+        The names of the columns to include in the view, by default None, which includes every column.
+        Columns that do not exist in the file are skipped.
+    """
+
+    def __init__(self, data_file_path: Path, columns: Optional[List[str]] = None):
+        from astropy.io import fits
+
+        with fits.open(data_file_path, memmap=True) as hdul:
+            table_hdu = get_fits_table_hdu(hdul)
+            # the memory map stays open for as long as the data is referenced
+            self._data = table_hdu.data
+            self._null_values = {
+                col.name: col.null for col in table_hdu.columns if col.null is not None
+            }
+            available_columns = table_hdu.columns.names
+
+        if columns is None:
+            self.columns = list(available_columns)
+        else:
+            self.columns = [
+                c for c in get_unique_columns(columns) if c in available_columns
+            ]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, name: str) -> pd.Series:
+        return self.get_column(name)
+
+    def get_column(
+        self, name: str, start: int = 0, stop: Optional[int] = None
+    ) -> pd.Series:
+        """Returns the rows from start to stop of a column, only reading (and byte-swapping) those rows."""
+
+        if name not in self.columns:
+            raise KeyError(name)
+
+        # this is a view of the memory-mapped file unless the column is scaled
+        data = self._data.field(name)[start:stop]
+
+        if not data.dtype.isnative:
+            # swap only this column into the native byte order
+            data = data.astype(data.dtype.newbyteorder("="))
+
+        # mask any null values in integer columns, as astropy does when reading the full table
+        if name in self._null_values and data.dtype.kind in "iu":
+            data = pd.arrays.IntegerArray(data, data == self._null_values[name])
+
+        return pd.Series(data, name=name, copy=False)
+
+    def get_rows(self, start: int, stop: int) -> pd.DataFrame:
+        """Returns the rows from start to stop of every column in the view as a dataframe."""
+
+        stop = min(stop, len(self))
+        df = pd.DataFrame(
+            {name: self.get_column(name, start, stop) for name in self.columns}
+        )
+        df.index = pd.RangeIndex(start, stop)
+
+        return df
+
+
+def read_fits_columns(data_file_path: Path, columns: List[str]) -> "Table":
+    """Reads only the given columns from the first table HDU of a fits file. The file is memory-mapped,
+    so only the bytes of the requested columns are decoded. Columns that do not exist in the file are skipped.
+
+    Parameters
+    ----------
+    data_file_path : Path
+        The full path to the fits file.
+    columns : List[str]
+        The names of the columns to read.
+
+    Returns
+    -------
+    Table
+        An astropy table with only the requested columns.
+    """
+    from astropy.io import fits
+    from astropy.table import Column, MaskedColumn, Table
+
+    with fits.open(data_file_path, memmap=True) as hdul:
+        table_hdu = get_fits_table_hdu(hdul)
+        available_columns = table_hdu.columns.names
+
+        table_columns = []
+        for name in get_unique_columns(columns):
+            if name not in available_columns:
+                continue
+
+            # copy the column out of the memory-mapped file so it can be closed
+            data = table_hdu.data[name].copy()
+            null_value = table_hdu.columns[name].null
+
+            # mask any null values in integer columns, as astropy does when reading the full table
+            if null_value is not None and data.dtype.kind in "iu":
+                table_columns.append(
+                    MaskedColumn(data, name=name, mask=data == null_value)
+                )
+            else:
+                table_columns.append(Column(data, name=name))
+
+    return Table(table_columns, copy=False)
+
+
+def read_table(
+    data_file_path: Path, file_format: str, columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """Reads the data fits file into a pandas dataframe via astropy. If a list of columns is given,
+    only those columns are read from the file (any that do not exist in the file are skipped).
 
     Parameters
     ----------
     data_file_path : Path
         The full path to the data file.
+    file_format : str
+        The astropy format of the file, i.e. 'fits' or 'ascii.csv'.
+    columns : Optional[List[str]], optional
+        The names of the columns to read, by default None, which reads every column.
 
     Returns
     -------
     pd.DataFrame
         A dataframe with the data from the file.
     """
+    from astropy.table import Table
 
     # read in table as astropy table
-    phot_cat = Table.read(data_file_path, format=file_format)
+    if columns is None:
+        phot_cat = Table.read(data_file_path, format=file_format)
+    elif file_format == "fits":
+        phot_cat = read_fits_columns(data_file_path, columns)
+    else:
+        phot_cat = Table.read(
+            data_file_path,
+            format=file_format,
+            include_names=get_unique_columns(columns),
+        )
 
     # now convert to pandas
     cat_df = phot_cat.to_pandas()
@@ -58,19 +235,415 @@ def read_table(data_file_path: Path, file_format: str) -> pd.DataFrame:
     return cat_df
 
 
-def write_pd_to_fits(df: pd.DataFrame, output_path: Path):
+def iter_table_chunks(
+    data_file_path: Path,
+    file_format: str,
+    chunk_size: int,
+    columns: Optional[List[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Reads the data file as a series of dataframes of at most chunk_size rows, so that only one chunk
+    of the file is in memory at a time. Fits files are memory-mapped and only the rows of each chunk are read,
+    and csv files are read in chunks by pandas. Other ascii formats cannot be read in chunks, so they are read
+    in whole with read_table and then split into chunks. The index of each chunk continues on from the last.
 
-    # convert pandas table to fits
+    Parameters
+    ----------
+    data_file_path : Path
+        The full path to the data file.
+    file_format : str
+        The astropy format of the file, i.e. 'fits' or 'ascii.csv'.
+    chunk_size : int
+        The maximum number of rows in each chunk.
+    columns : Optional[List[str]], optional
+        The names of the columns to read, by default None, which reads every column.
+
+    Yields
+    ------
+    Iterator[pd.DataFrame]
+        The chunks of the file. At least one (possibly empty) chunk is returned.
+    """
+
+    if file_format == "fits":
+        view = FitsColumnView(data_file_path, columns)
+        for start in range(0, max(len(view), 1), chunk_size):
+            yield view.get_rows(start, start + chunk_size)
+
+    elif file_format == "ascii.csv":
+        usecols = None if columns is None else (lambda c: c in columns)
+        reader = pd.read_csv(data_file_path, usecols=usecols, chunksize=chunk_size)
+        with reader:
+            first_chunk = True
+            for chunk in reader:
+                first_chunk = False
+                yield chunk
+            if first_chunk:
+                yield read_table(data_file_path, file_format, columns)
+
+    else:
+        df = read_table(data_file_path, file_format, columns)
+        for start in range(0, max(len(df), 1), chunk_size):
+            yield df.iloc[start : start + chunk_size]
+
+
+def write_pd_to_fits(
+    df: pd.DataFrame,
+    output_path: Path,
+    header: Optional[Mapping] = None,
+    overwrite: bool = False,
+):
+    from astropy.table import Table
+
+    # convert pandas table to fits, with any header keywords in the table metadata
     tab = Table.from_pandas(df)
+    if header is not None:
+        tab.meta.update(header)
 
     # write out file to output path
-    tab.write(output_path)
+    tab.write(output_path, overwrite=overwrite)
 
 
-def write_data(
-    df_cat: pd.DataFrame, output_file_path: Path, float_format: str = "%.6f"
+def validate_output_format(output_format: str) -> str:
+    """Validates that the output format is one of the formats in OUTPUT_FORMATS, and that the packages
+    needed to write it are installed. The binary formats (parquet and feather) require pyarrow.
+
+    Parameters
+    ----------
+    output_format : str
+        The name of the output format, i.e. 'csv'.
+
+    Returns
+    -------
+    str
+        The validated output format.
+
+    Raises
+    ------
+    ValueError
+        Raises an error if the output format is not supported.
+    ImportError
+        Raises an error if pyarrow is needed for the format and is not installed.
+    """
+
+    if output_format not in OUTPUT_FORMATS.keys():
+        raise ValueError(
+            f"{output_format} is not a valid output format, please use one of {list(OUTPUT_FORMATS.keys())}."
+        )
+
+    if output_format != "csv" and importlib.util.find_spec("pyarrow") is None:
+        raise ImportError(
+            f"pyarrow is required to write {output_format} files, please install it (i.e. with 'poetry install --extras arrow')."
+        )
+
+    return output_format
+
+
+def get_file_format(file_path: Path) -> str:
+    """Gets the output format of a data file from its suffix.
+
+    Parameters
+    ----------
+    file_path : Path
+        The full path to the data file.
+
+    Returns
+    -------
+    str
+        The output format, one of the keys of OUTPUT_FORMATS.
+
+    Raises
+    ------
+    ValueError
+        Raises an error if the suffix does not match any of the output formats.
+    """
+
+    for output_format, suffix in OUTPUT_FORMATS.items():
+        if Path(file_path).suffix == suffix:
+            return output_format
+
+    raise ValueError(f"The format of the data file at {file_path} is not recognised.")
+
+
+def is_float32_safe(column: pd.Series, num_decimals: Optional[int]) -> bool:
+    """Returns True if every value of the float column can be stored as a float32 without changing
+    it at the given number of decimals, i.e. the float32 rounding error of the largest value is less
+    than half of the last decimal place. Columns without a number of decimals are never float32 safe.
+    """
+
+    if num_decimals is None:
+        return False
+
+    max_abs_val = column.abs().max()
+
+    # an empty column can always be stored as float32
+    if pd.isna(max_abs_val):
+        return True
+
+    return max_abs_val * FLOAT32_RELATIVE_ERROR <= 0.5 * 10.0 ** (-num_decimals)
+
+
+def get_column_dtypes(
+    df: pd.DataFrame,
+    data_types: Mapping[str, str],
+    decimals: Optional[Mapping[str, int]] = None,
+    compact: bool = False,
+) -> Dict[str, str]:
+    """Gets the dtype to use for each column of the dataframe from its data_type in the fields files.
+    Int and bool columns are nullable ints and bools, so that columns with missing values (i.e. after a join)
+    are not turned into floats or objects. If compact is True, the narrowest safe dtype is used instead:
+    int columns are Int32 if every value fits, and float columns are float32 if is_float32_safe at the
+    column's number of decimals.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe to get the dtypes for.
+    data_types : Mapping[str, str]
+        The data_type of each column, i.e. 'int', 'float' or 'bool'.
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals of each float column, by default None
+    compact : bool, optional
+        If True, use the narrowest safe dtype for each column, by default False
+
+    Returns
+    -------
+    Dict[str, str]
+        The dtype of each column that has one, with the column names as keys.
+    """
+
+    decimals = decimals or {}
+    dtypes = {}
+
+    for colname in df.columns:
+        data_type = data_types.get(colname)
+
+        if data_type == "bool":
+            dtypes[colname] = "boolean"
+
+        elif data_type == "int":
+            dtypes[colname] = "Int64"
+
+            if compact and pd.api.types.is_numeric_dtype(df[colname]):
+                int32_info = np.iinfo(np.int32)
+                min_val, max_val = df[colname].min(), df[colname].max()
+                if pd.isna(min_val) or (
+                    int32_info.min <= min_val and max_val <= int32_info.max
+                ):
+                    dtypes[colname] = "Int32"
+
+        elif data_type == "float" and compact:
+            if pd.api.types.is_float_dtype(df[colname]) and is_float32_safe(
+                df[colname], decimals.get(colname)
+            ):
+                dtypes[colname] = "float32"
+
+    return dtypes
+
+
+def widen_column_dtypes(
+    dtypes: Mapping[str, str], new_dtypes: Mapping[str, str]
+) -> Dict[str, str]:
+    """Merges the dtypes of the columns of two parts of a catalogue (i.e. two chunks, see get_column_dtypes) into
+    dtypes that fit the values of both, so any column that is compact in only one of them uses its wider dtype
+    (see WIDER_DTYPES). Float columns that are not compact in either part are left out, as in get_column_dtypes.
+
+    Parameters
+    ----------
+    dtypes : Mapping[str, str]
+        The dtype of each column of the first part.
+    new_dtypes : Mapping[str, str]
+        The dtype of each column of the second part.
+
+    Returns
+    -------
+    Dict[str, str]
+        The dtype of each column that fits both parts.
+    """
+
+    widened = {}
+
+    for colname in list(dtypes) + [c for c in new_dtypes if c not in dtypes]:
+        dtype = dtypes.get(colname)
+        if dtype == new_dtypes.get(colname):
+            widened[colname] = dtype
+        else:
+            # a column without a dtype in one part keeps its (wider) dtype there
+            dtype = dtype if dtype is not None else new_dtypes[colname]
+            widened[colname] = WIDER_DTYPES.get(dtype, dtype)
+
+    return widened
+
+
+def fits_dtype(column: pd.Series, dtype: str) -> bool:
+    """Returns True if every value of the numeric column is within the range of the int or float dtype, so
+    converting the column to it does not wrap or overflow. Columns of other types always fit.
+    """
+
+    target = pd.api.types.pandas_dtype(dtype)
+    target = getattr(target, "numpy_dtype", target)
+
+    if not pd.api.types.is_numeric_dtype(column) or not (
+        pd.api.types.is_integer_dtype(target) or pd.api.types.is_float_dtype(target)
+    ):
+        return True
+
+    info = (
+        np.iinfo(target) if pd.api.types.is_integer_dtype(target) else np.finfo(target)
+    )
+    min_val, max_val = column.min(), column.max()
+
+    # an empty column fits any dtype
+    return pd.isna(min_val) or (info.min <= min_val and max_val <= info.max)
+
+
+def apply_column_dtypes(df: pd.DataFrame, dtypes: Mapping[str, str]) -> pd.DataFrame:
+    """Converts the columns of the dataframe to the given dtypes. Any column whose values do not
+    fit its dtype (i.e. are out of its range, see fits_dtype) is left as it is.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe to update.
+    dtypes : Mapping[str, str]
+        The dtype of each column to convert, i.e. from get_column_dtypes.
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataframe with updated column dtypes.
+    """
+
+    new_dtypes = {}
+
+    for colname, dtype in dtypes.items():
+        if colname not in df.columns or df[colname].dtype == dtype:
+            continue
+
+        try:
+            if not fits_dtype(df[colname], dtype):
+                raise ValueError(f"The values of column {colname} are out of range.")
+            new_dtypes[colname] = df[colname].astype(dtype)
+        except (TypeError, ValueError):
+            # the values do not fit the data type, so leave the column as it is
+            print(
+                f"Column {colname} could not be converted to {dtype}, its type will not be changed."
+            )
+
+    if len(new_dtypes) > 0:
+        df = df.assign(**new_dtypes)
+
+    return df
+
+
+def set_column_dtypes(
+    df: pd.DataFrame,
+    data_types: Mapping[str, str],
+    decimals: Optional[Mapping[str, int]] = None,
+    compact: bool = False,
+) -> pd.DataFrame:
+    """Sets the dtypes of the columns of the dataframe from their data_type in the fields files, so that
+    int and bool columns with missing values (i.e. after a join) are kept as nullable ints and bools instead
+    of becoming floats or objects. If compact is True, the narrowest safe dtypes are used (see get_column_dtypes).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe to update.
+    data_types : Mapping[str, str]
+        The data_type of each column, i.e. 'int', 'float' or 'bool'.
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals of each float column, by default None
+    compact : bool, optional
+        If True, use the narrowest safe dtype for each column, by default False
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataframe with updated column dtypes.
+    """
+
+    return apply_column_dtypes(df, get_column_dtypes(df, data_types, decimals, compact))
+
+
+def quote_csv_text(text: pd.Series) -> pd.Series:
+    """Quotes the text values that contain a comma, a double quote or a line break, doubling any double
+    quotes within them, in the same way as csv.QUOTE_MINIMAL, so they are read back as one field.
+
+    Parameters
+    ----------
+    text : pd.Series
+        The text values.
+
+    Returns
+    -------
+    pd.Series
+        The text values, quoted where needed.
+    """
+
+    needs_quotes = text.str.contains(r'[,"\r\n]', regex=True)
+    if not needs_quotes.any():
+        return text
+
+    quoted = '"' + text.str.replace('"', '""', regex=False) + '"'
+    return text.where(~needs_quotes, quoted)
+
+
+def get_csv_header(columns: Iterable) -> str:
+    """Returns the header line of a csv file with the given column names, quoted where needed (see quote_csv_text)."""
+    return (
+        ",".join(quote_csv_text(pd.Series([str(c) for c in columns], dtype=object)))
+        + "\n"
+    )
+
+
+def format_column_values(column: pd.Series, num_decimals: int = 6) -> List[str]:
+    """Formats every value of a column as text in one vectorized step. Floats are rounded to the
+    given number of decimals and written in their shortest form (i.e. 1.5 rather than 1.500000),
+    missing values (NaNs) are written as empty strings, and any other values that contain a comma,
+    a double quote or a line break are quoted (see quote_csv_text).
+
+    Parameters
+    ----------
+    column : pd.Series
+        The column to format.
+    num_decimals : int, optional
+        The number of decimals to round float values to, by default 6
+
+    Returns
+    -------
+    List[str]
+        The formatted values of the column.
+    """
+
+    missing = column.isna().to_numpy()
+
+    if pd.api.types.is_bool_dtype(column):
+        text = np.where(column.to_numpy(dtype=bool, na_value=False), "True", "False")
+
+    elif pd.api.types.is_integer_dtype(column):
+        text = column.to_numpy(dtype=np.int64, na_value=0).astype(str)
+
+    elif pd.api.types.is_float_dtype(column):
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        text = np.round(values, num_decimals).astype(str)
+
+    else:
+        text = quote_csv_text(column.astype(str)).to_numpy(dtype=object)
+
+    text[missing] = ""
+
+    return text.tolist()
+
+
+def write_csv(
+    df_cat: pd.DataFrame,
+    output_file_path: Path,
+    decimals: Optional[Mapping[str, int]] = None,
+    default_decimals: int = 6,
+    chunk_size: int = CSV_CHUNK_ROWS,
 ):
-    """Writes out the dataframe to a csv file at the given output path. Ensures the parent directory exists. The csv is written without the pandas index, and cuts off all floats at 6 decimal places.
+    """Writes out the dataframe to a csv file without the pandas index. Each float column is written at its
+    own precision, and missing values are written as empty strings. The rows are formatted one column at a
+    time with format_column_values and written in chunks of chunk_size rows through a large write buffer.
 
     Parameters
     ----------
@@ -78,6 +651,69 @@ def write_data(
         The pandas dataframe to write out.
     output_file_path : Path
         The full path of the csv file to write to.
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals to write for each float column, with the column names as keys, by default None
+    default_decimals : int, optional
+        The number of decimals to write for float columns not in decimals, by default 6
+    chunk_size : int, optional
+        The number of rows to format and write at a time, by default CSV_CHUNK_ROWS
+    """
+
+    with open(
+        output_file_path, "w", newline="", buffering=CSV_BUFFER_BYTES
+    ) as csv_file:
+        csv_file.write(get_csv_header(df_cat.columns))
+        write_csv_rows(csv_file, df_cat, decimals, default_decimals, chunk_size)
+
+
+def write_csv_rows(
+    csv_file: TextIO,
+    df_cat: pd.DataFrame,
+    decimals: Optional[Mapping[str, int]] = None,
+    default_decimals: int = 6,
+    chunk_size: int = CSV_CHUNK_ROWS,
+):
+    """Writes the rows of the dataframe to an open csv file, without a header. See write_csv for the parameters."""
+
+    # use the default for any columns without a number of decimals
+    decimals = {
+        colname: (
+            default_decimals
+            if (decimals or {}).get(colname) is None
+            else decimals[colname]
+        )
+        for colname in df_cat.columns
+    }
+
+    for start in range(0, len(df_cat), chunk_size):
+        chunk = df_cat.iloc[start : start + chunk_size]
+
+        text_columns = [
+            format_column_values(chunk.iloc[:, i], decimals[colname])
+            for i, colname in enumerate(chunk.columns)
+        ]
+
+        csv_file.write("\n".join(map(",".join, zip(*text_columns))) + "\n")
+
+
+def write_data(
+    df_cat: pd.DataFrame,
+    output_file_path: Path,
+    decimals: Optional[Mapping[str, int]] = None,
+):
+    """Writes out the dataframe to a file at the given output path. Ensures the parent directory exists.
+    The format of the file is set by the suffix of the path (see OUTPUT_FORMATS). A csv is written with
+    write_csv, with floats at the number of decimals given for their column, or 6 decimal places otherwise.
+    Parquet and feather files keep the dtypes of the columns.
+
+    Parameters
+    ----------
+    df_cat : pd.DataFrame
+        The pandas dataframe to write out.
+    output_file_path : Path
+        The full path of the file to write to.
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals to write for each float column in csv files, by default None
     """
 
     # make sure that output file path exists
@@ -85,12 +721,198 @@ def write_data(
         # if it doesn't, create it
         output_file_path.parent.mkdir()
 
-    # write data and set floats to have no more than 6 decimal places
-    df_cat.to_csv(
-        output_file_path,
-        float_format=float_format,
-        index=False,
-    )
+    output_format = get_file_format(output_file_path)
+
+    if output_format == "parquet":
+        df_cat.to_parquet(output_file_path, index=False)
+
+    elif output_format == "feather":
+        # feather files can only be written with a default index
+        df_cat.reset_index(drop=True).to_feather(output_file_path)
+
+    else:
+        # write data with floats rounded to the decimals of their column
+        write_csv(df_cat, output_file_path, decimals)
+
+
+class ChunkedDataWriter:
+    """Writes out a dataframe one chunk of rows at a time to a file at the given output path, so the whole
+    dataframe never has to be in memory. The format of the file is set by the suffix of the path, as in write_data,
+    and the file is the same as if the chunks were concatenated and written with write_data. Every chunk must have
+    the same columns. If a later chunk has wider dtypes (see widen_column_dtypes), the rows already written to a
+    parquet or feather file are rewritten with them. Use as a context manager, or call close once all of the
+    chunks are written.
+
+    Parameters
+    ----------
+    output_file_path : Path
+        The full path of the file to write to.
+    decimals : Optional[Mapping[str, int]], optional
+        The number of decimals to write for each float column in csv files, by default None
+    """
+
+    def __init__(
+        self, output_file_path: Path, decimals: Optional[Mapping[str, int]] = None
+    ):
+        self.output_file_path = output_file_path
+        self.output_format = get_file_format(output_file_path)
+        self.decimals = decimals
+        self.num_rows = 0
+        self._writer = None
+        self._schema = None
+
+        # make sure that output file path exists
+        if not output_file_path.parent.is_dir():
+            # if it doesn't, create it
+            output_file_path.parent.mkdir()
+
+    def write(self, df_chunk: pd.DataFrame):
+        """Writes the next chunk of rows to the file."""
+
+        if self.output_format == "csv":
+            if self._writer is None:
+                self._writer = open(
+                    self.output_file_path, "w", newline="", buffering=CSV_BUFFER_BYTES
+                )
+                self._writer.write(get_csv_header(df_chunk.columns))
+            write_csv_rows(self._writer, df_chunk, self.decimals)
+
+        else:
+            import pyarrow as pa
+
+            table = pa.Table.from_pandas(df_chunk, preserve_index=False)
+
+            if self._writer is None:
+                self._open_writer(table.schema)
+            elif not table.schema.equals(self._schema):
+                self._rewrite_file(table.schema)
+
+            self._writer.write_table(table)
+
+        self.num_rows += len(df_chunk)
+
+    def _open_writer(self, schema):
+        """Opens a parquet or feather file with the given arrow schema to write the chunks to."""
+
+        import pyarrow as pa
+
+        self._schema = schema
+        if self.output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self.output_file_path, schema)
+        else:
+            # feather files are arrow ipc files, compressed as pandas does by default
+            self._writer = pa.ipc.new_file(
+                self.output_file_path,
+                schema,
+                options=pa.ipc.IpcWriteOptions(compression="lz4"),
+            )
+
+    def _rewrite_file(self, schema):
+        """Rewrites the rows already written to a parquet or feather file with the (wider) arrow schema of a later
+        chunk, one batch at a time, so the whole file has the same schema."""
+
+        import pyarrow as pa
+
+        self._writer.close()
+        old_file_path = self.output_file_path.with_name(
+            self.output_file_path.name + ".tmp"
+        )
+        self.output_file_path.replace(old_file_path)
+        self._open_writer(schema)
+
+        if self.output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            batches = pq.ParquetFile(old_file_path).iter_batches()
+        else:
+            reader = pa.ipc.open_file(old_file_path)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+        for batch in batches:
+            self._writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+
+        old_file_path.unlink()
+
+    def close(self):
+        """Closes the file."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_data(data_file_path: Path) -> pd.DataFrame:
+    """Reads in a data file written by write_data, using its suffix to get the format.
+
+    Parameters
+    ----------
+    data_file_path : Path
+        The full path to the data file.
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataframe with the data from the file.
+    """
+
+    output_format = get_file_format(data_file_path)
+
+    if output_format == "parquet":
+        return pd.read_parquet(data_file_path)
+    elif output_format == "feather":
+        return pd.read_feather(data_file_path)
+    else:
+        return pd.read_csv(data_file_path)
+
+
+def iter_data_chunks(
+    data_file_path: Path, chunk_size: int, columns: Optional[List[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """Reads a data file written by write_data (or ChunkedDataWriter) as a series of dataframes of at most
+    chunk_size rows. Csv and parquet files are read a chunk at a time, and feather files are read in whole
+    (only the given columns) and then split into chunks.
+
+    Parameters
+    ----------
+    data_file_path : Path
+        The full path to the data file.
+    chunk_size : int
+        The maximum number of rows in each chunk.
+    columns : Optional[List[str]], optional
+        The names of the columns to read, by default None, which reads every column.
+
+    Yields
+    ------
+    Iterator[pd.DataFrame]
+        The chunks of the file.
+    """
+
+    output_format = get_file_format(data_file_path)
+
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(data_file_path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+
+    elif output_format == "feather":
+        df = pd.read_feather(data_file_path, columns=columns)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start : start + chunk_size]
+
+    else:
+        with pd.read_csv(
+            data_file_path, usecols=columns, chunksize=chunk_size
+        ) as reader:
+            yield from reader
 
 
 def write_json(data: dict, base_output_path: Path, filename: str):
@@ -2,6 +2,7 @@ import pytest
 
 from jhive_previz import main
 from jhive_previz import dataproc
+from jhive_previz import schema
 
 
 # @pytest.fixture(autouse=True)
@@ -12,7 +13,16 @@ from jhive_previz import dataproc
 
 
 @pytest.fixture(autouse=True)
-def load_config():
+def schema_cache_dir(monkeypatch, tmp_path):
+    """Cache the compiled fields files in the temporary path, rather than the user's cache directory."""
+
+    cache_dir = tmp_path / "schema_cache"
+    monkeypatch.setenv(schema.SCHEMA_CACHE_DIR_ENV, str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def load_config(schema_cache_dir):
     """Load in the config files."""
     return main.load_config(
         "./tests/test_data/test_config.yaml",
@@ -0,0 +1,100 @@
+import copy
+import pytest
+import pandas as pd
+
+from jhive_previz import main, utils
+from jhive_previz.benchmarks import run, synthetic
+
+
+def test_make_synthetic_field(tmp_path):
+    """Test that the synthetic catalogues have the input columns of the columns to use, and only the chosen filters."""
+
+    config_path = synthetic.make_synthetic_field(tmp_path, 200, num_filters=2)
+    config_params, field_params = main.load_config(
+        config_path, synthetic.DEFAULT_FIELD_PATHS
+    )
+
+    filter_names = synthetic.get_filter_names(field_params)[:2]
+    for file_name, columns in config_params["columns_to_use"].items():
+        col_field_params = field_params[file_name]["columns"]
+        assert all(
+            col_field_params[c].get("filt_name") in filter_names + [None]
+            for c in columns
+        )
+
+        df = utils.read_table(
+            utils.get_cat_filepath(file_name, config_params),
+            field_params[file_name]["file_format"],
+        )
+        assert set(col_field_params[c]["input_column_name"] for c in columns) <= set(
+            df.columns
+        )
+        if file_name == "cat_filename":
+            assert len(df) == 200
+        else:
+            assert len(df) < 200
+
+    # no output column is taken from more than one catalogue
+    columns = [c for cols in config_params["columns_to_use"].values() for c in cols]
+    assert len([c for c in columns if c != "id"]) == len(set(columns) - {"id"})
+
+
+def test_run_benchmark(tmp_path):
+    """Test that every stage of the pipeline is timed on a synthetic field, and that slower stages are found as regressions."""
+
+    results = {"runs": [run.run_benchmark(tmp_path, 300, num_filters=5)]}
+
+    stages = {stage["stage"]: stage for stage in results["runs"][0]["stages"]}
+    assert list(stages) == [
+        "create_and_write_flag_file",
+        "read_table[cat_filename]",
+        "process_column_data[cat_filename]",
+        "read_table[db_filename]",
+        "process_column_data[db_filename]",
+        "read_table[mf_filename]",
+        "process_column_data[mf_filename]",
+        "join_catalogues",
+        "write_data",
+        "create_metadata_file",
+        "make_dists",
+    ]
+    assert all(stage["rows_per_second"] > 0 for stage in stages.values())
+    assert all(stage["peak_memory_mb"] > 0 for stage in stages.values())
+
+    # every object is written to either the raw or the core catalogue
+    output_path = tmp_path / "field_300" / "output" / "benchmark" / "synthetic-300"
+    df_raw = pd.read_csv(output_path / "catalog_raw.csv")
+    assert len(df_raw) + len(pd.read_csv(output_path / "catalog_core.csv")) == 300
+
+    assert not any(c["regression"] for c in run.compare_results(results, results))
+
+    slower_results = copy.deepcopy(results)
+    slower_results["runs"][0]["stages"][0]["rows_per_second"] /= 2
+    comparisons = run.compare_results(results, slower_results)
+    assert [c["stage"] for c in comparisons if c["regression"]] == [
+        "create_and_write_flag_file"
+    ]
+
+
+@pytest.mark.parametrize("command", list(run.STARTUP_COMMANDS))
+def test_measure_startup(command):
+    """Test that the command prints its help without importing any of the slow packages, and that slower
+    start up times and new slow imports are found as regressions."""
+
+    startup = run.measure_startup(command, run.STARTUP_COMMANDS[command])
+
+    assert startup["seconds"] > 0
+    assert startup["slow_imports"] == []
+
+    results = {"startup": [startup]}
+    assert not any(c["regression"] for c in run.compare_startup(results, results))
+
+    slower_results = copy.deepcopy(results)
+    slower_results["startup"][0]["seconds"] *= 2
+    assert run.compare_startup(results, slower_results)[0]["regression"]
+
+    heavier_results = copy.deepcopy(results)
+    heavier_results["startup"][0]["slow_imports"] = ["pandas"]
+    comparison = run.compare_startup(results, heavier_results)[0]
+    assert comparison["regression"]
+    assert comparison["new_slow_imports"] == ["pandas"]
@@ -0,0 +1,116 @@
+import pytest
+import os
+import pandas as pd
+
+from jhive_previz import cache, dataproc
+
+
+@pytest.fixture
+def populated_dataframes(load_config):
+    """Create the Catalogue objects for both test catalogues, with their columns populated."""
+
+    load_config[0]["columns_to_use"]["ez_filename"] = ["id", "abmag_f480w"]
+    return dataproc.populate_column_information({}, load_config[0], load_config[1])
+
+
+def test_get_cache_key(load_config, populated_dataframes, monkeypatch):
+    """Test that the cache key only changes when the columns or their parameters, or the cache version, change."""
+
+    cat = populated_dataframes["cat_filename"]
+    col_field_params = load_config[1]["cat_filename"]["columns"]
+
+    key = cache.get_cache_key(
+        cat.file_path,
+        cat.file_format,
+        cat.input_columns,
+        cat.output_columns,
+        col_field_params,
+    )
+    same_key = cache.get_cache_key(
+        cat.file_path,
+        cat.file_format,
+        cat.input_columns,
+        cat.output_columns,
+        col_field_params,
+    )
+
+    # changing a parameter of a column that is not used does not change the key
+    col_field_params["abmag_f480w"]["zero_point"] = 25.0
+    unused_key = cache.get_cache_key(
+        cat.file_path,
+        cat.file_format,
+        cat.input_columns,
+        cat.output_columns,
+        col_field_params,
+    )
+
+    col_field_params["abmag_f444w"]["zero_point"] = 25.0
+    new_key = cache.get_cache_key(
+        cat.file_path,
+        cat.file_format,
+        cat.input_columns,
+        cat.output_columns,
+        col_field_params,
+    )
+
+    # a new version of the processing code does not use the old cached dataframes
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION + 1)
+    version_key = cache.get_cache_key(
+        cat.file_path,
+        cat.file_format,
+        cat.input_columns,
+        cat.output_columns,
+        col_field_params,
+    )
+
+    assert key == same_key == unused_key
+    assert key != new_key
+    assert version_key not in [key, new_key]
+
+
+def test_load_and_process_catalogue_cache(
+    load_config, populated_dataframes, tmp_path, monkeypatch
+):
+    """Test that the processed dataframe is written to the cache, and read back from it instead of processing the catalogue again."""
+
+    cache_dir = tmp_path / "cache"
+    cat = dataproc.load_and_process_catalogue(
+        "cat_filename",
+        populated_dataframes["cat_filename"],
+        load_config[1]["cat_filename"],
+        cache_dir=cache_dir,
+    )
+    assert len(list(cache_dir.glob("*.pkl"))) == 1
+
+    # make sure the catalogue is not processed again
+    def fail_process_column_data(cat, field_params):
+        raise AssertionError("process_column_data should not be called")
+
+    monkeypatch.setattr(dataproc, "process_column_data", fail_process_column_data)
+
+    new_cat = dataproc.populate_column_information({}, load_config[0], load_config[1])[
+        "cat_filename"
+    ]
+    new_cat = dataproc.load_and_process_catalogue(
+        "cat_filename", new_cat, load_config[1]["cat_filename"], cache_dir=cache_dir
+    )
+
+    assert new_cat.loaded
+    pd.testing.assert_frame_equal(cat.df, new_cat.df)
+
+
+def test_evict_cache_files(tmp_path):
+    """Test that the oldest cache files are deleted first when the cache is too large."""
+
+    df = pd.DataFrame({"id": range(1000)})
+    cache.write_cached_dataframe(tmp_path, "old", df)
+    cache.write_cached_dataframe(tmp_path, "new", df)
+
+    # make sure the old file was last used before the new one
+    os.utime(cache.get_cache_filepath(tmp_path, "old"), (0, 0))
+
+    file_size = cache.get_cache_filepath(tmp_path, "new").stat().st_size
+    cache.evict_cache_files(tmp_path, max_cache_bytes=file_size)
+
+    assert not cache.get_cache_filepath(tmp_path, "old").is_file()
+    assert cache.read_cached_dataframe(tmp_path, "new") is not None
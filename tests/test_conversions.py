@@ -40,3 +40,31 @@ def test_flux_to_mag(load_config):
     )
     assert converted.iloc[6] == test_result
     assert isinstance(converted, pd.Series)
+
+
+def test_apply_conversion(load_config):
+    """Make sure that apply_conversion converts a whole column in one call, and that it gives the same result as converting the values one at a time with a function marked as scalar only."""
+
+    file_path = utils.get_cat_filepath("cat_filename", load_config[0])
+    df = utils.read_table(file_path, "ascii.csv")
+    col_params = load_config[1]["cat_filename"]["columns"]["abmag_f444w"]
+
+    converted = conv.apply_conversion(conv.flux_to_mag, df["f444w_corr_1"], col_params)
+
+    # make a scalar only version of the same conversion
+    calls = []
+
+    @conv.scalar_only
+    def scalar_flux_to_mag(flux, field_params):
+        calls.append(flux)
+        return conv.flux_to_mag(flux, field_params)
+
+    scalar_converted = conv.apply_conversion(
+        scalar_flux_to_mag, df["f444w_corr_1"], col_params
+    )
+
+    assert isinstance(converted, np.ndarray)
+    assert conv.is_scalar_only(scalar_flux_to_mag)
+    assert not conv.is_scalar_only(conv.flux_to_mag)
+    assert len(calls) == len(df)
+    np.testing.assert_array_equal(converted, scalar_converted)
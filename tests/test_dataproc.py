@@ -1,9 +1,19 @@
+import io
+import json
 import pytest
 from pathlib import Path
 import numpy as np
 import pandas as pd
 
-from jhive_previz import dataproc, utils
+from jhive_previz import (
+    bundle,
+    dataproc,
+    density,
+    filterobjects,
+    stats,
+    tiles,
+    utils,
+)
 from jhive_previz import main as main
 from jhive_previz import conversions as conv
 
@@ -103,8 +113,10 @@ def test_process_column_data(load_config, setup_dataframes):
         "cat_filename", setup_dataframes["cat_filename"]
     )
 
-    # test there are a lot of columns
-    assert len(setup_dataframes["cat_filename"].df.columns) > 4
+    # test that only the input columns were read in
+    assert set(setup_dataframes["cat_filename"].df.columns) == set(
+        setup_dataframes["cat_filename"].input_columns
+    )
 
     # make sure we have a copy of the original dataframe
     old_df = setup_dataframes["cat_filename"].df
@@ -120,17 +132,18 @@ def test_process_column_data(load_config, setup_dataframes):
         setup_dataframes["cat_filename"].input_columns
     )
 
-    # make sure new values are log of old ones
-    assert setup_dataframes["cat_filename"].df["mass"].iloc[10] == np.log10(
-        old_df["stellar_mass"].iloc[10]
+    # make sure new values are log of old ones, rounded to the output_num_decimals
+    assert setup_dataframes["cat_filename"].df["mass"].iloc[10] == np.round(
+        np.log10(old_df["stellar_mass"].iloc[10]), 3
     )
 
     # make sure that values in new dataframe match a converted value from old dataframe
-    assert setup_dataframes["cat_filename"].df["abmag_f333w"].iloc[
-        10
-    ] == conv.flux_to_mag(
-        old_df["f333w_corr_1"].iloc[10],
-        load_config[1]["cat_filename"]["columns"]["abmag_f333w"],
+    assert setup_dataframes["cat_filename"].df["abmag_f333w"].iloc[10] == np.round(
+        conv.flux_to_mag(
+            old_df["f333w_corr_1"].iloc[10],
+            load_config[1]["cat_filename"]["columns"]["abmag_f333w"],
+        ),
+        3,
     )
 
     # make sure that filtering happened
@@ -180,3 +193,718 @@ def test_with_ingest_flags(load_config, test_output_path, create_output_path):
     assert len(df_raw) == 2
     assert 1 in df_raw["id"].values
     assert 51 in df_core["id"].values
+
+
+def test_load_dataframe_columns(load_config, setup_dataframes):
+    """Test that load_dataframe only reads in the input columns of the catalogue once they have been populated."""
+
+    setup_dataframes = dataproc.populate_column_information(
+        setup_dataframes, load_config[0], load_config[1]
+    )
+    cat = dataproc.load_dataframe("cat_filename", setup_dataframes["cat_filename"])
+
+    assert set(cat.df.columns) == set(cat.input_columns)
+    assert "extra" not in cat.df.columns
+
+
+def test_process_column_data_memmap(load_config, tmp_path):
+    """Test that processing a memory-mapped fits catalogue gives the same result as processing the dataframe read in with read_table."""
+
+    # write the test catalogue out as a fits file
+    fits_path = tmp_path / "test-data.fits"
+    utils.write_pd_to_fits(pd.read_csv("./tests/test_data/test-data.csv"), fits_path)
+
+    processed = []
+    for memmap in [False, True]:
+        data_frames = {
+            "cat_filename": dataproc.Catalogue(
+                file_name=fits_path.name, file_path=fits_path, file_format="fits"
+            )
+        }
+        data_frames = dataproc.populate_column_information(
+            data_frames, load_config[0], load_config[1]
+        )
+        cat = dataproc.load_dataframe(
+            "cat_filename", data_frames["cat_filename"], memmap
+        )
+        processed.append(
+            dataproc.process_column_data(cat, load_config[1]["cat_filename"]).df
+        )
+
+    pd.testing.assert_frame_equal(processed[0], processed[1])
+
+
+def test_fits_column_view(tmp_path):
+    """Test that the FitsColumnView only includes the requested columns, and returns native byte order columns."""
+
+    fits_path = tmp_path / "test-data.fits"
+    df = pd.read_csv("./tests/test_data/test-data.csv")
+    utils.write_pd_to_fits(df, fits_path)
+
+    view = utils.FitsColumnView(fits_path, ["id", "stellar_mass", "not_a_column"])
+
+    assert view.columns == ["id", "stellar_mass"]
+    assert len(view) == len(df)
+    assert view["stellar_mass"].dtype.isnative
+    pd.testing.assert_series_equal(view["stellar_mass"], df["stellar_mass"])
+
+
+def test_load_and_process_catalogue(load_config, setup_dataframes):
+    """Test that load_and_process_catalogue processes catalogues that are loaded, and leaves catalogues without a path unloaded."""
+
+    load_config[0]["columns_to_use"]["ez_filename"] = ["id", "abmag_f480w"]
+    setup_dataframes = dataproc.populate_column_information(
+        setup_dataframes, load_config[0], load_config[1]
+    )
+
+    cat = dataproc.load_and_process_catalogue(
+        "ez_filename", setup_dataframes["ez_filename"], load_config[1]["ez_filename"]
+    )
+    assert cat.loaded
+    assert list(cat.df.columns) == ["id", "abmag_f480w"]
+
+    # a catalogue without a path is not loaded or processed
+    missing_cat = dataproc.Catalogue(
+        file_name="missing.csv", file_path=None, file_format="ascii.csv"
+    )
+    missing_cat = dataproc.load_and_process_catalogue(
+        "ez_filename", missing_cat, load_config[1]["ez_filename"]
+    )
+    assert not missing_cat.loaded
+    assert missing_cat.df is None
+
+
+def test_join_catalogues_and_ingest_mask():
+    """Test that join_catalogues keeps every object of the main table in order, and that the ingest mask is matched to the objects by id rather than by position."""
+
+    df_main = pd.DataFrame({"id": [3, 1, 2], "a": [0.3, 0.1, 0.2]})
+    df_other = pd.DataFrame({"id": [1, 3, 5], "b": [10.0, 30.0, 50.0]})
+    df_another = pd.DataFrame({"id": [2], "c": [True]})
+
+    df_merged = dataproc.join_catalogues(df_main, [df_other, df_another])
+
+    assert list(df_merged.columns) == ["id", "a", "b", "c"]
+    assert list(df_merged["id"]) == [3, 1, 2]
+    assert list(df_merged["b"].iloc[:2]) == [30.0, 10.0]
+    assert np.isnan(df_merged["b"].iloc[2])
+
+    # flags are in a different order to the table, and one object is missing
+    df_ingest = pd.DataFrame({"id": [2, 3], "ingest_viz": [False, True]})
+    ingest_mask = dataproc.get_ingest_mask(df_ingest, df_merged["id"])
+
+    assert list(ingest_mask) == [True, False, False]
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "feather"])
+def test_process_data_output_format(
+    load_config, test_output_path, create_output_path, output_format
+):
+    """Test that the data files are written in the given output format, and that ints stay ints when reading them back in, including after a join with missing values."""
+
+    pytest.importorskip("pyarrow")
+    load_config[0]["columns_to_use"]["ez_filename"] = ["id", "abmag_f480w"]
+
+    df_raw = dataproc.process_data(
+        load_config[0],
+        load_config[1],
+        create_output_path,
+        use_flag_file=False,
+        output_format=output_format,
+    )
+
+    output_file_path = dataproc.get_data_output_filepath(
+        create_output_path, "raw", output_format
+    )
+    assert output_file_path.suffix == utils.OUTPUT_FORMATS[output_format]
+
+    df_read = utils.read_data(output_file_path)
+
+    assert list(df_read.columns) == list(df_raw.columns)
+    assert pd.api.types.is_integer_dtype(df_read["id"])
+    assert np.isnan(df_read["abmag_f480w"].iloc[27])
+
+
+def test_set_column_dtypes():
+    """Test that set_column_dtypes keeps int and bool columns with missing values as nullable types, and leaves columns that can't be converted as they are."""
+
+    df = pd.DataFrame(
+        {
+            "id": [1.0, np.nan],
+            "flag": [True, None],
+            "bad_int": [0.5, 1.0],
+            "val": [0.1, 0.2],
+        }
+    )
+    df = utils.set_column_dtypes(
+        df, {"id": "int", "flag": "bool", "bad_int": "int", "val": "float"}
+    )
+
+    assert df["id"].dtype == "Int64"
+    assert df["flag"].dtype == "boolean"
+    assert df["bad_int"].dtype == "float64"
+    assert df["val"].dtype == "float64"
+
+
+def test_write_csv(tmp_path):
+    """Test that write_csv writes each float column at its own number of decimals, with empty values for NaNs, and that it is the same when written in chunks."""
+
+    df = pd.DataFrame(
+        {
+            "id": pd.array([1, 2, None], dtype="Int64"),
+            "mag": [21.123456, np.nan, 1.5],
+            "mass": [10.987654321, 9.0, np.inf],
+            "use": [True, False, True],
+        }
+    )
+
+    output_file_path = tmp_path / "catalog_raw.csv"
+    utils.write_csv(df, output_file_path, {"mag": 3, "mass": None})
+
+    assert output_file_path.read_text() == (
+        "id,mag,mass,use\n1,21.123,10.987654,True\n2,,9.0,False\n,1.5,inf,True\n"
+    )
+
+    chunked_file_path = tmp_path / "catalog_chunked.csv"
+    utils.write_csv(df, chunked_file_path, {"mag": 3}, chunk_size=2)
+
+    assert chunked_file_path.read_text() == output_file_path.read_text()
+
+
+def test_write_csv_quoting(tmp_path):
+    """Test that write_csv quotes the text values (and column names) with commas, double quotes or line breaks as the csv module does, so they read back as they were written."""
+
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3, 4],
+            "name": ["a,b", 'c"d', "e\nf", "plain"],
+            "mag, f444w": [1.0, 2.5, np.nan, 4.0],
+        }
+    )
+
+    output_file_path = tmp_path / "catalog_raw.csv"
+    utils.write_csv(df, output_file_path)
+
+    expected = io.StringIO(newline="")
+    df.to_csv(expected, index=False, lineterminator="\n")
+    assert output_file_path.read_text() == expected.getvalue()
+    pd.testing.assert_frame_equal(pd.read_csv(output_file_path), df)
+
+
+def test_process_column_data_rounding(load_config, setup_dataframes):
+    """Test that process_column_data rounds each column to its output_num_decimals."""
+
+    setup_dataframes = dataproc.populate_column_information(
+        setup_dataframes, load_config[0], load_config[1]
+    )
+    cat = dataproc.load_dataframe("cat_filename", setup_dataframes["cat_filename"])
+    cat = dataproc.process_column_data(cat, load_config[1]["cat_filename"])
+
+    mags = cat.df["abmag_f444w"].dropna()
+    assert np.allclose(mags, mags.round(3), rtol=0, atol=1e-12)
+
+
+def test_process_float_column_blocks(load_config, setup_dataframes, monkeypatch):
+    """Test that processing the float columns in blocks, with and without threads, gives the same values as converting, filtering and rounding each column on its own."""
+
+    setup_dataframes = dataproc.populate_column_information(
+        setup_dataframes, load_config[0], load_config[1]
+    )
+    cat = dataproc.load_dataframe("cat_filename", setup_dataframes["cat_filename"])
+    input_df = cat.df
+
+    # the magnitudes with the same zero point are one block, and the masses are another
+    blocks = dataproc.get_float_column_blocks(
+        cat, load_config[1]["cat_filename"].column_specs
+    )
+    assert [cat.output_columns[i] for i in blocks[(conv.flux_to_mag, (28.9,), 3)]] == [
+        "abmag_f333w",
+        "abmag_f444w",
+    ]
+    assert [cat.output_columns[i] for i in blocks[(conv.log_values, (), 3)]] == ["mass"]
+
+    processed = []
+    for num_threads in [1, 4]:
+        cat.df = input_df
+        processed.append(
+            dataproc.process_column_data(
+                cat, load_config[1]["cat_filename"], num_threads=num_threads
+            ).df
+        )
+
+    # process every column on its own
+    with monkeypatch.context() as m:
+        m.setattr(dataproc, "process_float_column_blocks", lambda *args: {})
+        cat.df = input_df
+        processed.append(
+            dataproc.process_column_data(cat, load_config[1]["cat_filename"]).df
+        )
+
+    pd.testing.assert_frame_equal(processed[0], processed[1], check_exact=True)
+    pd.testing.assert_frame_equal(processed[0], processed[2], check_exact=True)
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_process_data_in_chunks(
+    load_config, test_output_path, create_output_path, output_format
+):
+    """Test that processing the catalogue in chunks writes the same raw and core files as processing it all at once, and returns the stats and number of objects of each."""
+
+    if output_format != "csv":
+        pytest.importorskip("pyarrow")
+    load_config[0]["columns_to_use"]["ez_filename"] = ["id", "abmag_f480w"]
+    flag_file_path = Path("./tests/test_data/ingest_flags.fits")
+
+    df_raw, df_core = dataproc.process_data(
+        load_config[0],
+        load_config[1],
+        create_output_path,
+        use_flag_file=True,
+        flag_file_path=flag_file_path,
+        output_format=output_format,
+    )
+
+    chunked_output_path = create_output_path / "chunked"
+    outputs = dataproc.process_data_in_chunks(
+        load_config[0],
+        load_config[1],
+        chunked_output_path,
+        use_flag_file=True,
+        flag_file_path=flag_file_path,
+        chunk_size=7,
+        output_format=output_format,
+    )
+
+    for suffix, df in [("raw", df_raw), ("core", df_core)]:
+        df_stats, num_objects = outputs[suffix]
+        assert num_objects == len(df)
+        np.testing.assert_equal(
+            df_stats.at["max", "abmag_f444w"], df["abmag_f444w"].max()
+        )
+        assert df_stats.at["min", "id"] == df["id"].min()
+        assert df_stats.at["count", "abmag_f444w"] == df["abmag_f444w"].count()
+        # the percentiles are found from the sketches of the columns, which keep every value of a column this small
+        percentile_names = [
+            stats.get_percentile_name(p) for p in stats.DEFAULT_PERCENTILES
+        ]
+        whole_stats = stats.get_column_stats(df, list(df_stats.columns))
+        np.testing.assert_allclose(
+            df_stats.loc[percentile_names].to_numpy(dtype=np.float64),
+            whole_stats.loc[percentile_names].to_numpy(dtype=np.float64),
+            rtol=0,
+            atol=1e-9,
+        )
+
+        whole_df = utils.read_data(
+            dataproc.get_data_output_filepath(create_output_path, suffix, output_format)
+        )
+        chunked_df = utils.read_data(
+            dataproc.get_data_output_filepath(
+                chunked_output_path, suffix, output_format
+            )
+        )
+        pd.testing.assert_frame_equal(whole_df, chunked_df)
+
+
+def test_process_data_make_flags(
+    load_config, test_output_path, create_output_path, monkeypatch
+):
+    """Test that making the ingest flags while the main catalogue is processed, whole or in chunks, splits the objects in the same way as the flag file made by make_flag_file, and writes the same flag file."""
+
+    # the cuts that the test flag file was made with
+    monkeypatch.setattr(filterobjects, "SNR_MAG", 4)
+    monkeypatch.setattr(filterobjects, "NUM_FLAGS", 1)
+    test_flag_file_path = Path("./tests/test_data/ingest_flags.fits")
+
+    df_raw, df_core = dataproc.process_data(
+        load_config[0],
+        load_config[1],
+        create_output_path,
+        use_flag_file=True,
+        flag_file_path=test_flag_file_path,
+    )
+
+    flag_file_path = create_output_path / "ingest_flags.fits"
+    made_raw, made_core = dataproc.process_data(
+        load_config[0],
+        load_config[1],
+        create_output_path,
+        use_flag_file=True,
+        flag_file_path=flag_file_path,
+        make_flags=True,
+    )
+
+    pd.testing.assert_frame_equal(df_raw, made_raw)
+    pd.testing.assert_frame_equal(df_core, made_core)
+    pd.testing.assert_frame_equal(
+        utils.read_table(flag_file_path, "fits"),
+        utils.read_table(test_flag_file_path, "fits"),
+    )
+
+    # the flag file is written from the flags of every chunk
+    flag_file_path.unlink()
+    outputs = dataproc.process_data_in_chunks(
+        load_config[0],
+        load_config[1],
+        create_output_path,
+        use_flag_file=True,
+        flag_file_path=flag_file_path,
+        chunk_size=7,
+        make_flags=True,
+    )
+
+    assert outputs["core"][1] == len(df_core)
+    pd.testing.assert_frame_equal(
+        utils.read_table(flag_file_path, "fits"),
+        utils.read_table(test_flag_file_path, "fits"),
+    )
+
+
+def test_iter_table_chunks(tmp_path):
+    """Test that the chunks of fits and csv files have at most chunk_size rows, and together are the same as reading the whole file."""
+
+    df = pd.read_csv("./tests/test_data/test-data.csv")
+    fits_path = tmp_path / "test-data.fits"
+    utils.write_pd_to_fits(df, fits_path)
+    columns = ["id", "stellar_mass"]
+
+    for file_path, file_format in [
+        (fits_path, "fits"),
+        (Path("./tests/test_data/test-data.csv"), "ascii.csv"),
+    ]:
+        chunks = list(utils.iter_table_chunks(file_path, file_format, 20, columns))
+
+        assert [len(chunk) for chunk in chunks] == [20, 20, len(df) - 40]
+        pd.testing.assert_frame_equal(pd.concat(chunks), df[columns], check_dtype=False)
+
+
+def test_get_column_dtypes_compact():
+    """Test that compact dtypes are only used when they keep the values at their number of decimals."""
+
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "big_id": [1, 2, 2**40],
+            "mag": [21.123, np.nan, 30.5],
+            "ra": [53.123456, 53.2, 53.3],
+            "flag": [True, False, True],
+        }
+    )
+    data_types = {
+        "id": "int",
+        "big_id": "int",
+        "mag": "float",
+        "ra": "float",
+        "flag": "bool",
+    }
+    decimals = {"mag": 3, "ra": 6}
+
+    assert utils.get_column_dtypes(df, data_types, decimals) == {
+        "id": "Int64",
+        "big_id": "Int64",
+        "flag": "boolean",
+    }
+    assert utils.get_column_dtypes(df, data_types, decimals, compact=True) == {
+        "id": "Int32",
+        "big_id": "Int64",
+        "mag": "float32",
+        "flag": "boolean",
+    }
+
+
+def test_process_data_compact(load_config, test_output_path, create_output_path):
+    """Test that processing the data with compact dtypes uses less memory and writes the same csv file."""
+
+    load_config[0]["columns_to_use"]["ez_filename"] = ["id", "abmag_f480w"]
+
+    df_full = dataproc.process_data(
+        load_config[0], load_config[1], create_output_path, use_flag_file=False
+    )
+    csv_full = dataproc.get_data_output_filepath(create_output_path, "raw").read_text()
+
+    df_compact = dataproc.process_data(
+        load_config[0],
+        load_config[1],
+        create_output_path,
+        use_flag_file=False,
+        compact=True,
+    )
+    csv_compact = dataproc.get_data_output_filepath(
+        create_output_path, "raw"
+    ).read_text()
+
+    assert df_compact["abmag_f444w"].dtype == np.float32
+    assert df_compact["id"].dtype == "Int32"
+    assert df_compact.memory_usage().sum() < df_full.memory_usage().sum()
+    assert csv_compact == csv_full
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_process_data_in_chunks_compact(
+    load_config, create_output_path, tmp_path, monkeypatch, output_format
+):
+    """Test that the compact dtypes are widened when a later chunk does not fit the dtypes of the first chunk, so the chunked output has the same values as the whole catalogue."""
+
+    if output_format != "csv":
+        pytest.importorskip("pyarrow")
+    load_config[0]["columns_to_use"]["ez_filename"] = ["id", "abmag_f480w"]
+
+    # only the last chunk has an id that does not fit in an Int32
+    df = pd.read_csv(utils.get_cat_filepath("cat_filename", load_config[0]))
+    df.loc[len(df) - 1, "id"] = 2**40
+    df.to_csv(tmp_path / "test-data.csv", index=False)
+    monkeypatch.setitem(load_config[0]["paths"], "cat_path", tmp_path)
+
+    dataproc.process_data(
+        load_config[0],
+        load_config[1],
+        create_output_path,
+        use_flag_file=False,
+        output_format=output_format,
+    )
+
+    chunked_output_path = create_output_path / "chunked"
+    dataproc.process_data_in_chunks(
+        load_config[0],
+        load_config[1],
+        chunked_output_path,
+        use_flag_file=False,
+        chunk_size=7,
+        output_format=output_format,
+        compact=True,
+    )
+
+    whole_df = utils.read_data(
+        dataproc.get_data_output_filepath(create_output_path, "raw", output_format)
+    )
+    chunked_df = utils.read_data(
+        dataproc.get_data_output_filepath(chunked_output_path, "raw", output_format)
+    )
+    assert chunked_df["id"].max() == 2**40
+    pd.testing.assert_frame_equal(whole_df, chunked_df, check_dtype=False)
+
+
+def test_write_column_bundle(tmp_path):
+    """Test that a column bundle is read back as the same dataframe, with aligned columns, NaNs kept in float columns, and validity bitmaps for missing ints and bools."""
+
+    df = pd.DataFrame(
+        {
+            "id": pd.array([1, 2, None], dtype="Int64"),
+            "mag": [21.5, np.nan, 1.25],
+            "ra": [53.123456, 53.2, 53.3],
+            "use": pd.array([True, None, False], dtype="boolean"),
+        }
+    )
+
+    # write the bundle in two chunks
+    data_file_path, manifest_file_path = bundle.get_bundle_filepaths(tmp_path, "core")
+    with bundle.ColumnBundleWriter(
+        data_file_path, manifest_file_path, {"mag": 3, "ra": 6}
+    ) as writer:
+        writer.write(df.iloc[:2])
+        writer.write(df.iloc[2:])
+
+    with open(manifest_file_path, "r") as f:
+        manifest = json.load(f)
+
+    dtypes = {column["name"]: column["dtype"] for column in manifest["columns"]}
+    assert dtypes == {"id": "int32", "mag": "float32", "ra": "float64", "use": "bitmap"}
+    assert all(
+        column["byte_offset"] % bundle.BUNDLE_ALIGNMENT == 0
+        for column in manifest["columns"]
+    )
+    assert manifest["columns"][1]["validity"] is None
+
+    df_read = bundle.read_column_bundle(manifest_file_path)
+
+    pd.testing.assert_frame_equal(df_read, df, check_dtype=False)
+
+    # the temporary files of the chunks are deleted
+    assert not any(p.name.startswith("tmp") for p in tmp_path.iterdir())
+
+
+def test_write_column_bundle_widened(tmp_path):
+    """Test that the bundle dtype of a column is widened when a later chunk does not fit the dtype of the first chunk, without changing the values of the first chunk."""
+
+    df = pd.DataFrame(
+        {"id": [1, 2, 2**40], "mag": [21.123, 1.25, 12345.678901]},
+    )
+
+    data_file_path, manifest_file_path = bundle.get_bundle_filepaths(tmp_path, "core")
+    with bundle.ColumnBundleWriter(
+        data_file_path, manifest_file_path, {"mag": 3}
+    ) as writer:
+        writer.write(df.iloc[:2])
+        writer.write(df.iloc[2:])
+
+    with open(manifest_file_path, "r") as f:
+        manifest = json.load(f)
+
+    dtypes = {column["name"]: column["dtype"] for column in manifest["columns"]}
+    assert dtypes == {"id": "int64", "mag": "float64"}
+    pd.testing.assert_frame_equal(
+        bundle.read_column_bundle(manifest_file_path), df, check_exact=True
+    )
+
+
+def test_write_tiled_data(tmp_path):
+    """Test that the HEALPix pixels match known values, and that the tiles have every object once and match the tile index."""
+
+    ra = np.array([45.0, 200.0, 10.0, 300.0, 45.0])
+    dec = np.array([0.0, -60.0, 80.0, -89.9, np.nan])
+
+    np.testing.assert_array_equal(
+        tiles.get_healpix_pixels(ra, dec, 0), [5, 10, 0, 11, tiles.NO_TILE_PIXEL]
+    )
+    np.testing.assert_array_equal(
+        tiles.get_healpix_pixels(ra, dec, 10),
+        [5941930, 10677120, 1027451, 11534338, tiles.NO_TILE_PIXEL],
+    )
+
+    df = pd.DataFrame({"id": np.arange(len(ra)), "ra": ra, "dec": dec})
+    tiles.write_tiled_data(df, tmp_path, "core", "csv", order=0)
+
+    with open(tiles.get_tile_paths(tmp_path, "core")["index"], "r") as f:
+        tile_index = json.load(f)
+
+    assert tile_index["nside"] == 1
+    assert tile_index["num_objects"] == len(df)
+    assert [tile["pixel"] for tile in tile_index["tiles"]] == [None, 0, 5, 10, 11]
+
+    df_tiles = []
+    for tile in tile_index["tiles"]:
+        df_tile = utils.read_data(tmp_path / tile["file"])
+        assert len(df_tile) == tile["num_objects"]
+        if tile["pixel"] is not None:
+            assert tile["ra_min"] <= df_tile["ra"].min()
+            assert df_tile["dec"].max() <= tile["dec_max"]
+        df_tiles.append(df_tile)
+
+    df_read = pd.concat(df_tiles).sort_values("id").reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_read, df, check_dtype=False)
+
+
+def test_write_tiled_data_buffered(tmp_path):
+    """Test that the tiles are the same when their rows are written to temporary files after every chunk, and that the order of the tiles is validated."""
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "id": np.arange(200),
+            "ra": rng.uniform(0, 360, 200),
+            "dec": rng.uniform(-90, 90, 200),
+        }
+    )
+    tiles.write_tiled_data(df, tmp_path / "whole", "core", "csv", order=1)
+
+    with tiles.TiledDataWriter(
+        tmp_path / "chunked", "core", "csv", order=1, max_buffered_rows=10
+    ) as writer:
+        for start in range(0, len(df), 30):
+            writer.write(df.iloc[start : start + 30])
+
+    whole_paths = tiles.get_tile_paths(tmp_path / "whole", "core")
+    chunked_paths = tiles.get_tile_paths(tmp_path / "chunked", "core")
+    assert json.loads(whole_paths["index"].read_text()) == json.loads(
+        chunked_paths["index"].read_text()
+    )
+    for file_path in whole_paths["directory"].iterdir():
+        assert (chunked_paths["directory"] / file_path.name).read_text() == (
+            file_path.read_text()
+        )
+    # the temporary files are deleted
+    assert len(list(chunked_paths["directory"].iterdir())) == len(
+        list(whole_paths["directory"].iterdir())
+    )
+
+    for order in [-1, tiles.MAX_TILE_ORDER + 1]:
+        with pytest.raises(ValueError):
+            tiles.TiledDataWriter(tmp_path, "core", "csv", order=order)
+
+
+def test_write_tiled_data_ra_wrap(tmp_path):
+    """Test that the ra range of a tile that straddles ra = 0 wraps around, rather than covering every ra, whether the rows are written at once or in chunks."""
+
+    ra = np.array([359.5, 0.5, 359.8, 0.2, 45.0])
+    dec = np.array([1.0, 1.0, 2.0, 1.5, 0.0])
+    pixels = tiles.get_healpix_pixels(ra, dec, 4)
+    assert len(np.unique(pixels[:4])) == 1
+
+    df = pd.DataFrame({"id": np.arange(len(ra)), "ra": ra, "dec": dec})
+    for chunk_size in [len(df), 1]:
+        output_path = tmp_path / str(chunk_size)
+        with tiles.TiledDataWriter(output_path, "core", "csv", order=4) as writer:
+            for start in range(0, len(df), chunk_size):
+                writer.write(df.iloc[start : start + chunk_size])
+
+        with open(tiles.get_tile_paths(output_path, "core")["index"], "r") as f:
+            tile_index = json.load(f)
+        tile_ranges = {
+            tile["pixel"]: (tile["ra_min"], tile["ra_max"])
+            for tile in tile_index["tiles"]
+        }
+        assert tile_ranges[int(pixels[0])] == (359.5, 0.5)
+        assert tile_ranges[int(pixels[4])] == (45.0, 45.0)
+
+
+def test_write_density_pyramids(tmp_path):
+    """Test that the finest level of a density pyramid matches a 2d histogram, that every level counts the
+    same objects, and that the pyramids built from a data file in chunks are the same as from the whole catalogue.
+    """
+
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame(
+        {
+            "id": np.arange(1000),
+            "ra": rng.uniform(53.0, 53.5, 1000),
+            "dec": rng.normal(-27.8, 0.05, 1000),
+        }
+    )
+    df.loc[10, "dec"] = np.nan
+
+    density.write_density_pyramids(df, tmp_path, "raw", max_level=4)
+
+    with open(density.get_density_paths(tmp_path, "raw")["index"], "r") as f:
+        density_index = json.load(f)
+
+    assert [(pair["x"], pair["y"]) for pair in density_index["pairs"]] == [
+        ("ra", "dec")
+    ]
+    pair = density_index["pairs"][0]
+    assert pair["num_objects"] == 999
+
+    df_valid = df.dropna()
+    hist = np.histogram2d(
+        df_valid["dec"],
+        df_valid["ra"],
+        bins=16,
+        range=[[pair["y_min"], pair["y_max"]], [pair["x_min"], pair["x_max"]]],
+    )[0]
+
+    levels = []
+    for level in pair["levels"]:
+        counts = np.fromfile(tmp_path / level["file"], dtype=density.DENSITY_DTYPE)
+        assert len(counts) == level["num_bins"] ** 2
+        assert counts.sum() == 999
+        levels.append(counts)
+
+    np.testing.assert_array_equal(levels[-1].reshape(16, 16), hist)
+
+    # build the pyramids again from a data file, a chunk at a time
+    data_file_path = tmp_path / "catalog_raw.csv"
+    utils.write_data(df, data_file_path)
+    chunk_path = tmp_path / "chunked"
+    chunk_path.mkdir()
+    density.write_density_pyramids_from_file(
+        data_file_path,
+        dataproc.get_min_max_rows(df),
+        chunk_path,
+        "raw",
+        max_level=4,
+        chunk_size=300,
+    )
+
+    for level in pair["levels"]:
+        np.testing.assert_array_equal(
+            np.fromfile(chunk_path / level["file"], dtype=density.DENSITY_DTYPE),
+            levels[level["level"]],
+        )
@@ -46,3 +46,152 @@ def test_create_and_write_flag_file(load_config, create_output_path, change_SNR_
     # test that it's equal to the pre-created ingest_flags.fits
     test_df = utils.read_table("./tests/test_data/ingest_flags.fits", "fits")
     pd.testing.assert_frame_equal(created_df, test_df)
+
+    # the file only has the bitmask of each object, with the filter of each bit in the header
+    assert list(created_df.columns) == ["id", fo.FLAG_COLUMN]
+    df_flags, header = fo.read_flag_file(out_filepath)
+    assert fo.get_flag_legend(header) == ["ingest_f333w", "ingest_f444w"]
+    assert header["NUMFLAGS"] == 1
+
+    ingest_viz = fo.read_ingest_viz(out_filepath)
+    assert ingest_viz.loc[1] == False
+    assert ingest_viz.loc[2] == True
+    assert fo.read_ingest_viz(out_filepath, num_flags=2).loc[2] == False
+
+
+def test_get_flag_input_columns(load_config):
+    """Test that the flag input columns include the id, flux, and flux error columns and nothing else."""
+
+    input_columns = fo.get_flag_input_columns(
+        load_config[0]["columns_to_use"]["cat_filename"],
+        load_config[1]["cat_filename"]["columns"],
+    )
+
+    assert input_columns == [
+        "id",
+        "f333w_corr_1",
+        "f333w_ecorr_1",
+        "f444w_corr_1",
+        "f444w_ecorr_1",
+    ]
+
+
+def test_get_snr_flags():
+    """Test that only positive fluxes with a signal to noise ratio above the cut are flagged, and that missing fluxes or errors are never flagged."""
+
+    fluxes = np.array([[10.0, -10.0, np.nan], [10.0, 10.0, 10.0]])
+    errors = np.array([[0.5, 0.5, 0.5], [np.nan, 2.0, 1.0]])
+
+    flags = fo.get_snr_flags(fluxes, errors, snr=8)
+    assert flags.tolist() == [[True, False, False], [False, False, True]]
+
+    # the default cut is SNR_MAG
+    assert not fo.get_snr_flags(fluxes, errors)[1, 2]
+
+
+def test_get_ingest_flags_blocks(load_config, monkeypatch):
+    """Test that flagging the objects in small blocks gives the same flags as flagging the whole flux and error matrices at once."""
+
+    test_df = pd.read_csv("./tests/test_data/test-data.csv")
+    columns = load_config[0]["columns_to_use"]["cat_filename"]
+    col_field_params = load_config[1]["cat_filename"]["columns"]
+
+    flux_col_names = fo.get_flux_column_names(columns, col_field_params)
+    fluxes = test_df[flux_col_names].to_numpy()
+    errors = test_df[[fo.get_err_column_name(c) for c in flux_col_names]].to_numpy()
+
+    monkeypatch.setattr(fo, "FLAG_BLOCK_VALUES", 3)
+    flag_col_names, flags = fo.get_ingest_flags(columns, col_field_params, test_df)
+
+    assert flag_col_names == ["ingest_f333w", "ingest_f444w"]
+    np.testing.assert_array_equal(flags, fo.get_snr_flags(fluxes, errors))
+
+
+@pytest.mark.parametrize("num_filters", [2, 8, 12, 40])
+def test_pack_flags(num_filters):
+    """Test that packing the flags into bitmasks and unpacking them gives the same flags, and that the number of flags of each object is counted from its bitmask."""
+
+    rng = np.random.default_rng(0)
+    flags = rng.random((100, num_filters)) < 0.5
+
+    bitmasks = fo.pack_flags(flags)
+    assert bitmasks.dtype == fo.get_bitmask_dtype(num_filters)
+    assert (bitmasks >= 0).all()
+    np.testing.assert_array_equal(fo.unpack_flags(bitmasks, num_filters), flags)
+    np.testing.assert_array_equal(fo.count_flags(bitmasks), flags.sum(axis=1))
+
+    # bit i is the flag of filter i
+    assert bitmasks[0] == sum(1 << i for i in range(num_filters) if flags[0, i])
+
+    with pytest.raises(ValueError):
+        fo.get_bitmask_dtype(64)
+
+
+def test_read_ingest_viz_old_flag_file(tmp_path):
+    """Test that flag files with an 'ingest_viz' column, made before the flags were packed into bitmasks, can still be read."""
+
+    df_old = pd.DataFrame(
+        {
+            "id": [1, 2, 3],
+            "ingest_f444w": [True, False, True],
+            "ingest_viz": [True, False, True],
+        }
+    )
+    utils.write_pd_to_fits(df_old, tmp_path / "ingest_flags.fits")
+
+    ingest_viz = fo.read_ingest_viz(tmp_path / "ingest_flags.fits")
+    assert ingest_viz.to_dict() == {1: True, 2: False, 3: True}
+
+
+def test_get_selection_curve():
+    """Test that the number of core objects for each pair of cuts in the sweep is the same as flagging the fluxes with those cuts."""
+
+    rng = np.random.default_rng(0)
+    fluxes = rng.lognormal(0.0, 1.0, (500, 6))
+    errors = fluxes / rng.lognormal(np.log(8), 1.0, (500, 6))
+    fluxes[rng.random(fluxes.shape) < 0.1] *= -1
+    fluxes[rng.random(fluxes.shape) < 0.05] = np.nan
+    errors[rng.random(fluxes.shape) < 0.05] = np.nan
+    errors[rng.random(fluxes.shape) < 0.02] = 0.0
+
+    columns = [f"f{j}_corr_1" for j in range(6)]
+    cat = pd.DataFrame(
+        {
+            **{c: fluxes[:, j] for j, c in enumerate(columns)},
+            **{fo.get_err_column_name(c): errors[:, j] for j, c in enumerate(columns)},
+        }
+    )
+    col_field_params = {
+        c: {"input_column_name": c, "is_magnitude": True} for c in columns
+    }
+
+    snr_values = [0.0, 2.5, 8.0, 20.0]
+    num_flags_values = [0, 1, 3, 6, 7]
+    _, snr = fo.get_snr_matrix(columns, col_field_params, cat)
+    curve = fo.get_selection_curve(
+        fo.get_core_snr(snr, num_flags_values), snr_values, num_flags_values
+    )
+
+    assert len(curve) == len(snr_values) * len(num_flags_values)
+    for row in curve.itertuples():
+        num_flags = np.count_nonzero(
+            fo.get_snr_flags(fluxes, errors, row.snr_mag), axis=1
+        )
+        assert row.num_core == np.count_nonzero(num_flags >= row.num_flags)
+        assert row.core_fraction == row.num_core / 500
+
+
+def test_create_and_write_selection_curve(load_config, create_output_path):
+    """Test that the selection curve of a field is written out, and has the same number of core objects as the test flag file for its cuts."""
+
+    curve = fo.create_and_write_selection_curve(
+        load_config[0], load_config[1], create_output_path, [4.0, 10.0], [1, 2]
+    )
+
+    assert fo.get_selection_curve_filepath(create_output_path).is_file()
+    written_curve = pd.read_csv(fo.get_selection_curve_filepath(create_output_path))
+    assert written_curve["num_core"].tolist() == curve["num_core"].tolist()
+
+    # the test flag file was made with an SNR_MAG of 4 and a NUM_FLAGS of 1
+    test_viz = fo.read_ingest_viz("./tests/test_data/ingest_flags.fits")
+    assert curve.iloc[0]["num_core"] == test_viz.sum()
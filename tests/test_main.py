@@ -0,0 +1,247 @@
+import pytest
+import json
+import yaml
+import typer
+import numpy as np
+import pandas as pd
+from typer.testing import CliRunner
+
+from jhive_previz import main
+from jhive_previz import profiling
+
+
+@pytest.fixture
+def batch_config_dir(load_config, tmp_path):
+    """Writes two copies of the test config file for different fields to a directory, with outputs going to the temporary path."""
+
+    config_dir = tmp_path / "configs"
+    config_dir.mkdir()
+
+    for field_name in ["test-field-a", "test-field-b"]:
+        config_params = dict(load_config[0])
+        config_params["output_path"] = str(tmp_path / "output")
+        config_params["field_name"] = field_name
+        with open(config_dir / f"{field_name}_config.yaml", "w") as f:
+            yaml.dump(config_params, f)
+
+    return config_dir
+
+
+def test_get_batch_config_paths(batch_config_dir):
+    """Test that the config files are found from both a directory and a glob pattern."""
+
+    from_dir = main.get_batch_config_paths(str(batch_config_dir))
+    from_glob = main.get_batch_config_paths(str(batch_config_dir / "*-a_config.yaml"))
+
+    assert len(from_dir) == 2
+    assert from_glob == [batch_config_dir / "test-field-a_config.yaml"]
+
+    with pytest.raises(FileNotFoundError):
+        main.get_batch_config_paths(str(batch_config_dir / "*.fits"))
+
+
+def test_process_batch(load_config, batch_config_dir, tmp_path):
+    """Test that process_batch writes out the outputs for every field, and a summary of the fields."""
+
+    summaries = main.process_batch(
+        str(batch_config_dir),
+        ["./tests/test_data/test_fields.yaml", "./tests/test_data/test2_fields.yaml"],
+        num_workers=2,
+        use_flag_file=False,
+    )
+
+    assert [s["status"] for s in summaries] == ["success", "success"]
+
+    version_path = tmp_path / "output" / load_config[0]["version"]
+    for field_name in ["test-field-a", "test-field-b"]:
+        assert (version_path / field_name / "catalog_raw.csv").is_file()
+        assert (version_path / field_name / "metadata_raw.json").is_file()
+
+    with open(version_path / "batch_summary.json") as f:
+        batch_summary = json.load(f)
+
+    assert len(batch_summary["fields"]) == 2
+
+
+def test_profile_process_field(load_config, create_output_path):
+    """Test that profiling a field run writes a report with each nested stage, and the collapsed stacks."""
+
+    with profiling.profile_run(create_output_path, use_cprofile=True):
+        with profiling.stage("process_field"):
+            main.process_field(load_config[0], load_config[1], use_flag_file=False)
+
+    with open(create_output_path / profiling.PROFILE_FILENAME) as f:
+        report = json.load(f)
+
+    stages = {s["path"]: s for s in report["stages"]}
+    assert report["stages"][0]["path"] == "process_field"
+    assert "process_field/process_data/write_raw" in stages
+    assert "process_field/create_metadata_file" in stages
+
+    # the main catalogue is processed once, with every row of the raw catalogue
+    main_cat = stages[
+        "process_field/process_data/load_and_process_catalogue[cat_filename]"
+    ]
+    assert main_cat["calls"] == 1
+    assert main_cat["num_rows"] == stages["process_field/process_data"]["num_rows"]
+    assert main_cat["depth"] == 2
+    assert main_cat["wall_seconds"] <= stages["process_field"]["wall_seconds"]
+
+    # every stack starts from the path of its stage
+    with open(create_output_path / report["stacks_file"]) as f:
+        stacks = [line.rsplit(" ", 1) for line in f.read().splitlines()]
+    assert len(stacks) > 0
+    assert all(stack.startswith("process_field") for stack, _ in stacks)
+
+    # stages are not recorded when the run is not profiled
+    with profiling.stage("process_field") as stage_run:
+        assert stage_run == {}
+
+
+def test_process_field_make_flags(load_config, create_output_path):
+    """Test that a field can be split into core and raw catalogues without a flag file when the flags are made in the same run, and that the flag file is only written if asked for."""
+
+    flag_file_path = create_output_path / load_config[0]["flag_file_name"]
+
+    main.process_field(
+        load_config[0],
+        load_config[1],
+        process_options={"make_flags": True},
+        write_flag_file=False,
+    )
+    assert (create_output_path / "catalog_core.csv").is_file()
+    assert not flag_file_path.is_file()
+
+    main.process_field(
+        load_config[0], load_config[1], process_options={"make_flags": True}
+    )
+    assert flag_file_path.is_file()
+
+
+def test_process_field_chunked_percentiles(load_config, create_output_path):
+    """Test that the metadata files of a field processed in chunks have the same percentiles as processing it all at once, found from the column sketches."""
+
+    main.process_field(load_config[0], load_config[1], use_flag_file=False)
+    with open(create_output_path / "metadata_raw.json") as f:
+        whole_metadata = json.load(f)
+
+    main.process_field(
+        load_config[0], load_config[1], use_flag_file=False, chunk_size=7
+    )
+    with open(create_output_path / "metadata_raw.json") as f:
+        chunked_metadata = json.load(f)
+
+    columns_with_percentiles = [
+        colname
+        for colname, col_metadata in whole_metadata["columns"].items()
+        if "percentiles" in col_metadata
+    ]
+    for colname in columns_with_percentiles:
+        whole_percentiles = whole_metadata["columns"][colname]["percentiles"]
+        chunked_percentiles = chunked_metadata["columns"][colname]["percentiles"]
+        assert chunked_percentiles.keys() == whole_percentiles.keys()
+        for name, value in whole_percentiles.items():
+            assert chunked_percentiles[name] == pytest.approx(value, abs=1e-6), (
+                colname,
+                name,
+            )
+
+
+@pytest.fixture
+def large_field_config(load_config, tmp_path):
+    """Writes a field with more rows than the compression of the column sketches, with ra and dec in a narrow range
+    on a large offset, and returns its config files, with outputs going to the temporary path.
+    """
+
+    rng = np.random.default_rng(0)
+    num_rows = 5000
+    data_dir = tmp_path / "large_field"
+    data_dir.mkdir()
+    pd.DataFrame(
+        {
+            "id": np.arange(1, num_rows + 1),
+            "ra": rng.uniform(53.06, 53.26, num_rows),
+            "dec": rng.uniform(-27.88, -27.72, num_rows),
+            "f070w_corr_1": 10 ** rng.normal(-0.5, 0.8, num_rows),
+        }
+    ).to_csv(data_dir / "large-data.csv", index=False)
+
+    fields = {"file_name": "cat_filename", "file_format": "ascii.csv", "columns": {}}
+    for colname in ["ra", "dec"]:
+        fields["columns"][colname] = {
+            "display": colname,
+            "is_magnitude": False,
+            "data_type": "float",
+            "file_name": "cat_filename",
+            "input_column_name": colname,
+            "input_units": "Degrees",
+            "output_units": "Degrees",
+            "output_num_decimals": 6,
+        }
+    fields["columns"]["id"] = dict(
+        load_config[1]["cat_filename"]["columns"]["id"], display="id"
+    )
+    fields["columns"]["abmag_f070w"] = dict(
+        load_config[1]["cat_filename"]["columns"]["abmag_f444w"],
+        filt_name="F070W",
+        input_column_name="f070w_corr_1",
+        filt_max_val=None,
+    )
+    with open(data_dir / "large_fields.yaml", "w") as f:
+        yaml.dump(fields, f)
+
+    config_params = dict(load_config[0])
+    config_params["paths"] = {"cat_path": str(data_dir) + "/"}
+    config_params["file_names"] = {"cat_filename": "large-data.csv"}
+    config_params["columns_to_use"] = {"cat_filename": list(fields["columns"])}
+    config_params["output_path"] = str(tmp_path / "output")
+    with open(data_dir / "large_config.yaml", "w") as f:
+        yaml.dump(config_params, f)
+
+    return main.load_config(
+        data_dir / "large_config.yaml", [data_dir / "large_fields.yaml"]
+    )
+
+
+def test_process_field_chunked_percentiles_large(large_field_config):
+    """Test that the percentiles of every column of a field processed in chunks, found from the column sketches, are within a small absolute tolerance of the percentiles of the whole catalogue, even for columns in a narrow range on a large offset."""
+
+    config_params, field_params = large_field_config
+    output_path = main.create_and_validate_output_path(config_params)
+
+    field_metadata = []
+    for chunk_size in [None, 997]:
+        main.process_field(
+            config_params,
+            field_params,
+            use_flag_file=False,
+            chunk_size=chunk_size,
+            write_flag_file=False,
+        )
+        with open(output_path / "metadata_raw.json") as f:
+            field_metadata.append(json.load(f))
+    whole_metadata, chunked_metadata = field_metadata
+
+    for colname in ["ra", "dec", "abmag_f070w"]:
+        col_metadata = whole_metadata["columns"][colname]
+        tolerance = 0.0025 * (col_metadata["max_val"] - col_metadata["min_val"])
+        whole_percentiles = col_metadata["percentiles"]
+        chunked_percentiles = chunked_metadata["columns"][colname]["percentiles"]
+        assert chunked_percentiles.keys() == whole_percentiles.keys()
+        for name, value in whole_percentiles.items():
+            assert chunked_percentiles[name] == pytest.approx(value, abs=tolerance), (
+                colname,
+                name,
+            )
+
+
+def test_tile_order_option(load_config):
+    """Test that the commands reject a HEALPix order of the tiles outside 0 to tiles.MAX_TILE_ORDER before processing anything."""
+
+    runner = CliRunner()
+    for command in [main.process_data_and_write_metadata, main.process_batch]:
+        app = typer.Typer()
+        app.command()(command)
+        result = runner.invoke(app, ["--tile-order", "30"])
+        assert result.exit_code == 2
+        assert "--tile-order" in result.output
@@ -1,8 +1,13 @@
+import json
 import pytest
+import numpy as np
 import pandas as pd
 
 from jhive_previz import metadata
 from jhive_previz import dataproc
+from jhive_previz import main
+from jhive_previz import sketches
+from jhive_previz import stats
 
 
 def test_get_desired_column_metadata(load_config, get_processed_data):
@@ -33,25 +38,74 @@ def test_fail_get_desired_column_metadata(load_config):
     assert set(error_metadata.keys()) != set(new_cols_to_use)
 
 
-def test_add_min_max_val_to_json(load_config, get_processed_data):
-    """Test that add_min_max_val_to_json works as expected. Checks that "min_val" and "max_val" keys exist in the new dictionary and that the max value for one of the items matches what we expect."""
+def test_add_column_stats_to_json(load_config, get_processed_data):
+    """Test that add_column_stats_to_json works as expected. Checks that "min_val" and "max_val" keys exist in the new dictionary and that the max value, number of values and median for one of the items match what we expect."""
 
     # turn config file into json
     new_metadata = metadata.get_desired_column_metadata(
         load_config[1], load_config[0]["columns_to_use"], get_processed_data
     )
 
-    # add min and max to json
-    updated_metadata = metadata.add_min_max_val_to_json(
-        new_metadata, get_processed_data
+    # add the stats to json
+    df_stats = stats.get_column_stats(
+        get_processed_data, metadata.get_stats_columns(new_metadata)
     )
+    updated_metadata = metadata.add_column_stats_to_json(new_metadata, df_stats)
 
     # check that min and max val keys exist in the new metadata json
     assert "min_val" in updated_metadata["abmag_f333w"].keys()
     assert "max_val" in updated_metadata["mass"].keys()
 
-    # check that the max value in the metadata matches what we expect
-    assert updated_metadata["mass"]["max_val"] == get_processed_data["mass"].max()
+    # check that the stats in the metadata match what we expect
+    mass = get_processed_data["mass"]
+    assert updated_metadata["mass"]["max_val"] == mass.max()
+    assert updated_metadata["mass"]["num_values"] == mass.count()
+    assert updated_metadata["mass"]["num_nan"] == mass.isna().sum()
+    assert updated_metadata["mass"]["percentiles"]["p50"] == round(mass.median(), 3)
+
+
+def test_get_column_stats():
+    """Test that the stats of every column of a block, and of the selections of its rows in each mask, match those of numpy and pandas, and that the stats of chunks merge into the stats of the whole catalogue."""
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "a": rng.normal(size=1000),
+            "b": rng.integers(0, 100, 1000),
+            "c": np.nan,
+            "d": pd.array([1, None] * 500, dtype="Int64"),
+        }
+    )
+    df.loc[rng.random(1000) < 0.1, "a"] = np.nan
+    mask = rng.random(1000) < 0.3
+
+    masked_stats = stats.get_masked_column_stats(df, {"raw": ~mask, "core": mask})
+    for df_cat, df_stats in [
+        (df[~mask], masked_stats["raw"]),
+        (df[mask], masked_stats["core"]),
+    ]:
+        assert list(df_stats.columns) == ["a", "b", "c", "d"]
+        values = df_cat.astype(np.float64)
+        np.testing.assert_array_equal(df_stats.loc["count"], values.count())
+        np.testing.assert_array_equal(df_stats.loc["nan_count"], values.isna().sum())
+        np.testing.assert_array_equal(df_stats.loc["min"], values.min())
+        np.testing.assert_array_equal(df_stats.loc["max"], values.max())
+        np.testing.assert_allclose(df_stats.loc["mean"], values.mean())
+        for percentile in stats.DEFAULT_PERCENTILES:
+            expected = values.quantile(percentile / 100)
+            np.testing.assert_allclose(
+                df_stats.loc[stats.get_percentile_name(percentile)], expected
+            )
+
+    # the stats of the chunks of a catalogue merge into the stats of the whole catalogue, without percentiles
+    whole_stats = stats.get_column_stats(df)
+    chunk_stats = [
+        stats.get_column_stats(df.iloc[i : i + 300], percentiles=None)
+        for i in range(0, 1000, 300)
+    ]
+    merged_stats = stats.merge_column_stats(chunk_stats)
+    assert list(merged_stats.index) == stats.MERGEABLE_STATS + ["mean"]
+    pd.testing.assert_frame_equal(merged_stats, whole_stats.loc[merged_stats.index])
 
 
 def test_add_top_level_metadata(load_config, get_processed_data):
@@ -71,3 +125,106 @@ def test_add_top_level_metadata(load_config, get_processed_data):
     assert set(final_metadata["columns"].keys()) == set(
         load_config[0]["columns_to_use"]["cat_filename"]
     )
+
+
+def get_percentile_ranks(values: np.ndarray, percentile_values: np.ndarray):
+    """Returns the fraction of the (sorted) values below, and the fraction up to and including, each of the percentile values."""
+    lower = np.searchsorted(values, percentile_values, side="left") / len(values)
+    upper = np.searchsorted(values, percentile_values, side="right") / len(values)
+    return lower, upper
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        np.concatenate(
+            [
+                np.random.default_rng(0).normal(0.0, 5.0, 10000),
+                np.random.default_rng(1).lognormal(0.0, 3.0, 5000),
+                np.zeros(10),
+            ]
+        ),
+        # a narrow range on a large offset, i.e. the ra of a field
+        np.random.default_rng(2).uniform(53.06, 53.26, 20000),
+    ],
+)
+def test_merge_column_sketches(values):
+    """Test that the sketches of the chunks of a column merge into a sketch of the whole column, and that the rank of each of its percentiles is within the accuracy of the sketch."""
+
+    values = values.copy()
+    values[np.random.default_rng(3).random(len(values)) < 0.01] = np.nan
+
+    merged_sketch = sketches.merge_column_sketches(
+        [sketches.make_column_sketch(v) for v in np.array_split(values, 7)]
+    )
+
+    finite_values = np.sort(values[np.isfinite(values)])
+    assert merged_sketch["num_values"] == len(finite_values)
+    assert merged_sketch["min_val"] == finite_values[0]
+    assert merged_sketch["max_val"] == finite_values[-1]
+    assert np.sum(merged_sketch["weights"]) == len(finite_values)
+    assert len(merged_sketch["means"]) <= sketches.DEFAULT_COMPRESSION
+
+    percentiles = sketches.get_sketch_percentiles(merged_sketch)
+    lower, upper = get_percentile_ranks(
+        finite_values, np.array(list(percentiles.values()))
+    )
+    expected = np.array(stats.DEFAULT_PERCENTILES) / 100
+    tolerance = 2 / sketches.DEFAULT_COMPRESSION
+    assert np.all(lower <= expected + tolerance)
+    assert np.all(upper >= expected - tolerance)
+
+    # so the percentiles of a narrow range are spread over the range, not all at the min value
+    np.testing.assert_allclose(
+        list(percentiles.values()),
+        np.percentile(finite_values, stats.DEFAULT_PERCENTILES),
+        atol=0.005 * (finite_values[-1] - finite_values[0]),
+    )
+
+
+def test_column_sketch_small_column():
+    """Test that the sketch of a column with fewer values than the compression keeps every value, so its percentiles are the same as np.percentile."""
+
+    values = np.array([53.2, 53.06, np.nan, 53.26, 53.1, np.inf, 53.1618])
+    sketch = sketches.merge_column_sketches(
+        [sketches.make_column_sketch(v) for v in np.array_split(values, 3)]
+    )
+
+    finite_values = np.sort(values[np.isfinite(values)])
+    np.testing.assert_array_equal(sketch["means"], finite_values)
+    percentiles = sketches.get_sketch_percentiles(sketch, [0, 1, 37.5, 50, 99, 100])
+    np.testing.assert_allclose(
+        list(percentiles.values()),
+        np.percentile(finite_values, [0, 1, 37.5, 50, 99, 100]),
+        rtol=1e-12,
+    )
+    assert sketches.get_sketch_percentiles(
+        sketches.make_column_sketch(np.array([np.nan])), [50]
+    ) == {"p50": None}
+
+
+def test_merge_sketches_and_write_output(load_config, create_output_path):
+    """Test that create_metadata_file writes the column sketches of a catalogue, and that the sketches of every field are merged into the global percentiles."""
+
+    df = pd.DataFrame({"id": np.arange(1, 101), "mass": np.linspace(0.1, 10.0, 100)})
+    input_path = create_output_path.parent
+
+    for field_key, df_field in [("field-a", df.iloc[:40]), ("field-b", df.iloc[40:])]:
+        output_path = input_path / field_key
+        output_path.mkdir()
+        metadata.create_metadata_file(
+            load_config[0], load_config[1], df_field, output_path, "core"
+        )
+        field_metadata = json.load(open(output_path / "metadata_core.json"))
+        assert field_metadata["column_sketches"] == "column_sketches_core.json"
+
+    main.merge_sketches_and_write_output(str(input_path), percentiles=[50.0])
+
+    global_percentiles = json.load(
+        open(sketches.get_global_percentiles_filepath(input_path, "core"))
+    )
+    assert global_percentiles["field_keys_included"] == ["field-a", "field-b"]
+    mass = global_percentiles["columns"]["mass"]
+    assert mass["num_values"] == 100
+    assert mass["min_val"] == 0.1 and mass["max_val"] == 10.0
+    assert mass["percentiles"]["p50"] == pytest.approx(df["mass"].quantile(0.5))
@@ -0,0 +1,78 @@
+import pytest
+import pickle
+import shutil
+import yaml
+
+from jhive_previz import conversions, dataproc, schema
+
+TEST_FIELDS_PATH = "./tests/test_data/test_fields.yaml"
+
+
+def test_compile_catalogue_schema(load_config):
+    """Test that the compiled fields file has a spec for each column with its conversion function, and can still be used as the dictionary of the fields file."""
+
+    cat_schema = load_config[1]["cat_filename"]
+    assert isinstance(cat_schema, schema.CatalogueSchema)
+
+    spec = cat_schema.column_specs["mass"]
+    assert spec.input_column_name == "stellar_mass"
+    assert spec.output_num_decimals == 3
+    assert spec.filt_min_val == 0.0
+    assert spec.conversion_function is conversions.log_values
+    assert cat_schema.column_specs["id"].conversion_function is None
+
+    # the schema is a read-only mapping of the fields file
+    assert cat_schema["file_format"] == "ascii.csv"
+    assert cat_schema["columns"]["mass"] is spec.params
+    assert set(cat_schema) == {"file_name", "file_format", "columns"}
+    with pytest.raises(TypeError):
+        cat_schema["file_format"] = "fits"
+
+    assert pickle.loads(pickle.dumps(cat_schema)) == cat_schema
+
+
+def test_load_catalogue_schema_cache(tmp_path, monkeypatch):
+    """Test that a compiled fields file is read from the cache without parsing the yaml, until the file changes."""
+
+    field_path = tmp_path / "test_fields.yaml"
+    shutil.copy(TEST_FIELDS_PATH, field_path)
+    cache_dir = tmp_path / "cache"
+
+    cat_schema = schema.load_catalogue_schema(field_path, cache_dir)
+    assert len(list(cache_dir.glob("*" + schema.SCHEMA_CACHE_SUFFIX))) == 1
+
+    # the second load does not parse the yaml
+    with monkeypatch.context() as m:
+        m.setattr(yaml, "unsafe_load", lambda *args: pytest.fail("parsed the yaml"))
+        assert schema.load_catalogue_schema(field_path, cache_dir) == cat_schema
+
+    # a changed fields file is compiled again
+    with open(field_path, "a") as f:
+        f.write("    zero_point: 25.0\n")
+    new_schema = schema.load_catalogue_schema(field_path, cache_dir)
+    assert new_schema != cat_schema
+    assert len(list(cache_dir.glob("*" + schema.SCHEMA_CACHE_SUFFIX))) == 2
+
+
+def test_validate_field_params(load_config):
+    """Test that fields files with missing keys or invalid data types fail validation, and that columns with units that cannot be converted fail when they are used."""
+
+    field_params = yaml.unsafe_load(open(TEST_FIELDS_PATH))
+    del field_params["columns"]["mass"]["input_column_name"]
+    with pytest.raises(schema.FieldSchemaError, match="input_column_name"):
+        schema.compile_catalogue_schema(field_params)
+
+    field_params = yaml.unsafe_load(open(TEST_FIELDS_PATH))
+    field_params["columns"]["mass"]["data_type"] = "complex"
+    with pytest.raises(schema.FieldSchemaError, match="data_type"):
+        schema.compile_catalogue_schema(field_params)
+
+    field_params = yaml.unsafe_load(open(TEST_FIELDS_PATH))
+    field_params["columns"]["mass"]["output_units"] = "parsecs"
+    cat_schema = schema.compile_catalogue_schema(field_params)
+    assert cat_schema.column_specs["mass"].conversion_error is not None
+
+    with pytest.raises(dataproc.UnitConversionError):
+        dataproc.populate_column_information(
+            {}, load_config[0], {**load_config[1], "cat_filename": cat_schema}
+        )
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from jhive_previz import utils
+
+
+def test_read_table_columns(tmp_path):
+    """Test that read_table only reads the requested columns from fits files, skipping any that do not exist, and that the values match reading the whole file."""
+
+    file_path = "./tests/test_data/test-data.csv"
+    utils.write_pd_to_fits(pd.read_csv(file_path), tmp_path / "test-data.fits")
+    full_df = utils.read_table(tmp_path / "test-data.fits", "fits")
+    subset_df = utils.read_table(
+        tmp_path / "test-data.fits",
+        "fits",
+        columns=["id", "f444w_corr_1", "id", "not_a_column"],
+    )
+
+    assert list(subset_df.columns) == ["id", "f444w_corr_1"]
+    pd.testing.assert_frame_equal(full_df[["id", "f444w_corr_1"]], subset_df)
+
+
+def test_widen_and_apply_column_dtypes():
+    """Test that the dtypes of two chunks are widened to fit both, and that a column is never converted to a dtype that its values are out of the range of."""
+
+    first_dtypes = {"id": "Int32", "mag": "float32", "flag": "boolean"}
+    later_dtypes = {"id": "Int64", "flag": "boolean", "ra": "float32"}
+
+    assert utils.widen_column_dtypes(first_dtypes, later_dtypes) == {
+        "id": "Int64",
+        "mag": "float64",
+        "flag": "boolean",
+        "ra": "float64",
+    }
+    assert utils.widen_column_dtypes(first_dtypes, first_dtypes) == first_dtypes
+
+    df = pd.DataFrame({"id": [1, 2**40], "mag": [12345.678901, 1e300]})
+    df_applied = utils.apply_column_dtypes(df, {"id": "Int32", "mag": "float32"})
+
+    pd.testing.assert_frame_equal(df_applied, df)
+    assert utils.apply_column_dtypes(df.iloc[:1], {"id": "Int32"})["id"].dtype == (
+        "Int32"
+    )
+    assert not utils.fits_dtype(df["id"], "Int32")
+    assert utils.fits_dtype(df["id"], "Int64")
+    assert np.isfinite(df_applied["mag"]).all()